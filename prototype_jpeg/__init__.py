@@ -1,3 +1,6 @@
+import concurrent.futures
+import contextlib
+import itertools
 import logging
 import math
 import os
@@ -6,29 +9,44 @@ import time
 from bitarray import bitarray, bits2bytes
 import numpy as np
 
-from .codec import Encoder, Decoder, DC, AC, LUMINANCE, CHROMINANCE
-from .utils import (rgb2ycbcr, ycbcr2rgb, downsample, upsample, block_slice,
-                    block_combine, dct2d, idct2d, quantize, Y, CB, CR)
+from .blocks import padded_shape
+from .codec import (warm_default_decode_trees, DC, AC, LUMINANCE,
+                    CHROMINANCE)
+from .color import forward_color, inverse_color, layer_shapes
+from .common import (check_options, check_precision, check_color_conversion,
+                     decode_layers, layer_table, ENTROPY_CODERS)
+from .restart import encode_segments
+from .stream import compress_stream, iter_extract, extract_stream
+from .transform import (forward_transform, dct_transform, quantize_transform,
+                        requantize_transform, inverse_transform, PRECISIONS)
+from .utils import Y, CB, CR
 
 __version__ = '0.1.0'
 
+# The maximum number of blocks transformed at once in `compress`.
+TRANSFORM_CHUNK_SIZE = 4096
+
 #############################################################
 # Compress Algorithm:                                       #
-#       Color Space Conversion                              #
-#       Subsampling (Chrominance)                           #
-#       Level Offset (Luminance)                            #
-#       For each color layer:                               #
-#           Pad layer to 8n * 8n                            #
+#       In one pass into padded layers:                     #
+#           Color Space Conversion                          #
+#           Subsampling (Chrominance)                       #
+#           Level Offset (Luminance)                        #
+#           Pad layer to 8n * 8n (edge replication)         #
+#       For each color layer (in batches of 8*8 blocks):    #
 #           8*8 Slicing                                     #
-#           For each slicing:                               #
-#               DCT                                         #
-#               Quantization (Luminance and Chrominance)    #
-#               Entropy Coder (Luminance and Chrominance)   #
+#           DCT                                             #
+#           Quantization (Luminance and Chrominance)        #
+#       Entropy Coder (Luminance and Chrominance)           #
 #       Write Header                                        #
 #############################################################
 
 
-def compress(file_object, size, quality=50, grey_level=False, subsampling_mode=1):  # pylint: disable=too-many-locals
+def compress(file_object, size, quality=50, grey_level=False, subsampling_mode=1,  # pylint: disable=too-many-arguments, too-many-locals
+             huffman_backend='vectorized', optimize_huffman=False,
+             entropy='huffman', restart_interval=None, executor=None,
+             max_workers=None, transform='float', quantization_tables=None,
+             precision='float64', color_conversion='float'):
     start_time = time.perf_counter()
     logging.getLogger(__name__).info(
         'Original file size: %d Bytes', os.fstat(file_object.fileno()).st_size
@@ -37,94 +55,184 @@ def compress(file_object, size, quality=50, grey_level=False, subsampling_mode=1
     if quality <= 0 or quality > 95:
         raise ValueError('Quality should within (0, 95].')
 
-    img_arr = np.fromfile(file_object, dtype=np.uint8).reshape(
-        size if grey_level else (*size, 3)
+    quantization_tables = check_options(
+        grey_level, huffman_backend, optimize_huffman, entropy,
+        restart_interval, transform, quantization_tables, precision,
+        color_conversion
     )
 
-    if grey_level:
-        data = {Y: img_arr.astype(float)}
+    data = _read_layers(file_object, size, grey_level, subsampling_mode,
+                        precision, color_conversion)
 
-    else:  # RGB
-        # Color Space Conversion (w/o Level Offset)
-        data = rgb2ycbcr(*(img_arr[:, :, idx] for idx in range(3)))
+    for key, layer in data.items():
+        # Block Slicing, 2D DCT, Quantization and Rounding in batches of
+        # blocks.
+        data[key] = forward_transform(
+            layer, key, quality=quality, chunk_size=TRANSFORM_CHUNK_SIZE,
+            backend=transform,
+            table=layer_table(quantization_tables, key),
+            precision=precision
+        )
 
-        # Subsampling
-        data[CB] = downsample(data[CB], subsampling_mode)
-        data[CR] = downsample(data[CR], subsampling_mode)
+    with executor_context(executor, max_workers) as pool:
+        ret = _encode_layers(
+            _stack_components(data, grey_level), size, grey_level, quality,
+            subsampling_mode, huffman_backend=huffman_backend,
+            optimize_huffman=optimize_huffman, entropy=entropy,
+            restart_interval=restart_interval, executor=pool,
+            transform=transform, quantization_tables=quantization_tables
+        )
 
-    # Level Offset
-    data[Y] = data[Y] - 128
+    logging.getLogger(__name__).info(
+        'Time elapsed: %.4f seconds', (time.perf_counter() - start_time)
+    )
+    return ret
 
-    for key, layer in data.items():
-        nrows, ncols = layer.shape
-
-        # Pad Layers to 8N * 8N
-        data[key] = np.pad(
-            layer,
-            (
-                (0, (nrows // 8 + 1) * 8 - nrows if nrows % 8 else 0),
-                (0, (ncols // 8 + 1) * 8 - ncols if ncols % 8 else 0)
-            ),
-            mode='constant'
-        )
 
-        # Block Slicing
-        data[key] = block_slice(data[key], 8, 8)
+def compress_to_size(file_object, size, max_bytes, grey_level=False,  # pylint: disable=too-many-arguments, too-many-locals
+                     subsampling_mode=1, huffman_backend='vectorized',
+                     optimize_huffman=False, entropy='huffman',
+                     restart_interval=None, executor=None, max_workers=None,
+                     transform='float', quantization_tables=None,
+                     precision='float64', color_conversion='float'):
+    """Compress with the highest quality whose data fit in `max_bytes`.
 
-        for idx, block in enumerate(data[key]):
-            # 2D DCT
-            data[key][idx] = dct2d(block)
+    The DCT coefficients are computed once, and the quality is binary searched
+    by re-running only the quantization and the entropy coding. The sizes are
+    assumed to grow with the quality.
 
-            # Quantization
-            data[key][idx] = quantize(data[key][idx], key, quality=quality)
+    Arguments:
+        file_object {file} -- The raw image file.
+        size {tuple} -- The size of image in the format of `(nrows, ncols)`.
+        max_bytes {int} -- The maximum number of bytes of the compressed data
+            (w/o header).
 
-        # Rounding
-        data[key] = np.rint(data[key]).astype(int)
+    Keyword Arguments:
+        The same as those of `compress` except `quality`.
 
-    if grey_level:
-        # Entropy Encoder
-        encoded = Encoder(data[Y], LUMINANCE).encode()
-
-        # Combine grey level data as binary in the order:
-        #   DC, AC
-        order = (encoded[DC], encoded[AC])
-
-    else:  # RGB
-        # Entropy Encoder
-        encoded = {
-            LUMINANCE: Encoder(data[Y], LUMINANCE).encode(),
-            CHROMINANCE: Encoder(
-                np.vstack((data[CB], data[CR])),
-                CHROMINANCE
-            ).encode()
-        }
+    Raises:
+        ValueError -- When the data cannot fit in `max_bytes` even with
+            quality 1, or the options are invalid.
+
+    Returns:
+        dict -- The compressed data and header as returned by `compress`. The
+            chosen quality is in the header.
+    """
+
+    start_time = time.perf_counter()
+    quantization_tables = check_options(
+        grey_level, huffman_backend, optimize_huffman, entropy,
+        restart_interval, transform, quantization_tables, precision,
+        color_conversion
+    )
+
+    data = _read_layers(file_object, size, grey_level, subsampling_mode,
+                        precision, color_conversion)
+
+    coefficients = _dct_layers(data, transform, precision)
+
+    ret = None
+    low, high = 1, 95
+    with executor_context(executor, max_workers) as pool:
+        while low <= high:
+            quality = (low + high) // 2
+            trial = _encode_layers(
+                _stack_components(_quantize_layers(
+                    coefficients, quality, transform, quantization_tables,
+                    precision
+                ), grey_level),
+                size, grey_level, quality, subsampling_mode,
+                huffman_backend=huffman_backend,
+                optimize_huffman=optimize_huffman, entropy=entropy,
+                restart_interval=restart_interval, executor=pool,
+                transform=transform, quantization_tables=quantization_tables
+            )
+            logging.getLogger(__name__).debug(
+                'Quality %d: %d Bytes', quality, bits2bytes(len(trial['data']))
+            )
+            if bits2bytes(len(trial['data'])) <= max_bytes:
+                ret = trial
+                low = quality + 1
+            else:
+                high = quality - 1
+
+    if ret is None:
+        raise ValueError(f'Compressed data cannot fit in {max_bytes} bytes.')
+    logging.getLogger(__name__).info(
+        'Quality: %d, time elapsed: %.4f seconds', ret['header']['quality'],
+        (time.perf_counter() - start_time)
+    )
+    return ret
+
+
+def compress_multi(file_object, size, qualities, grey_level=False,  # pylint: disable=too-many-arguments, too-many-locals
+                   subsampling_mode=1, huffman_backend='vectorized',
+                   optimize_huffman=False, entropy='huffman',
+                   restart_interval=None, executor=None, max_workers=None,
+                   transform='float', quantization_tables=None,
+                   precision='float64', color_conversion='float'):
+    """Compress an image with several quality factors.
+
+    The color space conversion, subsampling, padding, slicing and DCT are
+    shared by all qualities, and only the quantization and the entropy coding
+    are repeated.
+
+    Arguments:
+        file_object {file} -- The raw image file.
+        size {tuple} -- The size of image in the format of `(nrows, ncols)`.
+        qualities {iterable} -- The quality factors.
+
+    Keyword Arguments:
+        The same as those of `compress` except `quality`.
+
+    Raises:
+        ValueError -- When a quality factor or the options are invalid.
+
+    Returns:
+        tuple -- The results of `compress` in the order of `qualities`.
+    """
 
-        # Combine RGB data as binary in the order:
-        #   LUMINANCE.DC, LUMINANCE.AC, CHROMINANCE.DC, CHROMINANCE.AC
-        order = (encoded[LUMINANCE][DC], encoded[LUMINANCE][AC],
-                 encoded[CHROMINANCE][DC], encoded[CHROMINANCE][AC])
+    start_time = time.perf_counter()
+    qualities = tuple(qualities)
+    if any(quality <= 0 or quality > 95 for quality in qualities):
+        raise ValueError('Quality should within (0, 95].')
+
+    quantization_tables = check_options(
+        grey_level, huffman_backend, optimize_huffman, entropy,
+        restart_interval, transform, quantization_tables, precision,
+        color_conversion
+    )
 
-    bits = bitarray(''.join(order))
+    coefficients = _dct_layers(
+        _read_layers(file_object, size, grey_level, subsampling_mode,
+                     precision, color_conversion),
+        transform, precision
+    )
+
+    with executor_context(executor, max_workers) as pool:
+        ret = tuple(
+            _encode_layers(
+                _stack_components(_quantize_layers(
+                    coefficients, quality, transform, quantization_tables,
+                    precision
+                ), grey_level),
+                size, grey_level, quality, subsampling_mode,
+                huffman_backend=huffman_backend,
+                optimize_huffman=optimize_huffman, entropy=entropy,
+                restart_interval=restart_interval, executor=pool,
+                transform=transform, quantization_tables=quantization_tables
+            )
+            for quality in qualities
+        )
 
     logging.getLogger(__name__).info(
         'Time elapsed: %.4f seconds', (time.perf_counter() - start_time)
     )
-    return {
-        'data': bits,
-        'header': {
-            'size': size,
-            'grey_level': grey_level,
-            'quality': quality,
-            'subsampling_mode': subsampling_mode,
-            # Remaining bits length is the fake filled bits for 8 bits as a
-            # byte.
-            'remaining_bits_length': bits2bytes(len(bits)) * 8 - len(bits),
-            'data_slice_lengths': tuple(len(d) for d in order)
-        }
-    }
+    return ret
 
 
-def extract(file_object, header):  # pylint: disable=too-many-branches, too-many-locals
+def extract(file_object, header, executor=None, max_workers=None,  # pylint: disable=too-many-arguments, too-many-locals
+            precision='float64', color_conversion='float'):
     def school_round(val):
         if float(val) % 1 >= 0.5:
             return math.ceil(val)
@@ -136,17 +244,16 @@ def extract(file_object, header):  # pylint: disable=too-many-branches, too-many
         os.fstat(file_object.fileno()).st_size
     )
 
+    check_precision(precision)
+    check_color_conversion(color_conversion)
+
     bits = bitarray()
     bits.fromfile(file_object)
-    bits = bits.to01()
 
     # Read Header
     size = header['size']
-    grey_level = header['grey_level']
     quality = header['quality']
     subsampling_mode = header['subsampling_mode']
-    remaining_bits_length = header['remaining_bits_length']
-    dsls = header['data_slice_lengths']  # data_slice_lengths
 
     # Calculate the size after subsampling.
     if subsampling_mode == 4:
@@ -157,94 +264,445 @@ def extract(file_object, header):  # pylint: disable=too-many-branches, too-many
             school_round(size[1] / 2)
         )
 
-    # Preprocessing Byte Sequence:
-    #   1. Remove Remaining (Fake Filled) Bits.
-    #   2. Slice Bits into Dictionary Data Structure for `Decoder`.
+    # Entropy Decoding
+    with executor_context(executor, max_workers) as pool:
+        data = decode_layers(bits, header, pool)
 
-    if remaining_bits_length:
-        bits = bits[:-remaining_bits_length]
+    for key, layer in data.items():
+        # Inverse Quantization, 2D IDCT, Block Combination, Inverse Level
+        # Offset (Luminance) and Clipping Padded Image in batches of blocks.
+        data[key] = inverse_transform(
+            layer, key, size if key == Y else subsampled_size,
+            quality=quality, level_offset=128 if key == Y else 0,
+            chunk_size=TRANSFORM_CHUNK_SIZE,
+            backend=header.get('transform', 'float'),
+            table=layer_table(header.get('quantization_tables'), key),
+            precision=precision
+        )
 
-    if grey_level:
-        # The order of dsls (grey level) is:
-        #   DC, AC
-        sliced = {
-            DC: bits[:dsls[0]],
-            AC: bits[dsls[0]:]
+    # Upsampling (Chrominance), Color Space Conversion, Rounding and Clipping
+    # into the interleaved pixels.
+    pixels = inverse_color(data, subsampling_mode,
+                           conversion=color_conversion)
+
+    logging.getLogger(__name__).info(
+        'Time elapsed: %.4f seconds', (time.perf_counter() - start_time)
+    )
+    return pixels.reshape(-1)
+
+
+def transcode(file_object, header, quality=50, huffman_backend='vectorized',  # pylint: disable=too-many-arguments, too-many-locals
+              optimize_huffman=False, entropy=None, restart_interval=None,
+              executor=None, max_workers=None):
+    """Compress a compressed file with another quality factor without
+    decoding it to pixels.
+
+    The data are entropy decoded to quantized blocks, requantized in the DCT
+    domain (`transform.requantize_transform`) and entropy coded again, so the
+    IDCT, upsampling, color space conversion, downsampling and DCT (and their
+    rounding) are skipped. The size, subsampling mode, transform and custom
+    quantization tables are kept.
+
+    Arguments:
+        file_object {file} -- The compressed file.
+        header {dict} -- The header of the compressed file.
+
+    Keyword Arguments:
+        quality {int} -- The new quality factor. (default: {50})
+        huffman_backend {str} -- See `compress`. (default: {'vectorized'})
+        optimize_huffman {bool} -- See `compress`. (default: {False})
+        entropy {str} -- The entropy coder, or the one of `header` if not
+            given. (default: {None})
+        restart_interval {int} -- See `compress`. (default: {None})
+        executor {str or concurrent.futures.Executor} -- See
+            `executor_context`. (default: {None})
+        max_workers {int} -- See `executor_context`. (default: {None})
+
+    Raises:
+        ValueError -- When the quality factor or the options are invalid.
+
+    Returns:
+        dict -- The compressed data and header as returned by `compress`.
+    """
+
+    start_time = time.perf_counter()
+    if quality <= 0 or quality > 95:
+        raise ValueError('Quality should within (0, 95].')
+
+    grey_level = header['grey_level']
+    if entropy is None:
+        entropy = header.get('entropy', 'huffman')
+    transform = header.get('transform', 'float')
+    quantization_tables = check_options(
+        grey_level, huffman_backend, optimize_huffman, entropy,
+        restart_interval, transform, header.get('quantization_tables'),
+        'float64', 'float'
+    )
+
+    bits = bitarray()
+    bits.fromfile(file_object)
+
+    with executor_context(executor, max_workers) as pool:
+        data = decode_layers(bits, header, pool)
+        for key, layer in data.items():
+            table = layer_table(quantization_tables, key)
+            data[key] = requantize_transform(layer, key, header['quality'],
+                                             quality, table=table,
+                                             new_table=table)
+        ret = _encode_layers(
+            _stack_components(data, grey_level), header['size'], grey_level,
+            quality, header['subsampling_mode'],
+            huffman_backend=huffman_backend,
+            optimize_huffman=optimize_huffman, entropy=entropy,
+            restart_interval=restart_interval, executor=pool,
+            transform=transform, quantization_tables=quantization_tables
+        )
+
+    logging.getLogger(__name__).info(
+        'Time elapsed: %.4f seconds', (time.perf_counter() - start_time)
+    )
+    return ret
+
+
+class Codec:  # pylint: disable=too-many-instance-attributes
+    def __init__(self, size, grey_level=False, quality=50, subsampling_mode=1,  # pylint: disable=too-many-arguments, too-many-locals
+                 huffman_backend='vectorized', optimize_huffman=False,
+                 entropy='huffman', restart_interval=None, transform='float',
+                 quantization_tables=None, precision='float64',
+                 color_conversion='float'):
+        """Create a codec of frames in the same size with the same options.
+
+        The layers, blocks and output buffers of the pipeline are allocated
+        once and reused by every `encode` and `decode`, which saves the
+        allocations of repeated `compress` and `extract` calls. A codec must
+        not be shared by threads.
+
+        Arguments:
+            size {tuple} -- The size of frames in the format of
+                `(nrows, ncols)`.
+
+        Keyword Arguments:
+            The same as those of `compress`.
+
+        Raises:
+            ValueError -- When the quality factor or the options are invalid.
+        """
+
+        if quality <= 0 or quality > 95:
+            raise ValueError('Quality should within (0, 95].')
+        self.quantization_tables = check_options(
+            grey_level, huffman_backend, optimize_huffman, entropy,
+            restart_interval, transform, quantization_tables, precision,
+            color_conversion
+        )
+        self.size = tuple(size)
+        self.grey_level = grey_level
+        self.quality = quality
+        self.subsampling_mode = subsampling_mode
+        self.huffman_backend = huffman_backend
+        self.optimize_huffman = optimize_huffman
+        self.entropy = entropy
+        self.restart_interval = restart_interval
+        self.transform = transform
+        self.precision = precision
+        self.color_conversion = color_conversion
+
+        float_dtype, coefficient_dtype = PRECISIONS[precision]
+        self._shapes = layer_shapes(self.size, grey_level, subsampling_mode)
+        # Padded layers of `color.forward_color`.
+        self._layers = {
+            key: np.empty(padded_shape(shape),
+                          dtype=(np.int16 if color_conversion == 'integer'
+                                 else float_dtype))
+            for key, shape in self._shapes.items()
         }
-    else:  # RGB
-        # The order of dsls (RGB) is:
-        #   LUMINANCE.DC, LUMINANCE.AC, CHROMINANCE.DC, CHROMINANCE.AC
-        sliced = {
-            LUMINANCE: {
-                DC: bits[:dsls[0]],
-                AC: bits[dsls[0]:dsls[0] + dsls[1]]
-            },
-            CHROMINANCE: {
-                DC: bits[dsls[0] + dsls[1]:dsls[0] + dsls[1] + dsls[2]],
-                AC: bits[dsls[0] + dsls[1] + dsls[2]:]
-            }
+
+        # Quantized blocks of components in the order of encoders, and the
+        # views of layers in them.
+        nblocks = {key: math.prod(-(-s // 8) for s in shape)
+                   for key, shape in self._shapes.items()}
+        self._components = (
+            np.empty((nblocks[Y], 8, 8), dtype=coefficient_dtype),
+        )
+        self._blocks = {Y: self._components[0]}
+        if not grey_level:
+            self._components += (np.empty((nblocks[CB] + nblocks[CR], 8, 8),
+                                          dtype=coefficient_dtype), )
+            self._blocks[CB] = self._components[1][:nblocks[CB]]
+            self._blocks[CR] = self._components[1][nblocks[CB]:]
+
+        # Padded layers of inverse transform and the interleaved output.
+        self._padded = {key: np.empty(padded_shape(shape), dtype=float_dtype)
+                        for key, shape in self._shapes.items()}
+        self._output = np.empty(self.size if grey_level else (*self.size, 3),
+                                dtype=np.uint8)
+
+    def encode(self, frame):
+        """Compress a frame.
+
+        Arguments:
+            frame {np.ndarray or bytes} -- The uint8 pixels in the shape of
+                `size` (grey level) or `(*size, 3)` (RGB), or the raw bytes.
+
+        Returns:
+            dict -- The compressed data and header as returned by `compress`.
+        """
+
+        if isinstance(frame, np.ndarray):
+            arr = frame.reshape(self._output.shape)
+        else:
+            arr = np.frombuffer(frame, dtype=np.uint8).reshape(
+                self._output.shape
+            )
+
+        # Color Space Conversion, Subsampling, Level Offset (Luminance) and
+        # Padding into the layer buffers.
+        forward_color(arr, self.subsampling_mode, out=self._layers,
+                      conversion=self.color_conversion)
+
+        for key, layer in self._layers.items():
+            # Block Slicing, 2D DCT, Quantization and Rounding into the block
+            # buffers.
+            forward_transform(
+                layer, key, quality=self.quality,
+                chunk_size=TRANSFORM_CHUNK_SIZE, backend=self.transform,
+                table=self._table(key), precision=self.precision,
+                out=self._blocks[key]
+            )
+
+        return _encode_layers(
+            self._components, self.size, self.grey_level, self.quality,
+            self.subsampling_mode, huffman_backend=self.huffman_backend,
+            optimize_huffman=self.optimize_huffman, entropy=self.entropy,
+            restart_interval=self.restart_interval, executor=None,
+            transform=self.transform,
+            quantization_tables=self.quantization_tables
+        )
+
+    def decode(self, payload):
+        """Extract a frame compressed with the same size and options.
+
+        Arguments:
+            payload {dict} -- The compressed data (bitarray) and header as
+                returned by `encode` or `compress`.
+
+        Raises:
+            ValueError -- When the header does not match the codec.
+
+        Returns:
+            np.ndarray -- The flattened uint8 pixels as returned by `extract`.
+                The array is reused (overwritten) by the next `decode`.
+        """
+
+        header = payload['header']
+        expect = {
+            'size': self.size,
+            'grey_level': self.grey_level,
+            'quality': self.quality,
+            'subsampling_mode': self.subsampling_mode,
+            'transform': self.transform,
+            'quantization_tables': self.quantization_tables
         }
+        actual = {
+            'size': tuple(header['size']),
+            'grey_level': header['grey_level'],
+            'quality': header['quality'],
+            'subsampling_mode': header['subsampling_mode'],
+            'transform': header.get('transform', 'float'),
+            'quantization_tables': header.get('quantization_tables')
+        }
+        if actual != expect:
+            raise ValueError(f'The header {actual} does not match the codec '
+                             f'{expect}.')
+
+        bits = payload['data']
+        # The bits may or may not contain the filled bits of a file.
+        data = decode_layers(bits, {
+            **header,
+            'remaining_bits_length': (len(bits)
+                                      - sum(header['data_slice_lengths']))
+        }, None)
+
+        for key, layer in data.items():
+            # Inverse Quantization, 2D IDCT, Block Combination, Inverse Level
+            # Offset (Luminance) and Clipping Padded Image into the padded
+            # layer buffers.
+            data[key] = inverse_transform(
+                layer, key, self._shapes[key], quality=self.quality,
+                level_offset=128 if key == Y else 0,
+                chunk_size=TRANSFORM_CHUNK_SIZE, backend=self.transform,
+                table=self._table(key), precision=self.precision,
+                out=self._padded[key]
+            )
 
-    # Huffman Decoding
-    if grey_level:
-        data = {Y: Decoder(sliced, LUMINANCE).decode()}
+        # Upsampling (Chrominance), Color Space Conversion, Rounding and
+        # Clipping into the output.
+        inverse_color(data, self.subsampling_mode, out=self._output,
+                      conversion=self.color_conversion)
+        return self._output.reshape(-1)
+
+    def _table(self, key):
+        return layer_table(self.quantization_tables, key)
+
+
+@contextlib.contextmanager
+def executor_context(executor=None, max_workers=None):
+    """Provide the executor for concurrent entropy coding.
+
+    Keyword Arguments:
+        executor {str or concurrent.futures.Executor} -- `'thread'` or
+            `'process'` to create a pool shut down on exit, or an executor
+            kept open. Use a process pool if only `max_workers` is given, and
+            no executor if neither is given. The workers of a created process
+            pool build the baseline Huffman decoding trees on start.
+            (default: {None})
+        max_workers {int} -- The maximum number of workers of a created pool.
+            (default: {None})
+
+    Raises:
+        ValueError -- When the executor is unknown.
+
+    Yields:
+        concurrent.futures.Executor -- The executor, or `None` to run
+            serially.
+    """
+
+    if isinstance(executor, concurrent.futures.Executor):
+        yield executor
+    elif executor is None and max_workers is None:
+        yield None
+    elif executor in (None, 'process'):
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers, initializer=warm_default_decode_trees) as pool:
+            yield pool
+    elif executor == 'thread':
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+            yield pool
     else:
-        cb, cr = np.split(Decoder(  # pylint: disable=invalid-name, unbalanced-tuple-unpacking
-            sliced[CHROMINANCE],
-            CHROMINANCE
-        ).decode(), 2)
-        data = {
-            Y: Decoder(sliced[LUMINANCE], LUMINANCE).decode(),
-            CB: cb,
-            CR: cr
-        }
+        raise ValueError(f'Executor ({executor}) must be "thread", "process" '
+                         'or an instance of concurrent.futures.Executor.')
 
-    for key, layer in data.items():
-        for idx, block in enumerate(layer):
-            # Inverse Quantization
-            layer[idx] = quantize(
-                block,
-                key,
-                quality=quality,
-                inverse=True
-            )
 
-            # 2D IDCT.
-            layer[idx] = idct2d(layer[idx])
+def _read_layers(file_object, size, grey_level, subsampling_mode, precision,  # pylint: disable=too-many-arguments
+                 color_conversion):
+    float_dtype, _ = PRECISIONS[precision]
+    img_arr = np.fromfile(file_object, dtype=np.uint8).reshape(
+        size if grey_level else (*size, 3)
+    )
 
-        # Calculate the size after subsampling and padding.
-        if key == Y:
-            padded_size = ((s // 8 + 1) * 8 if s % 8 else s for s in size)
-        else:
-            padded_size = ((s // 8 + 1) * 8 if s % 8 else s
-                           for s in subsampled_size)
-        # Combine the blocks into original image
-        data[key] = block_combine(layer, *padded_size)
+    # Color Space Conversion, Subsampling, Level Offset (Luminance) and
+    # Padding in one pass.
+    return forward_color(img_arr, subsampling_mode, dtype=float_dtype,
+                         conversion=color_conversion)
 
-    # Inverse Level Offset
-    data[Y] = data[Y] + 128
 
-    # Clip Padded Image
-    data[Y] = data[Y][:size[0], :size[1]]
-    if not grey_level:
-        data[CB] = data[CB][:subsampled_size[0], :subsampled_size[1]]
-        data[CR] = data[CR][:subsampled_size[0], :subsampled_size[1]]
+def _dct_layers(data, transform, precision):
+    # Block Slicing and 2D DCT of the layers of `_read_layers`.
+    return {
+        key: dct_transform(layer, chunk_size=TRANSFORM_CHUNK_SIZE,
+                           backend=transform, precision=precision)
+        for key, layer in data.items()
+    }
 
-        # Upsampling and Clipping
-        data[CB] = upsample(data[CB], subsampling_mode)[:size[0], :size[1]]
-        data[CR] = upsample(data[CR], subsampling_mode)[:size[0], :size[1]]
 
-        # Color Space Conversion
-        data = ycbcr2rgb(**data)
+def _quantize_layers(coefficients, quality, transform, quantization_tables,
+                     precision):
+    # Quantization and Rounding of the coefficients of `_dct_layers`.
+    return {
+        key: quantize_transform(
+            layer, key, quality=quality, backend=transform,
+            table=layer_table(quantization_tables, key),
+            precision=precision
+        )
+        for key, layer in coefficients.items()
+    }
 
-    # Rounding, Clipping and Flatten
-    for k, v in data.items():  # pylint: disable=invalid-name
-        data[k] = np.rint(np.clip(v, 0, 255)).flatten()
 
-    logging.getLogger(__name__).info(
-        'Time elapsed: %.4f seconds', (time.perf_counter() - start_time)
-    )
-    # Combine layers into signle raw data.
-    return (np.dstack((data.values()))
-            .flatten()
-            .astype(np.uint8))
+def _stack_components(data, grey_level):
+    # The quantized blocks of luminance (and chrominance with Cb followed by
+    # Cr) in the order of encoders.
+    if grey_level:
+        return (data[Y], )
+    return (data[Y], np.vstack((data[CB], data[CR])))
+
+
+def _encode_layers(components, size, grey_level, quality, subsampling_mode,  # pylint: disable=too-many-arguments, too-many-locals
+                   huffman_backend, optimize_huffman, entropy,
+                   restart_interval, executor, transform,
+                   quantization_tables):
+    # Entropy code the blocks of `_stack_components` and build the header of
+    # `compress`.
+    encoder_class, _ = ENTROPY_CODERS[entropy]
+    # Entropy Encoder
+    encoders = tuple(encoder_class(blocks, layer_type)
+                     for blocks, layer_type
+                     in zip(components, (LUMINANCE, CHROMINANCE)))
+
+    # Combine data as binary in the order:
+    #   LUMINANCE.DC, LUMINANCE.AC[, CHROMINANCE.DC, CHROMINANCE.AC]
+
+    header = {'entropy': entropy, 'transform': transform}
+    if quantization_tables is not None:
+        # Custom base quantization tables in the order of encoders.
+        header['quantization_tables'] = quantization_tables
+    if optimize_huffman:
+        if restart_interval is not None:
+            # The DC prediction restarts at the beginning of every segment.
+            for encoder in encoders:
+                diffs = np.diff(encoder.data[:, 0, 0].astype(int), prepend=0)
+                diffs[::restart_interval] = (
+                    encoder.data[::restart_interval, 0, 0]
+                )
+                encoder.diff_dc = tuple(diffs)
+        # Optimized Huffman tables in the order of encoders.
+        header['huffman_tables'] = tuple(encoder.optimize_huffman_table()
+                                         for encoder in encoders)
+
+    # Encode the components (concurrently with `executor`).
+    encoded = tuple((map if executor is None else executor.map)(
+        _encode_component, encoders,
+        itertools.repeat(huffman_backend),
+        itertools.repeat(restart_interval)
+    ))
+    order = tuple(component_bits[dc_ac]
+                  for component_bits, _ in encoded
+                  for dc_ac in (DC, AC))
+    bits = bitarray()
+    for part in order:
+        bits += part
+    data_slice_lengths = tuple(len(d) for d in order)
+    if restart_interval is not None:
+        # Offsets of byte-aligned segments in the order of
+        # `data_slice_lengths`.
+        header['restart_interval'] = restart_interval
+        header['segment_offsets'] = tuple(offsets[dc_ac]
+                                          for _, offsets in encoded
+                                          for dc_ac in (DC, AC))
+
+    return {
+        'data': bits,
+        'header': {
+            'size': size,
+            'grey_level': grey_level,
+            'quality': quality,
+            'subsampling_mode': subsampling_mode,
+            # Remaining bits length is the fake filled bits for 8 bits as a
+            # byte.
+            'remaining_bits_length': bits2bytes(len(bits)) * 8 - len(bits),
+            'data_slice_lengths': data_slice_lengths,
+            **header
+        }
+    }
+
+
+def _encode_component(encoder, huffman_backend, restart_interval):
+    if huffman_backend == 'string':
+        # Reference implementation with bit strings.
+        return ({dc_ac: bitarray(bits)
+                 for dc_ac, bits in encoder.encode().items()}, None)
+    if restart_interval is None:
+        return encoder.encode_bits(), None
+    options = ({} if encoder.huffman_table is None
+               else {'huffman_table': encoder.huffman_table})
+    return encode_segments(type(encoder), encoder.data, encoder.layer_type,
+                           restart_interval, **options)
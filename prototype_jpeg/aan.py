@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+
+
+# Fraction bits of the fixed-point multiplication constants.
+CONST_BITS = 13
+# Extra fraction bits of samples in the forward transform.
+PASS_BITS = 4
+# Fraction bits of dequantization multipliers and dequantized coefficients.
+DEQUANTIZE_BITS = 12
+INVERSE_BITS = 8
+
+# The scale factors of AAN transform outputs, `sqrt(2) * cos(k * pi / 16)`
+# except that of DC is 1.
+AAN_SCALE = np.array([1.] + [math.sqrt(2) * math.cos(k * math.pi / 16)
+                             for k in range(1, 8)])
+
+_FIX_0_382683433 = round(0.382683433 * (1 << CONST_BITS))
+_FIX_0_541196100 = round(0.541196100 * (1 << CONST_BITS))
+_FIX_0_707106781 = round(0.707106781 * (1 << CONST_BITS))
+_FIX_1_082392200 = round(1.082392200 * (1 << CONST_BITS))
+_FIX_1_306562965 = round(1.306562965 * (1 << CONST_BITS))
+_FIX_1_414213562 = round(1.414213562 * (1 << CONST_BITS))
+_FIX_1_847759065 = round(1.847759065 * (1 << CONST_BITS))
+_FIX_2_613125930 = round(2.613125930 * (1 << CONST_BITS))
+
+
+def forward_divisors(table):
+    """Fold the scale of `fdct` outputs into a quantization table.
+
+    Arguments:
+        table {np.ndarray} -- The 8 * 8 quantization table.
+
+    Returns:
+        np.ndarray -- The divisors quantizing `fdct` outputs.
+    """
+
+    return table * np.outer(AAN_SCALE, AAN_SCALE) * (8 << PASS_BITS)
+
+
+def inverse_multipliers(table):
+    """Fold the scale of `idct` inputs into a quantization table.
+
+    Arguments:
+        table {np.ndarray} -- The 8 * 8 quantization table.
+
+    Returns:
+        np.ndarray -- The fixed-point (with `DEQUANTIZE_BITS` fraction bits)
+            multipliers dequantizing the inputs of `idct`.
+    """
+
+    return np.rint(table * np.outer(AAN_SCALE, AAN_SCALE)
+                   * (1 << DEQUANTIZE_BITS)).astype(np.int64)
+
+
+def fdct(samples):
+    """Fixed-point separable 2D DCT of Arai, Agui and Nakajima.
+
+    The outputs are scaled by `AAN_SCALE[u] * AAN_SCALE[v] * 8 * 2 **
+    PASS_BITS` with respect to the orthonormal DCT, which is supposed to be
+    folded into the quantization by `forward_divisors`.
+
+    Arguments:
+        samples {np.ndarray} -- Integer samples within [-256, 255] in the
+            shape of (n, 8, 8).
+
+    Returns:
+        np.ndarray -- The scaled coefficients (int32) in the shape of
+            (n, 8, 8).
+    """
+
+    ret = np.left_shift(samples, PASS_BITS, dtype=np.int32)
+    # Rows, and then columns.
+    ret = _fdct_1d(ret)
+    return _fdct_1d(ret.swapaxes(-1, -2)).swapaxes(-1, -2)
+
+
+def idct(coefficients, multipliers):
+    """Fixed-point separable 2D IDCT of Arai, Agui and Nakajima, with
+    dequantization.
+
+    Arguments:
+        coefficients {np.ndarray} -- The quantized coefficients in the shape
+            of (n, 8, 8).
+        multipliers {np.ndarray} -- The multipliers returned by
+            `inverse_multipliers`.
+
+    Returns:
+        np.ndarray -- The rounded samples (int16) in the shape of (n, 8, 8).
+    """
+
+    # The products of multiplication may exceed 32 bits.
+    ret = _descale(np.multiply(coefficients, multipliers, dtype=np.int64),
+                   DEQUANTIZE_BITS - INVERSE_BITS)
+    # Columns, and then rows.
+    ret = _idct_1d(ret.swapaxes(-1, -2)).swapaxes(-1, -2)
+    ret = _idct_1d(ret)
+    return _descale(ret, INVERSE_BITS + 3).astype(np.int16)
+
+
+def _descale(arr, bits):
+    # Right shift with rounding.
+    return (arr + (1 << (bits - 1))) >> bits
+
+
+def _multiply(arr, const):
+    return _descale(arr * const, CONST_BITS)
+
+
+def _fdct_1d(arr):  # pylint: disable=too-many-locals
+    """8-point AAN DCT along the last axis (as `jfdctfst.c` of IJG)."""
+
+    tmp0 = arr[..., 0] + arr[..., 7]
+    tmp7 = arr[..., 0] - arr[..., 7]
+    tmp1 = arr[..., 1] + arr[..., 6]
+    tmp6 = arr[..., 1] - arr[..., 6]
+    tmp2 = arr[..., 2] + arr[..., 5]
+    tmp5 = arr[..., 2] - arr[..., 5]
+    tmp3 = arr[..., 3] + arr[..., 4]
+    tmp4 = arr[..., 3] - arr[..., 4]
+
+    # Even part.
+    tmp10 = tmp0 + tmp3
+    tmp13 = tmp0 - tmp3
+    tmp11 = tmp1 + tmp2
+    tmp12 = tmp1 - tmp2
+    z1 = _multiply(tmp12 + tmp13, _FIX_0_707106781)  # pylint: disable=invalid-name
+    out0 = tmp10 + tmp11
+    out4 = tmp10 - tmp11
+    out2 = tmp13 + z1
+    out6 = tmp13 - z1
+
+    # Odd part.
+    tmp10 = tmp4 + tmp5
+    tmp11 = tmp5 + tmp6
+    tmp12 = tmp6 + tmp7
+    z5 = _multiply(tmp10 - tmp12, _FIX_0_382683433)  # pylint: disable=invalid-name
+    z2 = _multiply(tmp10, _FIX_0_541196100) + z5  # pylint: disable=invalid-name
+    z4 = _multiply(tmp12, _FIX_1_306562965) + z5  # pylint: disable=invalid-name
+    z3 = _multiply(tmp11, _FIX_0_707106781)  # pylint: disable=invalid-name
+    z11 = tmp7 + z3
+    z13 = tmp7 - z3
+
+    return np.stack((out0, z11 + z4, out2, z13 - z2,
+                     out4, z13 + z2, out6, z11 - z4), axis=-1)
+
+
+def _idct_1d(arr):  # pylint: disable=too-many-locals
+    """8-point AAN IDCT along the last axis (as `jidctfst.c` of IJG)."""
+
+    # Even part.
+    tmp10 = arr[..., 0] + arr[..., 4]
+    tmp11 = arr[..., 0] - arr[..., 4]
+    tmp13 = arr[..., 2] + arr[..., 6]
+    tmp12 = _multiply(arr[..., 2] - arr[..., 6], _FIX_1_414213562) - tmp13
+    tmp0 = tmp10 + tmp13
+    tmp3 = tmp10 - tmp13
+    tmp1 = tmp11 + tmp12
+    tmp2 = tmp11 - tmp12
+
+    # Odd part.
+    z13 = arr[..., 5] + arr[..., 3]
+    z10 = arr[..., 5] - arr[..., 3]
+    z11 = arr[..., 1] + arr[..., 7]
+    z12 = arr[..., 1] - arr[..., 7]
+    tmp7 = z11 + z13
+    tmp11 = _multiply(z11 - z13, _FIX_1_414213562)
+    z5 = _multiply(z10 + z12, _FIX_1_847759065)  # pylint: disable=invalid-name
+    tmp10 = _multiply(z12, _FIX_1_082392200) - z5
+    tmp12 = z5 - _multiply(z10, _FIX_2_613125930)
+    tmp6 = tmp12 - tmp7
+    tmp5 = tmp11 - tmp6
+    tmp4 = tmp10 + tmp5
+
+    return np.stack((tmp0 + tmp7, tmp1 + tmp6, tmp2 + tmp5, tmp3 - tmp4,
+                     tmp3 + tmp4, tmp2 - tmp5, tmp1 - tmp6, tmp0 - tmp7),
+                    axis=-1)
@@ -0,0 +1,375 @@
+from bitarray import bitarray
+
+from .codec import Encoder, Decoder, DC, AC, EOB, ZRL
+
+
+# Probabilities of 0-bits are stored in `PROBABILITY_BITS` bits and adapt by
+# `1 / 2 ** ADAPTATION_SHIFT` of the error for each coded bit.
+PROBABILITY_BITS = 11
+ADAPTATION_SHIFT = 5
+_PROBABILITY_ONE = 1 << PROBABILITY_BITS
+_TOP = 1 << 24
+_MASK = 0xFFFFFFFF
+
+# The number of conditioning classes, categories and AC positions.
+_NCLASSES = 5
+_NCATEGORIES = 17
+_NPOSITIONS = 64
+# AC coefficients up to the position use the low frequency statistics of
+# magnitude.
+_LOW_FREQUENCY_POSITION = 5
+
+# Context layout of DC stream.
+_DC_MORE = 0
+_DC_ZERO = 1
+_DC_SIGN = _DC_ZERO + _NCLASSES
+_DC_FIRST = _DC_SIGN + _NCLASSES
+_DC_CATEGORY = _DC_FIRST + 2 * _NCLASSES
+_DC_MAGNITUDE = _DC_CATEGORY + _NCATEGORIES
+_DC_CONTEXTS = _DC_MAGNITUDE + _NCATEGORIES
+
+# Context layout of AC stream.
+_AC_EOB = 0
+_AC_ZERO = _AC_EOB + _NPOSITIONS
+_AC_FIRST = _AC_ZERO + _NPOSITIONS
+_AC_SIGN = _AC_FIRST + _NPOSITIONS
+_AC_CATEGORY = _AC_SIGN + 1
+_AC_MAGNITUDE = _AC_CATEGORY + 2 * _NCATEGORIES
+_AC_CONTEXTS = _AC_MAGNITUDE + 2 * _NCATEGORIES
+
+
+class RangeEncoder:
+    def __init__(self, ncontexts):
+        """Create an adaptive binary range encoder.
+
+        Every bit is coded with the adaptive probability of its context. The
+        carry propagation follows the range coder of LZMA.
+
+        Arguments:
+            ncontexts {int} -- The number of contexts.
+        """
+
+        self.probabilities = [_PROBABILITY_ONE >> 1] * ncontexts
+        self.output = bytearray()
+        self._low = 0
+        self._range = _MASK
+        # The pending byte which may still be changed by a carry, and the
+        # number of pending bytes (including the following 0xFFs).
+        self._cache = 0
+        self._cache_size = 1
+
+    def encode(self, context, bit):
+        """Encode a bit with the probability of its context.
+
+        Arguments:
+            context {int} -- The index of context.
+            bit {int or bool} -- The bit to be encoded.
+        """
+
+        probability = self.probabilities[context]
+        bound = (self._range >> PROBABILITY_BITS) * probability
+        if bit:
+            self._low += bound
+            self._range -= bound
+            self.probabilities[context] = (
+                probability - (probability >> ADAPTATION_SHIFT)
+            )
+        else:
+            self._range = bound
+            self.probabilities[context] = (
+                probability
+                + ((_PROBABILITY_ONE - probability) >> ADAPTATION_SHIFT)
+            )
+        while self._range < _TOP:
+            self._range <<= 8
+            self._shift_low()
+
+    def encode_magnitude(self, first, categories, magnitudes, value):
+        """Encode `abs(value) - 1` with the binarization of JPEG arithmetic
+        coding (Annex F.1.4.4 of the JPEG specification): a decision of zero,
+        the category in unary and the bits below the most significant bit.
+
+        Arguments:
+            first {int} -- The context of the first decision.
+            categories {int} -- The base context of categories.
+            magnitudes {int} -- The base context of magnitude bits.
+            value {int} -- The nonzero value.
+        """
+
+        magnitude = abs(value) - 1
+        self.encode(first, magnitude)
+        if not magnitude:
+            return
+        size = magnitude.bit_length()
+        for i in range(1, size):
+            self.encode(categories + i, 1)
+        self.encode(categories + size, 0)
+        for i in range(size - 2, -1, -1):
+            self.encode(magnitudes + size, (magnitude >> i) & 1)
+
+    def finish(self):
+        """Flush the encoder.
+
+        Returns:
+            bytes -- The encoded bytes.
+        """
+
+        for _ in range(5):
+            self._shift_low()
+        return bytes(self.output)
+
+    def _shift_low(self):
+        if self._low < 0xFF000000 or self._low > _MASK:
+            carry = self._low >> 32
+            temp = self._cache
+            while True:
+                self.output.append((temp + carry) & 0xFF)
+                temp = 0xFF
+                self._cache_size -= 1
+                if not self._cache_size:
+                    break
+            self._cache = (self._low >> 24) & 0xFF
+        self._cache_size += 1
+        self._low = (self._low & 0x00FFFFFF) << 8
+
+
+class RangeDecoder:
+    def __init__(self, data, ncontexts):
+        """Create a decoder of the bytes encoded by `RangeEncoder`.
+
+        Arguments:
+            data {bytes} -- The encoded bytes.
+            ncontexts {int} -- The number of contexts.
+        """
+
+        self.probabilities = [_PROBABILITY_ONE >> 1] * ncontexts
+        self._data = data
+        self._position = 0
+        self._range = _MASK
+        self._code = 0
+        for _ in range(5):
+            self._code = (self._code << 8) | self._next_byte()
+
+    def decode(self, context):
+        """Decode a bit with the probability of its context.
+
+        Arguments:
+            context {int} -- The index of context.
+
+        Returns:
+            int -- The decoded bit.
+        """
+
+        probability = self.probabilities[context]
+        bound = (self._range >> PROBABILITY_BITS) * probability
+        if self._code < bound:
+            self._range = bound
+            self.probabilities[context] = (
+                probability
+                + ((_PROBABILITY_ONE - probability) >> ADAPTATION_SHIFT)
+            )
+            bit = 0
+        else:
+            self._code -= bound
+            self._range -= bound
+            self.probabilities[context] = (
+                probability - (probability >> ADAPTATION_SHIFT)
+            )
+            bit = 1
+        while self._range < _TOP:
+            self._range <<= 8
+            self._code = (self._code << 8) | self._next_byte()
+        return bit
+
+    def decode_magnitude(self, first, categories, magnitudes):
+        """Decode `abs(value) - 1` encoded by `RangeEncoder.encode_magnitude`.
+
+        Arguments:
+            first {int} -- The context of the first decision.
+            categories {int} -- The base context of categories.
+            magnitudes {int} -- The base context of magnitude bits.
+
+        Raises:
+            ValueError -- When the category is out of the range.
+
+        Returns:
+            int -- The absolute value.
+        """
+
+        if not self.decode(first):
+            return 1
+        size = 1
+        while self.decode(categories + size):
+            size += 1
+            if size >= _NCATEGORIES:
+                raise ValueError('The category of magnitude is out of range.')
+        magnitude = 1
+        for _ in range(size - 1):
+            magnitude = (magnitude << 1) | self.decode(magnitudes + size)
+        return magnitude + 1
+
+    def _next_byte(self):
+        # Bytes after the end of data are regarded as 0s.
+        if self._position < len(self._data):
+            self._position += 1
+            return self._data[self._position - 1]
+        return 0
+
+
+class ArithmeticEncoder(Encoder):
+    """Encoder with adaptive binary arithmetic coding.
+
+    The differential DCs and run-length-encoded AC pairs are binarized in the
+    spirit of JPEG arithmetic coding (Annex F.1.4 of the JPEG specification)
+    and coded by `RangeEncoder`. DC and AC are coded in separate byte-aligned
+    streams, so the layout of bits is the same as the Huffman `Encoder`.
+    """
+
+    def encode(self):
+        """Encode differential DC and run-length-encoded AC with adaptive
+        binary arithmetic coding.
+
+        Returns:
+            dict -- A dictionary containing encoded DC and AC. The format is:
+                ```
+                ret = {DC: b'...', AC: b'...'}
+                ```
+        """
+
+        return {DC: self._encode_dc(), AC: self._encode_ac()}
+
+    def encode_bits(self):
+        """Encode differential DC and run-length-encoded AC into bits.
+
+        Returns:
+            dict -- A dictionary containing encoded DC and AC. The format is:
+                ```
+                ret = {DC: bitarray, AC: bitarray}
+                ```
+        """
+
+        ret = {}
+        for dc_ac, data in self.encode().items():
+            ret[dc_ac] = bitarray()
+            ret[dc_ac].frombytes(data)
+        return ret
+
+    def _encode_dc(self):
+        encoder = RangeEncoder(_DC_CONTEXTS)
+        # The conditioning class of the previous differential DC.
+        cls = 0
+        for diff in self.diff_dc:
+            diff = int(diff)
+            # A block follows.
+            encoder.encode(_DC_MORE, 1)
+            encoder.encode(_DC_ZERO + cls, diff)
+            if diff:
+                negative = diff < 0
+                encoder.encode(_DC_SIGN + cls, negative)
+                encoder.encode_magnitude(
+                    _DC_FIRST + 2 * cls + negative, _DC_CATEGORY,
+                    _DC_MAGNITUDE, diff
+                )
+            cls = _conditioning_class(diff)
+        encoder.encode(_DC_MORE, 0)
+        return encoder.finish()
+
+    def _encode_ac(self):
+        encoder = RangeEncoder(_AC_CONTEXTS)
+        # Current position of AC in zig-zag order (1 to 63).
+        position = 1
+        zeros = 0
+        for run, value in zip(*(arr.tolist()
+                                for arr in self.run_length_ac_arrays[1:])):
+            if (run, value) == EOB:
+                if position < _NPOSITIONS:
+                    encoder.encode(_AC_EOB + position, 1)
+                position = 1
+                continue
+            if (run, value) == ZRL:
+                zeros += 16
+                continue
+            zeros += run
+            encoder.encode(_AC_EOB + position, 0)
+            for _ in range(zeros):
+                encoder.encode(_AC_ZERO + position, 0)
+                position += 1
+            encoder.encode(_AC_ZERO + position, 1)
+            encoder.encode(_AC_SIGN, value < 0)
+            bank = _NCATEGORIES * (position > _LOW_FREQUENCY_POSITION)
+            encoder.encode_magnitude(
+                _AC_FIRST + position, _AC_CATEGORY + bank,
+                _AC_MAGNITUDE + bank, value
+            )
+            position += 1
+            zeros = 0
+        return encoder.finish()
+
+
+class ArithmeticDecoder(Decoder):
+    """Decoder of the bits encoded by `ArithmeticEncoder`."""
+
+    def _get_dc(self):
+        decoder = RangeDecoder(_to_bytes(self.data[DC]), _DC_CONTEXTS)
+        ret = []
+        dc = 0  # pylint: disable=invalid-name
+        cls = 0
+        while decoder.decode(_DC_MORE):
+            diff = 0
+            if decoder.decode(_DC_ZERO + cls):
+                negative = decoder.decode(_DC_SIGN + cls)
+                diff = decoder.decode_magnitude(
+                    _DC_FIRST + 2 * cls + negative, _DC_CATEGORY,
+                    _DC_MAGNITUDE
+                )
+                if negative:
+                    diff = -diff
+            dc += diff  # pylint: disable=invalid-name
+            ret.append(dc)
+            cls = _conditioning_class(diff)
+        self._dc = tuple(ret)
+
+    def _get_run_length_ac(self):
+        decoder = RangeDecoder(_to_bytes(self.data[AC]), _AC_CONTEXTS)
+        ret = []
+        for _ in range(len(self.dc)):
+            position = 1
+            while (position < _NPOSITIONS
+                   and not decoder.decode(_AC_EOB + position)):
+                zeros = 0
+                while not decoder.decode(_AC_ZERO + position):
+                    zeros += 1
+                    position += 1
+                    if position >= _NPOSITIONS:
+                        raise ValueError('The run of zeros exceeds the end '
+                                         'of block.')
+                negative = decoder.decode(_AC_SIGN)
+                bank = _NCATEGORIES * (position > _LOW_FREQUENCY_POSITION)
+                value = decoder.decode_magnitude(
+                    _AC_FIRST + position, _AC_CATEGORY + bank,
+                    _AC_MAGNITUDE + bank
+                )
+                ret.extend([ZRL] * (zeros // 16))
+                ret.append((zeros % 16, -value if negative else value))
+                position += 1
+            ret.append(EOB)
+        self._run_length_ac = ret
+
+
+def _conditioning_class(diff):
+    """Classify a differential DC as zero, small positive, small negative,
+    large positive or large negative (Annex F.1.4.4.1.2 of the JPEG
+    specification with the bounds L = 0 and U = 1).
+    """
+
+    if not diff:
+        return 0
+    if abs(diff) <= 2:
+        return 1 if diff > 0 else 2
+    return 3 if diff > 0 else 4
+
+
+def _to_bytes(bits):
+    if isinstance(bits, str):
+        bits = bitarray(bits)
+    return bits.tobytes()
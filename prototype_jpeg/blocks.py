@@ -0,0 +1,79 @@
+import numpy as np
+
+
+BLOCK_SIZE = 8
+
+
+def padded_shape(shape):
+    """Return the shape of a layer padded to whole blocks."""
+    return tuple(-(-s // BLOCK_SIZE) * BLOCK_SIZE for s in shape)
+
+
+def pad_edges(padded, shape):
+    """Fill the pad margin of a block-aligned buffer (in place) by replicating
+    the last row and column of the layer, which is smoother than constant
+    padding, so the edge blocks have less high-frequency energy.
+
+    Arguments:
+        padded {np.ndarray} -- The block-aligned buffer whose top-left
+            `shape` is the layer.
+        shape {tuple} -- The shape of the layer in the format of
+            `(nrows, ncols)`.
+
+    Returns:
+        np.ndarray -- `padded`.
+    """
+
+    nrows, ncols = shape
+    if ncols < padded.shape[1]:
+        padded[:nrows, ncols:] = padded[:nrows, ncols - 1:ncols]
+    if nrows < padded.shape[0]:
+        padded[nrows:] = padded[nrows - 1]
+    return padded
+
+
+def pad_layer(layer, level_offset=0, dtype=None):
+    """Write a level offset layer into a new block-aligned buffer, and fill
+    only the pad margin by `pad_edges`.
+
+    Arguments:
+        layer {np.ndarray} -- The 2D layer.
+
+    Keyword Arguments:
+        level_offset {int} -- The value subtracted from the layer.
+            (default: {0})
+        dtype {np.dtype} -- The dtype of the buffer, or that of `layer` if
+            not given. (default: {None})
+
+    Returns:
+        np.ndarray -- The padded layer.
+    """
+
+    padded = np.empty(padded_shape(layer.shape), dtype=dtype or layer.dtype)
+    nrows, ncols = layer.shape
+    np.subtract(layer, level_offset, out=padded[:nrows, :ncols],
+                casting='unsafe')
+    return pad_edges(padded, layer.shape)
+
+
+def block_view(padded):
+    """Return the blocks of a block-aligned layer without copying.
+
+    Arguments:
+        padded {np.ndarray} -- The block-aligned (and C-contiguous) layer.
+
+    Raises:
+        ValueError -- When the layer is not block-aligned.
+
+    Returns:
+        np.ndarray -- The view in the shape of `(block rows, blocks per row,
+            8, 8)`, whose blocks in the row-major order are those of
+            `utils.block_slice`. Writing into the view writes into the layer.
+    """
+
+    nrows, ncols = padded.shape
+    if nrows % BLOCK_SIZE or ncols % BLOCK_SIZE:
+        raise ValueError(f'The shape of layer {padded.shape} should be '
+                         f'multiples of {BLOCK_SIZE}.')
+    return padded.reshape(nrows // BLOCK_SIZE, BLOCK_SIZE,
+                          ncols // BLOCK_SIZE, BLOCK_SIZE).swapaxes(1, 2)
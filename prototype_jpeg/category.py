@@ -0,0 +1,84 @@
+import numpy as np
+
+
+MAX_CATEGORY = 15
+MAX_VALUE = 2 ** MAX_CATEGORY - 1
+
+# Dense lookup tables for every value in [-MAX_VALUE, MAX_VALUE], indexed by
+# `value + MAX_VALUE`.
+_VALUES = np.arange(-MAX_VALUE, MAX_VALUE + 1)
+# The category of a nonzero value is its bit length.
+_CATEGORY_LUT = np.frexp(_VALUES)[1].astype(np.uint8)
+# Negative values are stored as one's complement in the category bits.
+_FIXED_CODE_INDEX_LUT = np.where(
+    _VALUES < 0,
+    _VALUES + (1 << _CATEGORY_LUT.astype(np.int64)) - 1,
+    _VALUES
+).astype(np.uint16)
+
+
+def category(values):
+    """Return the magnitude categories (sizes) of values.
+
+    It is equivalent to finding the row containing the value in
+    `codec.HUFFMAN_CATEGORIES`.
+
+    Arguments:
+        values {int or array-like} -- Integers within [-32767, 32767].
+
+    Raises:
+        ValueError -- When any value is out of the range.
+
+    Returns:
+        np.ndarray -- The categories in the same shape of `values`.
+    """
+
+    return _CATEGORY_LUT[_lut_index(values)]
+
+
+def fixed_code_index(values):
+    """Return the fixed code indices (magnitude bits) of values.
+
+    It is equivalent to finding the column containing the value in
+    `codec.HUFFMAN_CATEGORIES`.
+
+    Arguments:
+        values {int or array-like} -- Integers within [-32767, 32767].
+
+    Raises:
+        ValueError -- When any value is out of the range.
+
+    Returns:
+        np.ndarray -- The fixed code indices in the same shape of `values`.
+    """
+
+    return _FIXED_CODE_INDEX_LUT[_lut_index(values)]
+
+
+def inverse_fixed_code_index(indices, categories):
+    """Return the values of fixed code indices in given categories.
+
+    It is equivalent to `HUFFMAN_CATEGORIES[categories][indices]`.
+
+    Arguments:
+        indices {int or array-like} -- The fixed code indices.
+        categories {int or array-like} -- The categories of indices.
+
+    Returns:
+        np.ndarray -- The values in the broadcast shape of arguments.
+    """
+
+    indices = np.asarray(indices, dtype=np.int64)
+    categories = np.asarray(categories, dtype=np.int64)
+    return np.where(indices >= ((1 << categories) >> 1),
+                    indices,
+                    indices - (1 << categories) + 1)
+
+
+def _lut_index(values):
+    values = np.asarray(values, dtype=np.int64)
+    if np.any(np.abs(values) > MAX_VALUE):
+        raise ValueError(
+            f'Value should be within [-{MAX_VALUE}, {MAX_VALUE}].'
+        )
+    return values + MAX_VALUE
@@ -1,14 +1,20 @@
-import collections
+import collections.abc
+import functools
 import itertools
 
 from bidict import bidict
+from bitarray import bitarray
 import numpy as np
 
+from .category import category, fixed_code_index, inverse_fixed_code_index
+from .huffman import (codeword_lut, encode_dc, encode_ac, decode_tree,
+                      cached_decode_tree, decode_values, optimal_code_spec,
+                      canonical_codewords, pack_bits)
+from .runlength import EOB, ZRL, encode_run_length_blocks, run_length_blocks
 from .utils import Y, CB, CR
+from .zigzag import zig_zag
 
 
-EOB = (0, 0)
-ZRL = (15, 0)
 DC = 'DC'
 AC = 'AC'
 LUMINANCE = frozenset({Y})
@@ -16,7 +22,7 @@ CHROMINANCE = frozenset({CB, CR})
 
 
 class Encoder:
-    def __init__(self, data, layer_type):
+    def __init__(self, data, layer_type, huffman_table=None):
         """Create a encoder based on baseline JPEG Huffman table.
 
         Arguments:
@@ -25,13 +31,20 @@ class Encoder:
                 {DC: '..010..', AC: '..010..', }
             layer_type {LUMINANCE or CHROMINANCE} -- Specify the layer type of
                 data.
+
+        Keyword Arguments:
+            huffman_table {dict} -- The DC and AC Huffman tables in the format
+                of `{DC: bidict, AC: bidict}`. Use the baseline JPEG Huffman
+                table of `layer_type` if not given. (default: {None})
         """
 
         self.data = data
         self.layer_type = layer_type
+        self.huffman_table = huffman_table
         # List containing differential DCs for multiple blocks.
         self._diff_dc = None
-        # List containing run-length-encoding AC pairs for multiple blocks.
+        # Arrays `(blocks, runs, values)` containing run-length-encoding AC
+        # pairs for multiple blocks.
         self._run_length_ac = None
 
     @property
@@ -46,13 +59,21 @@ class Encoder:
 
     @property
     def run_length_ac(self):
-        if self._run_length_ac is None:
-            self._get_run_length_ac()
-        return self._run_length_ac
+        return list(zip(*(arr.tolist()
+                          for arr in self.run_length_ac_arrays[1:])))
 
     @run_length_ac.setter
     def run_length_ac(self, value):
-        self._run_length_ac = value
+        pairs = np.array(value, dtype=int).reshape(-1, 2)
+        runs, values = pairs[:, 0], pairs[:, 1]
+        eobs = (runs == 0) & (values == 0)
+        self._run_length_ac = (np.cumsum(eobs) - eobs, runs, values)
+
+    @property
+    def run_length_ac_arrays(self):
+        if self._run_length_ac is None:
+            self._get_run_length_ac()
+        return self._run_length_ac
 
     def encode(self):
         """Encode differential DC and run-length-encoded AC with baseline JPEG
@@ -66,62 +87,140 @@ class Encoder:
         """
 
         ret = {}
-        ret[DC] = ''.join(encode_huffman(v, self.layer_type)
+        ret[DC] = ''.join(encode_huffman(v, self.layer_type,
+                                         huffman_table=self.huffman_table)
                           for v in self.diff_dc)
-        ret[AC] = ''.join(encode_huffman(v, self.layer_type)
+        ret[AC] = ''.join(encode_huffman(v, self.layer_type,
+                                         huffman_table=self.huffman_table)
                           for v in self.run_length_ac)
         return ret
 
+    def encode_codewords(self):
+        """Vectorized counterpart of `encode`. Encode differential DC and
+        run-length-encoded AC into merged codeword arrays which could be packed
+        by `huffman.pack_bits`.
+
+        Returns:
+            dict -- A dictionary containing `(codes, lengths)` arrays of encoded
+                DC and AC. The format is:
+                ```
+                ret = {DC: (codes, lengths), AC: (codes, lengths)}
+                ```
+        """
+
+        _, runs, values = self.run_length_ac_arrays
+        ret = {}
+        ret[DC] = encode_dc(self.diff_dc, self._codeword_lut(DC))
+        ret[AC] = encode_ac(runs, values, self._codeword_lut(AC))
+        return ret
+
+    def encode_bits(self):
+        """Encode differential DC and run-length-encoded AC into packed bits.
+
+        It is the common interface of entropy coders used by `compress`.
+
+        Returns:
+            dict -- A dictionary containing encoded DC and AC. The format is:
+                ```
+                ret = {DC: bitarray, AC: bitarray}
+                ```
+        """
+
+        ret = {}
+        for dc_ac, (codes, lengths) in self.encode_codewords().items():
+            buffer, nbits = pack_bits(codes, lengths)
+            ret[dc_ac] = bitarray()
+            ret[dc_ac].frombytes(buffer.tobytes())
+            del ret[dc_ac][nbits:]
+        return ret
+
+    def optimize_huffman_table(self):
+        """Replace `self.huffman_table` with the optimal Huffman tables for the
+        symbol frequencies of differential DC and run-length-encoded AC.
+
+        Returns:
+            dict -- The specification of the optimal tables in the format of
+                `{DC: (bits, huffval), AC: (bits, huffval)}`. See
+                `huffman.optimal_code_spec`.
+        """
+
+        _, runs, values = self.run_length_ac_arrays
+        spec = {
+            DC: optimal_code_spec(np.bincount(
+                category(self.diff_dc), minlength=16
+            )),
+            AC: optimal_code_spec(np.bincount(
+                runs * 16 + category(values), minlength=256
+            ))
+        }
+        self.huffman_table = {dc_ac: build_huffman_table(spec[dc_ac], dc_ac)
+                              for dc_ac in (DC, AC)}
+        return spec
+
+    def _codeword_lut(self, dc_ac):
+        return huffman_codeword_lut(dc_ac, self.layer_type, self.huffman_table)
+
     def _get_diff_dc(self):
         """Calculate the differential DC of given data."""
         self._diff_dc = tuple(encode_differential(self.data[:, 0, 0]))
 
     def _get_run_length_ac(self):
         """Calculate the run-length-encoded AC of given data."""
-        self._run_length_ac = []
-        for block in self.data:
-            self._run_length_ac.extend(
-                encode_run_length(tuple(iter_zig_zag(block))[1:])
-            )
+        self._run_length_ac = encode_run_length_blocks(
+            zig_zag(self.data)[:, 1:]
+        )
 
 
 class Decoder:
-    def __init__(self, data, layer_type):
+    def __init__(self, data, layer_type, huffman_table=None):
         """Create a decoder based on baseline JPEG Huffman table.
 
         Arguments:
-            data {dict} -- A dictionary containing DC and AC bit string as
-                following format.
+            data {dict} -- A dictionary containing DC and AC bits (bitarray or
+                bit string) as following format.
                 {DC: '.01..', AC: '.01..'}
             layer_type {LUMINANCE or CHROMINANCE} -- Specify the layer type of
                 data.
+
+        Keyword Arguments:
+            huffman_table {dict} -- The DC and AC Huffman tables in the format
+                of `{DC: bidict, AC: bidict}`. Use the baseline JPEG Huffman
+                table of `layer_type` if not given. (default: {None})
         """
 
         self.data = data
         self.layer_type = layer_type
+        self.huffman_table = huffman_table
 
         # A list containing all DC of blocks.
         self._dc = None
+        # A list containing run-length-encoding AC pairs for multiple blocks.
+        self._run_length_ac = None
         # A nested 2D list containing all AC of blocks without zig-zag
         # iteration.
         self._ac = None
 
     def decode(self):
-        if (self.layer_type == CHROMINANCE
-                and (len(self.dc) % 2 or len(self.ac) % 2)):
-            raise ValueError(f'The length of DC chrominance {len(self.dc)} '
-                             f'or AC chrominance {len(self.ac)} cannot be '
+        ret = self.decode_blocks()
+        if self.layer_type == CHROMINANCE and len(ret) % 2:
+            raise ValueError(f'The length of chrominance {len(ret)} cannot be '
                              'divided by 2 evenly to seperate into Cb and Cr.')
+        return ret
 
-        shaped = {}
-        if len(self.dc) != len(self.ac):
-            raise ValueError(f'DC size {len(self.dc)} is not equal to AC size '
-                             f'{len(self.ac)}.')
+    def decode_blocks(self):
+        """Decode the blocks without checking whether chrominance blocks can
+        be separated into Cb and Cr, e.g. for a restart segment.
 
-        shaped = np.array(tuple(inverse_iter_zig_zag((dc, ) + ac, size=8)
-                                for dc, ac in zip(self.dc, self.ac)))
+        Raises:
+            ValueError -- When the numbers of decoded DC and AC differ.
 
-        return shaped
+        Returns:
+            np.ndarray -- The quantized blocks (int16, which holds all the
+                categories of baseline JPEG) in the shape of (n, 8, 8).
+        """
+
+        pairs = np.array(self.run_length_ac, dtype=np.int32).reshape(-1, 2)
+        return run_length_blocks(self.dc, pairs[:, 0], pairs[:, 1])
 
     @property
     def dc(self):  # pylint: disable=invalid-name
@@ -129,6 +228,12 @@ class Decoder:
             self._get_dc()
         return self._dc
 
+    @property
+    def run_length_ac(self):
+        if self._run_length_ac is None:
+            self._get_run_length_ac()
+        return self._run_length_ac
+
     @property
     def ac(self):  # pylint: disable=invalid-name
         if self._ac is None:
@@ -136,12 +241,17 @@ class Decoder:
         return self._ac
 
     def _get_dc(self):
-        self._dc = tuple(decode_differential(decode_huffman(
+        self._dc = tuple(decode_differential(decode_values(
             self.data[DC],
-            DC,
-            self.layer_type
+            self._decode_tree(DC)
         )))
 
+    def _get_run_length_ac(self):
+        self._run_length_ac = decode_values(
+            self.data[AC],
+            self._decode_tree(AC)
+        )
+
     def _get_ac(self):
         def isplit(iterable, splitter):
             ret = []
@@ -151,13 +261,97 @@ class Decoder:
                     yield ret
                     ret = []
 
-        self._ac = tuple(decode_run_length(pairs) for pairs in isplit(
-            decode_huffman(self.data[AC], AC, self.layer_type),
-            EOB
-        ))
+        self._ac = tuple(decode_run_length(pairs)
+                         for pairs in isplit(self.run_length_ac, EOB))
+
+    def _decode_tree(self, dc_ac):
+        return huffman_decode_tree(dc_ac, self.layer_type, self.huffman_table)
+
+
+@functools.lru_cache(maxsize=None)
+def default_codeword_lut(dc_ac, layer_type):
+    """Return the cached codeword lookup arrays of baseline JPEG Huffman
+    table."""
+    return codeword_lut(HUFFMAN_CATEGORY_CODEWORD[dc_ac][layer_type])
+
+
+@functools.lru_cache(maxsize=None)
+def default_decode_tree(dc_ac, layer_type):
+    """Return the cached decoding tree of baseline JPEG Huffman table."""
+    return decode_tree(HUFFMAN_CATEGORY_CODEWORD[dc_ac][layer_type])
+
+
+def huffman_codeword_lut(dc_ac, layer_type, huffman_table=None):
+    """Return the codeword lookup arrays of a Huffman table.
+
+    Arguments:
+        dc_ac {DC or AC} -- The type of Huffman table.
+        layer_type {LUMINANCE or CHROMINANCE} -- The layer type.
+
+    Keyword Arguments:
+        huffman_table {dict} -- The DC and AC Huffman tables in the format of
+            `{DC: bidict, AC: bidict}`. Use the baseline JPEG Huffman table of
+            `layer_type` if not given. (default: {None})
+
+    Returns:
+        tuple -- See `huffman.codeword_lut`.
+    """
+
+    if huffman_table is None:
+        return default_codeword_lut(dc_ac, layer_type)
+    return codeword_lut(huffman_table[dc_ac])
+
 
+def huffman_decode_tree(dc_ac, layer_type, huffman_table=None):
+    """Return the (cached) decoding tree of a Huffman table.
 
-def encode_huffman(value, layer_type):
+    Arguments:
+        dc_ac {DC or AC} -- The type of Huffman table.
+        layer_type {LUMINANCE or CHROMINANCE} -- The layer type.
+
+    Keyword Arguments:
+        huffman_table {dict} -- See `huffman_codeword_lut`. (default: {None})
+
+    Returns:
+        decodetree -- See `huffman.decode_tree`.
+    """
+
+    if huffman_table is None:
+        return default_decode_tree(dc_ac, layer_type)
+    return cached_decode_tree(frozenset(huffman_table[dc_ac].items()))
+
+
+def warm_default_decode_trees():
+    """Build the cached decoding trees of all baseline JPEG Huffman tables,
+    e.g. in the initializer of a worker process, so that its first decoding
+    task does not pay for them.
+    """
+
+    for dc_ac in (DC, AC):
+        for layer_type in (LUMINANCE, CHROMINANCE):
+            default_decode_tree(dc_ac, layer_type)
+
+
+def build_huffman_table(spec, dc_ac):
+    """Build a Huffman table from its specification.
+
+    Arguments:
+        spec {tuple} -- The specification `(bits, huffval)` of Huffman code,
+            where the symbols of AC are `run * 16 + size`.
+        dc_ac {DC or AC} -- The type of Huffman table.
+
+    Returns:
+        bidict -- The Huffman table in the same format as
+            `HUFFMAN_CATEGORY_CODEWORD[dc_ac][layer_type]`.
+    """
+
+    return bidict({
+        (symbol if dc_ac == DC else divmod(symbol, 16)): codeword
+        for symbol, codeword in canonical_codewords(*spec).items()
+    })
+
+
+def encode_huffman(value, layer_type, huffman_table=None):
     """Encode the Huffman coding of value.
 
     Arguments:
@@ -165,6 +359,11 @@ def encode_huffman(value, layer_type):
         layer_type {LUMINANCE or CHROMINANCE} -- Specify the layer type of
             value.
 
+    Keyword Arguments:
+        huffman_table {dict} -- The DC and AC Huffman tables in the format of
+            `{DC: bidict, AC: bidict}`. Use the baseline JPEG Huffman table of
+            `layer_type` if not given. (default: {None})
+
     Raises:
         ValueError -- When the value is out of the range.
 
@@ -172,29 +371,27 @@ def encode_huffman(value, layer_type):
         str -- Huffman encoded bit array.
     """
 
-    def index_2d(table, target):
-        for i, row in enumerate(table):
-            for j, element in enumerate(row):
-                if target == element:
-                    return (i, j)
-        raise ValueError('Cannot find the target value in the table.')
+    if huffman_table is None:
+        huffman_table = {DC: HUFFMAN_CATEGORY_CODEWORD[DC][layer_type],
+                         AC: HUFFMAN_CATEGORY_CODEWORD[AC][layer_type]}
 
-    if not isinstance(value, collections.Iterable):  # DC
+    if not isinstance(value, collections.abc.Iterable):  # DC
         if value <= -2048 or value >= 2048:
             raise ValueError(
                 f'Differential DC {value} should be within [-2047, 2047].'
             )
 
-        size, fixed_code_idx = index_2d(HUFFMAN_CATEGORIES, value)
+        size = int(category(value))
+        fixed_code_idx = int(fixed_code_index(value))
 
         if size == 0:
-            return HUFFMAN_CATEGORY_CODEWORD[DC][layer_type][size]
-        return (HUFFMAN_CATEGORY_CODEWORD[DC][layer_type][size]
+            return huffman_table[DC][size]
+        return (huffman_table[DC][size]
                 + '{:0{padding}b}'.format(fixed_code_idx, padding=size))
     # AC
     value = tuple(value)
     if value in (EOB, ZRL):
-        return HUFFMAN_CATEGORY_CODEWORD[AC][layer_type][value]
+        return huffman_table[AC][value]
 
     run, nonzero = value
     if nonzero == 0 or nonzero <= -1024 or nonzero >= 1024:
@@ -203,8 +400,9 @@ def encode_huffman(value, layer_type):
             'or (0, 1023].'
         )
 
-    size, fixed_code_idx = index_2d(HUFFMAN_CATEGORIES, nonzero)
-    return (HUFFMAN_CATEGORY_CODEWORD[AC][layer_type][(run, size)]
+    size = int(category(nonzero))
+    fixed_code_idx = int(fixed_code_index(nonzero))
+    return (huffman_table[AC][(run, size)]
             + '{:0{padding}b}'.format(fixed_code_idx, padding=size))
 
 
@@ -259,19 +457,19 @@ def decode_huffman(bit_seq, dc_ac, layer_type):
                     if size == 0:
                         yield 0
                     else:
-                        yield HUFFMAN_CATEGORIES[size][diff_value(
+                        yield int(inverse_fixed_code_index(diff_value(
                             current_idx + len(current_slice),
                             size
-                        )]
+                        ), size))
                 else:  # AC
                     run, size = key
                     if key in (EOB, ZRL):
                         yield key
                     else:
-                        yield (run, HUFFMAN_CATEGORIES[size][diff_value(
+                        yield (run, int(inverse_fixed_code_index(diff_value(
                             current_idx + len(current_slice),
                             size
-                        )])
+                        ), size)))
 
                 current_idx += len(current_slice) + size
                 break
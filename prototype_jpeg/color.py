@@ -0,0 +1,339 @@
+import itertools
+
+import numpy as np
+
+from .blocks import pad_edges, padded_shape
+from .utils import Y, CB, CR
+
+
+# The rows of Y, Cb and Cr of the color matrix of `utils.rgb2ycbcr`.
+RGB2YCBCR_MATRIX = np.array((
+    (0.299, 0.587, 0.114),
+    (-0.168736, -0.331264, 0.5),
+    (0.5, -0.418688, -0.081312)
+))
+
+# The maximum number of pixels converted at once to bound the memory of
+# temporaries.
+COLOR_CHUNK_SIZE = 1 << 16
+
+# Fraction bits of the fixed-point integer color conversion.
+SCALE_BITS = 16
+
+
+def subsampling_factors(subsampling_mode):
+    """Return the factors of rows and columns of chroma subsampling, which is
+    the same as `utils.downsample`.
+
+    Arguments:
+        subsampling_mode {1 or 2 or 4} -- Subsampling ratio (4:mode).
+
+    Raises:
+        ValueError -- When the mode is unknown.
+
+    Returns:
+        tuple -- The factors in the format of `(rows, columns)`.
+    """
+
+    if subsampling_mode not in {1, 2, 4}:
+        raise ValueError(f'Mode ({subsampling_mode}) must be 1, 2 or 4.')
+    if subsampling_mode == 4:
+        return (1, 1)
+    return (3 - subsampling_mode, 2)
+
+
+def layer_shapes(size, grey_level=False, subsampling_mode=1):
+    """Return the shapes of layers of an image (before padding).
+
+    Arguments:
+        size {tuple} -- The size of image in the format of `(nrows, ncols)`.
+
+    Keyword Arguments:
+        grey_level {bool} -- Whether the image is grey level.
+            (default: {False})
+        subsampling_mode {1 or 2 or 4} -- Subsampling ratio (4:mode).
+            (default: {1})
+
+    Returns:
+        dict -- The shapes in the format of `{Y: shape[, CB: shape, CR:
+            shape]}`.
+    """
+
+    ret = {Y: tuple(size)}
+    if not grey_level:
+        factors = subsampling_factors(subsampling_mode)
+        ret[CB] = ret[CR] = tuple(-(-s // f) for s, f in zip(size, factors))
+    return ret
+
+
+def forward_color(pixels, subsampling_mode=1, dtype=np.float64, out=None,  # pylint: disable=too-many-locals
+                  conversion='float'):
+    """Convert pixels into level offset and padded layers for the transform.
+
+    The color conversion is applied to the interleaved `(nrows, ncols, 3)`
+    pixels in chunks of rows, and the chrominance is computed only at the
+    subsampled positions (the first pixel of every group, as
+    `utils.downsample`). Y is level offset by 128. The results are written
+    directly into block-aligned buffers whose padding is filled by
+    replicating the edges (`blocks.pad_edges`).
+
+    Arguments:
+        pixels {np.ndarray} -- The uint8 pixels in the shape of
+            `(nrows, ncols)` (grey level) or `(nrows, ncols, 3)` (RGB).
+
+    Keyword Arguments:
+        subsampling_mode {1 or 2 or 4} -- Subsampling ratio (4:mode).
+            (default: {1})
+        dtype {np.dtype} -- The float dtype of layers of the float
+            conversion. The layers of the integer conversion are int16.
+            (default: {np.float64})
+        out {dict} -- The padded buffers in the format of `{Y: np.ndarray[,
+            CB: np.ndarray, CR: np.ndarray]}`, e.g. reused buffers. Allocate
+            new ones if not given. (default: {None})
+        conversion {str} -- The name of color conversion in
+            `COLOR_CONVERSIONS`. (default: {'float'})
+
+    Returns:
+        dict -- The padded layers in the format of `{Y: np.ndarray[, CB:
+            np.ndarray, CR: np.ndarray]}`.
+    """
+
+    grey_level = pixels.ndim == 2
+    shapes = layer_shapes(pixels.shape[:2], grey_level, subsampling_mode)
+    rgb2ycbcr, _ = COLOR_CONVERSIONS[conversion]
+    if out is None:
+        dtype = np.int16 if conversion == 'integer' else dtype
+        out = {key: np.empty(padded_shape(shape), dtype=dtype)
+               for key, shape in shapes.items()}
+
+    if grey_level:
+        nrows, ncols = shapes[Y]
+        np.subtract(pixels, 128, out=out[Y][:nrows, :ncols],
+                    dtype=out[Y].dtype)
+    else:
+        factors = subsampling_factors(subsampling_mode)
+        # Rows of chunks are multiples of the subsampling factor of rows.
+        rows_per_chunk = max(1, COLOR_CHUNK_SIZE // pixels.shape[1]
+                             // factors[0]) * factors[0]
+        for start in range(0, pixels.shape[0], rows_per_chunk):
+            chunk = pixels[start:start + rows_per_chunk]
+            # Luminance
+            rgb2ycbcr(chunk, Y, out[Y][start:start + len(chunk),
+                                       :pixels.shape[1]])
+            # Chrominance at the subsampled positions.
+            subsampled = chunk[::factors[0], ::factors[1]]
+            sub_start = start // factors[0]
+            for key in (CB, CR):
+                rgb2ycbcr(subsampled, key, out[key][
+                    sub_start:sub_start + len(subsampled),
+                    :subsampled.shape[1]
+                ])
+
+    for key, shape in shapes.items():
+        # Padding
+        pad_edges(out[key], shape)
+    return out
+
+
+def inverse_color(layers, subsampling_mode=1, out=None, conversion='float'):
+    """Convert layers of the inverse transform into uint8 pixels.
+
+    The upsampling of chrominance is fused into the color conversion: the
+    chrominance terms of the color matrix are computed once per subsampled
+    sample, and added to the luminance of every pixel of its group, so the
+    full resolution chrominance is never materialized. The conversion,
+    rounding and clipping are applied in chunks of rows and written directly
+    into the (interleaved) output.
+
+    Arguments:
+        layers {dict} -- The layers in the format of `{Y: np.ndarray[, CB:
+            np.ndarray, CR: np.ndarray]}` without the level offset of
+            chrominance, i.e. Y within [0, 255], Cb and Cr within [-128, 127].
+            Cb and Cr are subsampled (as `utils.downsample`).
+
+    Keyword Arguments:
+        subsampling_mode {1 or 2 or 4} -- Subsampling ratio (4:mode) of Cb
+            and Cr. (default: {1})
+        out {np.ndarray} -- The uint8 output in the shape of `(nrows, ncols)`
+            (grey level) or `(nrows, ncols, 3)` (RGB), e.g. a reused buffer.
+            Allocate a new one if not given. (default: {None})
+        conversion {str} -- The name of color conversion in
+            `COLOR_CONVERSIONS`. (default: {'float'})
+
+    Returns:
+        np.ndarray -- The uint8 pixels.
+    """
+
+    grey_level = CB not in layers
+    nrows, ncols = layers[Y].shape
+    _, ycbcr2rgb = COLOR_CONVERSIONS[conversion]
+    if out is None:
+        out = np.empty((nrows, ncols) if grey_level else (nrows, ncols, 3),
+                       dtype=np.uint8)
+
+    factors = (1, 1) if grey_level else subsampling_factors(subsampling_mode)
+    # Rows of chunks are multiples of the subsampling factor of rows.
+    rows_per_chunk = max(1, COLOR_CHUNK_SIZE // ncols
+                         // factors[0]) * factors[0]
+    for start in range(0, nrows, rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        if grey_level:
+            # No conversion but rounding and clipping of a copy.
+            _store(np.array(layers[Y][rows]), out[rows])
+        else:
+            sub_rows = slice(start // factors[0],
+                             (start + rows_per_chunk) // factors[0])
+            ycbcr2rgb(layers[Y][rows], layers[CB][sub_rows],
+                      layers[CR][sub_rows], factors, out[rows])
+    return out
+
+
+def float_rgb2ycbcr(pixels, key, out):
+    """Convert RGB pixels into a layer in float by matrix multiplication.
+
+    Arguments:
+        pixels {np.ndarray} -- The uint8 pixels in the shape of
+            `(nrows, ncols, 3)`.
+        key {Y, CB or CR} -- The layer to compute. Y is level offset.
+        out {np.ndarray} -- The float layer in the shape of `(nrows, ncols)`.
+    """
+
+    np.matmul(pixels, RGB2YCBCR_MATRIX[_ROWS[key]].astype(out.dtype),
+              out=out)
+    if key == Y:
+        out -= 128
+
+
+def float_ycbcr2rgb(y, cb, cr, factors, out):  # pylint: disable=invalid-name
+    """Convert layers into RGB pixels in float, as `utils.upsample` and
+    `utils.ycbcr2rgb` followed by rounding and clipping.
+
+    Arguments:
+        y {np.ndarray} -- Luminance layer.
+        cb {np.ndarray} -- Chrominance (Cb) layer subsampled by `factors`.
+        cr {np.ndarray} -- Chrominance (Cr) layer subsampled by `factors`.
+        factors {tuple} -- The subsampling factors of rows and columns.
+        out {np.ndarray} -- The uint8 pixels in the shape of
+            `(nrows, ncols, 3)`.
+    """
+
+    red = np.multiply(cr, 1.402)
+    green_cb = np.multiply(cb, 0.344136)
+    green_cr = np.multiply(cr, 0.714136)
+    blue = np.multiply(cb, 1.772)
+    temp = np.empty_like(red)
+    for pixels, luma, sub in _groups(y, factors):
+        np.add(red[sub], luma, out=temp[sub])
+        _store(temp[sub], out[pixels + (0, )])
+        np.subtract(luma, green_cb[sub], out=temp[sub])
+        temp[sub] -= green_cr[sub]
+        _store(temp[sub], out[pixels + (1, )])
+        np.add(blue[sub], luma, out=temp[sub])
+        _store(temp[sub], out[pixels + (2, )])
+
+
+def integer_rgb2ycbcr(pixels, key, out):
+    """Convert RGB pixels into a layer with scaled int32 arithmetic (as the
+    fixed-point tables of `jccolor.c` of IJG). The error is at most 1 with
+    respect to the rounded result of `float_rgb2ycbcr`.
+
+    Arguments:
+        pixels {np.ndarray} -- The uint8 pixels in the shape of
+            `(nrows, ncols, 3)`.
+        key {Y, CB or CR} -- The layer to compute. Y is level offset.
+        out {np.ndarray} -- The integer layer in the shape of
+            `(nrows, ncols)`.
+    """
+
+    multipliers = _FORWARD_MULTIPLIERS[_ROWS[key]]
+    ret = np.multiply(pixels[:, :, 0], multipliers[0], dtype=np.int32)
+    ret += np.multiply(pixels[:, :, 1], multipliers[1], dtype=np.int32)
+    ret += np.multiply(pixels[:, :, 2], multipliers[2], dtype=np.int32)
+    ret += _FORWARD_OFFSETS[_ROWS[key]]
+    ret >>= SCALE_BITS
+    out[...] = ret
+
+
+def integer_ycbcr2rgb(y, cb, cr, factors, out):  # pylint: disable=invalid-name, too-many-locals
+    """Convert layers into RGB pixels with scaled int32 arithmetic (as the
+    fixed-point tables of `jdcolor.c` of IJG) and saturation into uint8. The
+    layers are supposed to be integers as returned by
+    `transform.inverse_transform`. The error is at most 1 with respect to
+    `float_ycbcr2rgb`.
+
+    Arguments:
+        y {np.ndarray} -- Luminance layer.
+        cb {np.ndarray} -- Chrominance (Cb) layer subsampled by `factors`.
+        cr {np.ndarray} -- Chrominance (Cr) layer subsampled by `factors`.
+        factors {tuple} -- The subsampling factors of rows and columns.
+        out {np.ndarray} -- The uint8 pixels in the shape of
+            `(nrows, ncols, 3)`.
+    """
+
+    y, cb, cr = (layer.astype(np.int32) for layer in (y, cb, cr))
+    r_cr, g_cb, g_cr, b_cb = _INVERSE_MULTIPLIERS
+    half = 1 << (SCALE_BITS - 1)
+
+    red = np.multiply(cr, r_cr)
+    red += half
+    red >>= SCALE_BITS
+    green = np.multiply(cb, g_cb)
+    green += half
+    cr *= g_cr
+    green += cr
+    green >>= SCALE_BITS
+    blue = cb
+    blue *= b_cb
+    blue += half
+    blue >>= SCALE_BITS
+    temp = np.empty_like(red)
+    for pixels, luma, sub in _groups(y, factors):
+        for channel, term in enumerate((red, green, blue)):
+            np.add(term[sub], luma, out=temp[sub])
+            out[pixels + (channel, )] = np.clip(temp[sub], 0, 255,
+                                                out=temp[sub])
+
+
+def _groups(y, factors):  # pylint: disable=invalid-name
+    """Yield `(pixels, luma, sub)` for every position in the groups of
+    subsampling, where `pixels` indexes the pixels at that position (of `y`
+    and the output), `luma` is their luminance and `sub` indexes their
+    subsampled chrominance.
+    """
+
+    for row, col in itertools.product(range(factors[0]), range(factors[1])):
+        pixels = (slice(row, None, factors[0]), slice(col, None, factors[1]))
+        luma = y[pixels]
+        if luma.size:
+            yield pixels, luma, (slice(len(luma)), slice(luma.shape[1]))
+
+
+def _store(layer, out):
+    # Rounding and Clipping (in place) into the uint8 output.
+    np.clip(layer, 0, 255, out=layer)
+    np.rint(layer, out=layer)
+    out[...] = layer
+
+
+def _fix(value):
+    return np.rint(np.multiply(value, 1 << SCALE_BITS)).astype(np.int32)
+
+
+# The rows of the color matrix of layers.
+_ROWS = {Y: 0, CB: 1, CR: 2}
+
+# The fixed-point color matrix, and the rounding (and level offset of Y)
+# added to the rows before the shift.
+_FORWARD_MULTIPLIERS = _fix(RGB2YCBCR_MATRIX)
+_FORWARD_OFFSETS = (np.int32(1 << (SCALE_BITS - 1))
+                    - np.array((128 << SCALE_BITS, 0, 0), dtype=np.int32))
+
+# The fixed-point multipliers of R from Cr, G from Cb and Cr, and B from Cb.
+_INVERSE_MULTIPLIERS = tuple(_fix((1.402, -0.344136, -0.714136, 1.772)))
+
+# Color conversions in the format of `{name: (rgb2ycbcr, ycbcr2rgb)}`. See
+# `float_rgb2ycbcr` and `float_ycbcr2rgb` for the signatures.
+COLOR_CONVERSIONS = {
+    'float': (float_rgb2ycbcr, float_ycbcr2rgb),
+    'integer': (integer_rgb2ycbcr, integer_ycbcr2rgb),
+}
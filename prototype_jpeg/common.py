@@ -0,0 +1,193 @@
+import itertools
+
+import numpy as np
+
+from .arithmetic import ArithmeticEncoder, ArithmeticDecoder
+from .codec import (Encoder, Decoder, build_huffman_table, DC, AC, LUMINANCE,
+                    CHROMINANCE)
+from .color import COLOR_CONVERSIONS
+from .quantizer import normalize_table
+from .restart import decode_segments
+from .transform import TRANSFORMS, PRECISIONS
+from .utils import Y, CB, CR
+
+
+# Entropy coders in the format of `{name: (encoder class, decoder class)}`.
+# Encoders provide `encode_bits` returning `{DC: bitarray, AC: bitarray}`, and
+# decoders provide `decode` returning the quantized blocks.
+ENTROPY_CODERS = {
+    'huffman': (Encoder, Decoder),
+    'arithmetic': (ArithmeticEncoder, ArithmeticDecoder),
+}
+
+
+def check_options(grey_level, huffman_backend, optimize_huffman, entropy,  # pylint: disable=too-many-arguments
+                  restart_interval, transform, quantization_tables,
+                  precision, color_conversion):
+    # Validate the options of `compress` and return the normalized
+    # quantization tables.
+    if huffman_backend not in {'vectorized', 'string'}:
+        raise ValueError(f'Huffman backend ({huffman_backend}) must be '
+                         '"vectorized" or "string".')
+
+    if entropy not in ENTROPY_CODERS:
+        raise ValueError(f'Entropy coder ({entropy}) must be one of '
+                         f'{", ".join(map(repr, ENTROPY_CODERS))}.')
+
+    if entropy != 'huffman' and (optimize_huffman
+                                 or huffman_backend == 'string'):
+        raise ValueError('Huffman options are only available with Huffman '
+                         'entropy coder.')
+
+    if quantization_tables is not None:
+        if len(quantization_tables) != (1 if grey_level else 2):
+            raise ValueError('Quantization tables should be given for '
+                             'luminance (and chrominance of RGB image).')
+        quantization_tables = tuple(normalize_table(table)
+                                    for table in quantization_tables)
+
+    if transform not in TRANSFORMS:
+        raise ValueError(f'Transform ({transform}) must be one of '
+                         f'{", ".join(map(repr, TRANSFORMS))}.')
+
+    if restart_interval is not None:
+        if restart_interval <= 0:
+            raise ValueError('Restart interval should be positive.')
+        if huffman_backend == 'string':
+            raise ValueError('Restart interval is not available with string '
+                             'Huffman backend.')
+
+    check_precision(precision)
+    check_color_conversion(color_conversion)
+
+    return quantization_tables
+
+
+def check_precision(precision):
+    if precision not in PRECISIONS:
+        raise ValueError(f'Precision ({precision}) must be one of '
+                         f'{", ".join(map(repr, PRECISIONS))}.')
+
+
+def check_color_conversion(color_conversion):
+    if color_conversion not in COLOR_CONVERSIONS:
+        raise ValueError(f'Color conversion ({color_conversion}) must be one '
+                         f'of {", ".join(map(repr, COLOR_CONVERSIONS))}.')
+
+
+def layer_table(quantization_tables, key):
+    # The custom quantization table of a layer, or `None` for the standard
+    # one.
+    if quantization_tables is None:
+        return None
+    return quantization_tables[0 if key == Y else 1]
+
+
+def decode_layers(bits, header, executor):
+    # Entropy decode the data of `compress` into quantized blocks.
+    grey_level = header['grey_level']
+    decoder_class, components, huffman_tables = slice_components(bits, header)
+    if 'segment_offsets' in header:
+        # Decode restart segments (concurrently with `executor`).
+        decoded = tuple(
+            decode_segments(
+                decoder_class, component, segment_offsets(header, idx),
+                layer_type, executor=executor, **huffman_tables[idx]
+            )
+            for idx, (component, layer_type) in enumerate(components)
+        )
+    else:
+        # Decode the components (concurrently with `executor`).
+        decoded = tuple((map if executor is None else executor.map)(
+            decode_component,
+            itertools.repeat(decoder_class),
+            *zip(*components),
+            huffman_tables[:len(components)]
+        ))
+
+    if grey_level:
+        data = {Y: decoded[0]}
+    else:
+        cb, cr = np.split(decoded[1], 2)  # pylint: disable=invalid-name, unbalanced-tuple-unpacking
+        data = {
+            Y: decoded[0],
+            CB: cb,
+            CR: cr
+        }
+    return data
+
+
+def decoder_options(header):
+    # Return the decoder class and the keyword arguments of decoders of
+    # components for the data of `compress`.
+    _, decoder_class = ENTROPY_CODERS[header.get('entropy', 'huffman')]
+    if 'huffman_tables' in header:
+        huffman_tables = tuple(
+            {'huffman_table': {dc_ac: build_huffman_table(spec[dc_ac], dc_ac)
+                               for dc_ac in (DC, AC)}}
+            for spec in header['huffman_tables']
+        )
+    else:
+        # Baseline JPEG Huffman tables or not Huffman coded.
+        huffman_tables = ({}, {})
+    return decoder_class, huffman_tables
+
+
+def component_offsets(header):
+    # The bit offsets of the DC and AC bits of components in the data of
+    # `compress` in the format of `({DC: offset, AC: offset}, ...)`.
+    starts = tuple(itertools.accumulate((0, *header['data_slice_lengths'])))
+    return tuple({DC: starts[idx], AC: starts[idx + 1]}
+                 for idx in range(0, len(starts) - 1, 2))
+
+
+def slice_components(bits, header):
+    # Return the decoder class, `((bits, layer type), ...)` of components and
+    # the keyword arguments of decoders for the data of `compress`.
+    grey_level = header['grey_level']
+    remaining_bits_length = header['remaining_bits_length']
+    dsls = header['data_slice_lengths']  # data_slice_lengths
+    decoder_class, huffman_tables = decoder_options(header)
+
+    # Preprocessing Byte Sequence:
+    #   1. Remove Remaining (Fake Filled) Bits.
+    #   2. Slice Bits into Dictionary Data Structure for `Decoder`.
+
+    if remaining_bits_length:
+        bits = bits[:-remaining_bits_length]
+
+    if grey_level:
+        # The order of dsls (grey level) is:
+        #   DC, AC
+        sliced = {
+            DC: bits[:dsls[0]],
+            AC: bits[dsls[0]:]
+        }
+    else:  # RGB
+        # The order of dsls (RGB) is:
+        #   LUMINANCE.DC, LUMINANCE.AC, CHROMINANCE.DC, CHROMINANCE.AC
+        sliced = {
+            LUMINANCE: {
+                DC: bits[:dsls[0]],
+                AC: bits[dsls[0]:dsls[0] + dsls[1]]
+            },
+            CHROMINANCE: {
+                DC: bits[dsls[0] + dsls[1]:dsls[0] + dsls[1] + dsls[2]],
+                AC: bits[dsls[0] + dsls[1] + dsls[2]:]
+            }
+        }
+
+    components = (((sliced, LUMINANCE), ) if grey_level
+                  else ((sliced[LUMINANCE], LUMINANCE),
+                        (sliced[CHROMINANCE], CHROMINANCE)))
+    return decoder_class, components, huffman_tables
+
+
+def segment_offsets(header, idx):
+    # The offsets of restart segments of the `idx`th component.
+    return {DC: header['segment_offsets'][2 * idx],
+            AC: header['segment_offsets'][2 * idx + 1]}
+
+
+def decode_component(decoder_class, data, layer_type, options):
+    return decoder_class(data, layer_type, **options).decode()
@@ -0,0 +1,302 @@
+import functools
+
+from bitarray import bitarray, decodetree
+import numpy as np
+
+from .category import category, fixed_code_index, inverse_fixed_code_index
+
+
+def codeword_lut(table):
+    """Convert a Huffman table into codeword lookup arrays indexed by symbol.
+
+    The symbol of a DC category is the category itself, and the symbol of an
+    AC run-length pair `(run, size)` is `run * 16 + size` (so EOB is `0x00` and
+    ZRL is `0xF0`, as in baseline JPEG).
+
+    Arguments:
+        table {bidict} -- A Huffman table mapping DC categories (int) or AC
+            run-length pairs (tuple) to codeword bit strings.
+
+    Returns:
+        tuple -- `(codes, lengths)` where both are arrays of 256 elements.
+            Symbols absent from the table have a length of 0.
+    """
+
+    codes = np.zeros(256, dtype=np.uint64)
+    lengths = np.zeros(256, dtype=np.uint64)
+    for key, codeword in table.items():
+        symbol = key[0] * 16 + key[1] if isinstance(key, tuple) else key
+        codes[symbol] = int(codeword, 2)
+        lengths[symbol] = len(codeword)
+    return codes, lengths
+
+
+def encode_dc(diffs, lut):
+    """Encode differential DCs into merged codewords.
+
+    Each merged codeword is the Huffman codeword of the category followed by
+    the fixed code of the value, which is exactly what `encode_huffman`
+    returns for every value.
+
+    Arguments:
+        diffs {array-like} -- The differential DCs.
+        lut {tuple} -- The lookup arrays returned by `codeword_lut`.
+
+    Raises:
+        ValueError -- When any differential DC is out of the range.
+        KeyError -- When any category cannot be found in the table.
+
+    Returns:
+        tuple -- `(codes, lengths)` arrays of the merged codewords.
+    """
+
+    diffs = np.asarray(diffs, dtype=np.int64).ravel()
+    if np.any(np.abs(diffs) >= 2048):
+        raise ValueError('Differential DC should be within [-2047, 2047].')
+    sizes = category(diffs).astype(np.int64)
+    return _merge(sizes, sizes, fixed_code_index(diffs), lut)
+
+
+def encode_ac(runs, values, lut):
+    """Encode run-length-encoded AC pairs into merged codewords.
+
+    EOB and ZRL are given as pairs with a zero value, `(0, 0)` and `(15, 0)`
+    respectively.
+
+    Arguments:
+        runs {array-like} -- The runs of zeros before each value.
+        values {array-like} -- The nonzero AC coefficients.
+        lut {tuple} -- The lookup arrays returned by `codeword_lut`.
+
+    Raises:
+        ValueError -- When any value is out of the range.
+        KeyError -- When any pair cannot be found in the table.
+
+    Returns:
+        tuple -- `(codes, lengths)` arrays of the merged codewords.
+    """
+
+    runs = np.asarray(runs, dtype=np.int64).ravel()
+    values = np.asarray(values, dtype=np.int64).ravel()
+    if np.any(np.abs(values) >= 1024):
+        raise ValueError('AC coefficient nonzero should be within [-1023, 0) '
+                         'or (0, 1023].')
+    if np.any((values == 0) & (runs != 0) & (runs != 15)):
+        raise ValueError('AC coefficient nonzero should not be 0.')
+    if np.any((runs < 0) | (runs > 15)):
+        raise KeyError('Cannot find the run of AC pair in Huffman table.')
+    sizes = category(values).astype(np.int64)
+    return _merge(runs * 16 + sizes, sizes, fixed_code_index(values), lut)
+
+
+def pack_bits(codes, lengths):
+    """Pack variable-length codewords into a byte buffer in one pass.
+
+    The codewords are laid out consecutively from the most significant bit.
+    The bit offset of each codeword is the prefix sum of the lengths, which
+    allows scattering all of them into 64-bit words at once. A codeword
+    crossing a word boundary is split into both words.
+
+    Arguments:
+        codes {array-like} -- Codewords with at most 64 bits each.
+        lengths {array-like} -- The bit lengths of the codewords.
+
+    Returns:
+        tuple -- `(buffer, nbits)` where `buffer` is an uint8 array padded
+            with 0s to a whole byte and `nbits` is the number of valid bits.
+    """
+
+    codes = np.asarray(codes, dtype=np.uint64).ravel()
+    lengths = np.asarray(lengths, dtype=np.int64).ravel()
+    ends = np.cumsum(lengths)
+    nbits = int(ends[-1]) if ends.size else 0
+    if not nbits:
+        return np.zeros(0, dtype=np.uint8), 0
+
+    starts = ends - lengths
+    index = starts >> 6
+    # The end bit position of codeword relative to the start of its word.
+    tails = (starts & 63) + lengths
+    fits = tails <= 64
+
+    heads = ((codes << np.where(fits, 64 - tails, 0).astype(np.uint64))
+             >> np.where(fits, 0, tails - 64).astype(np.uint64))
+    words = np.zeros(nbits // 64 + 1, dtype=np.uint64)
+    # Codewords never overlap, so OR-reducing is the same as concatenating.
+    firsts = np.flatnonzero(np.diff(index, prepend=-1))
+    words[index[firsts]] = np.bitwise_or.reduceat(heads, firsts)
+    spills = ~fits
+    words[index[spills] + 1] |= (
+        codes[spills] << (128 - tails[spills]).astype(np.uint64)
+    )
+
+    return words.astype('>u8').view(np.uint8)[:(nbits + 7) // 8], nbits
+
+
+def decode_tree(table):
+    """Build a decoding tree which decodes values directly from bits.
+
+    Every codeword in the table is expanded with all fixed codes of its
+    category, so the resulting prefix code maps each bit pattern of a
+    codeword followed by its fixed code to the value itself. Decoding is then
+    a single C-level pass of `bitarray.decode`.
+
+    Arguments:
+        table {bidict} -- A Huffman table mapping DC categories (int) or AC
+            run-length pairs (tuple) to codeword bit strings.
+
+    Returns:
+        decodetree -- A tree whose symbols are differential DCs (int) or
+            run-length-encoded AC pairs (tuple), including EOB and ZRL.
+    """
+
+    code = {}
+    for key, codeword in table.items():
+        run, size = key if isinstance(key, tuple) else (None, key)
+        if size == 0:
+            code[key] = bitarray(codeword)
+            continue
+        indices = range(2 ** size)
+        for index, value in zip(
+                indices, inverse_fixed_code_index(indices, size).tolist()):
+            code[value if run is None else (run, value)] = bitarray(
+                codeword + '{:0{padding}b}'.format(index, padding=size)
+            )
+    return decodetree(code)
+
+
+@functools.lru_cache(maxsize=8)
+def cached_decode_tree(items):
+    """Return the cached decoding tree of the items of a Huffman table, so
+    that decoders of restart segments sharing a table build it only once.
+    """
+    return decode_tree(dict(items))
+
+
+def decode_values(bits, tree):
+    """Decode a bit sequence with a tree returned by `decode_tree`.
+
+    Arguments:
+        bits {bitarray or str} -- The encoded bit sequence.
+        tree {decodetree} -- The decoding tree.
+
+    Raises:
+        ValueError -- When the bit sequence is not decodable by the tree.
+
+    Returns:
+        list -- The decoded values.
+    """
+
+    if isinstance(bits, str):
+        bits = bitarray(bits)
+    return list(bits.decode(tree))
+
+
+def optimal_code_spec(frequencies, max_length=16):
+    """Generate an optimal length-limited Huffman code of symbol frequencies.
+
+    The procedure follows Annex K.2 and K.3 of the JPEG specification. A
+    reserved symbol with a frequency of 1 ensures that no codeword consists of
+    all 1-bits, and the code lengths longer than `max_length` are adjusted
+    down.
+
+    Arguments:
+        frequencies {array-like} -- The frequencies of symbols indexed by
+            symbol.
+
+    Keyword Arguments:
+        max_length {int} -- The maximum length of codewords. (default: {16})
+
+    Returns:
+        tuple -- `(bits, huffval)` where `bits[i]` is the number of codewords
+            of length `i + 1` and `huffval` lists the symbols in the order of
+            increasing codeword length.
+    """
+
+    freq = [int(f) for f in frequencies] + [1]
+    reserved = len(freq) - 1
+    code_size = [0] * len(freq)
+    others = [-1] * len(freq)
+
+    while True:
+        # Find the least two frequencies, preferring the larger symbols.
+        candidates = sorted((f, -v) for v, f in enumerate(freq) if f)
+        if len(candidates) < 2:
+            break
+        first, second = -candidates[0][1], -candidates[1][1]
+        freq[first] += freq[second]
+        freq[second] = 0
+        for v in (first, second):  # pylint: disable=invalid-name
+            code_size[v] += 1
+            while others[v] != -1:
+                v = others[v]  # pylint: disable=invalid-name
+                code_size[v] += 1
+        # Chain the tree of `second` to the end of the tree of `first`.
+        while others[first] != -1:
+            first = others[first]
+        others[first] = second
+
+    bits = [0] * (max(max(code_size), max_length) + 1)
+    for size in code_size:
+        if size:
+            bits[size] += 1
+    for i in range(len(bits) - 1, max_length, -1):
+        while bits[i] > 0:
+            j = i - 2
+            while bits[j] == 0:
+                j -= 1
+            bits[i] -= 2
+            bits[i - 1] += 1
+            bits[j + 1] += 2
+            bits[j] -= 1
+    # Remove the reserved symbol from the longest codewords.
+    i = max_length
+    while bits[i] == 0:
+        i -= 1
+    bits[i] -= 1
+
+    huffval = tuple(v for size in range(1, max(code_size) + 1)
+                    for v, s in enumerate(code_size)
+                    if s == size and v != reserved)
+    return tuple(bits[1:max_length + 1]), huffval
+
+
+def canonical_codewords(bits, huffval):
+    """Generate the canonical codewords of a Huffman code specification.
+
+    The procedure follows Annex C of the JPEG specification.
+
+    Arguments:
+        bits {sequence} -- The numbers of codewords of each length.
+        huffval {sequence} -- The symbols in the order of increasing codeword
+            length.
+
+    Raises:
+        ValueError -- When the numbers of codewords and symbols differ.
+
+    Returns:
+        dict -- A dictionary mapping symbols to codeword bit strings.
+    """
+
+    if sum(bits) != len(huffval):
+        raise ValueError(f'The number of codewords ({sum(bits)}) is not '
+                         f'equal to the number of symbols ({len(huffval)}).')
+    ret = {}
+    symbols = iter(huffval)
+    code = 0
+    for length, count in enumerate(bits, 1):
+        for _ in range(count):
+            ret[next(symbols)] = '{:0{padding}b}'.format(code, padding=length)
+            code += 1
+        code <<= 1
+    return ret
+
+
+def _merge(symbols, sizes, amplitudes, lut):
+    codes, lengths = lut
+    code_lengths = lengths[symbols]
+    if np.any(code_lengths == 0):
+        raise KeyError('Cannot find the symbol in Huffman table.')
+    sizes = sizes.astype(np.uint64)
+    return ((codes[symbols] << sizes) | amplitudes.astype(np.uint64),
+            code_lengths + sizes)
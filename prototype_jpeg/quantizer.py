@@ -0,0 +1,145 @@
+import functools
+
+import numpy as np
+
+from .utils import quantization_table, Y, CB
+
+
+# The maximum number of cached quantizers.
+QUANTIZER_CACHE_SIZE = 32
+
+
+class Quantizer:
+    def __init__(self, table):
+        """Create a quantizer of a scaled quantization table.
+
+        The table, its reciprocal and the tables derived by `derive` are
+        computed once and shared, so they are read-only.
+
+        Arguments:
+            table {np.ndarray} -- The scaled 8 * 8 quantization table.
+        """
+
+        self.table = _read_only(np.array(table, dtype=float))
+        self.reciprocal = _read_only(1 / self.table)
+        self._derived = {}
+
+    def quantize(self, coefficients, dtype=None):
+        """Quantize coefficients (without rounding) by multiplying the
+        reciprocal of the table.
+
+        Arguments:
+            coefficients {np.ndarray} -- The DCT coefficients of a block or a
+                stack of blocks.
+
+        Keyword Arguments:
+            dtype {np.dtype} -- The dtype of the results, e.g. `np.float32`
+                to keep single precision. Follow the type promotion of numpy
+                if not given. (default: {None})
+
+        Returns:
+            np.ndarray -- The quantized coefficients.
+        """
+
+        return np.multiply(coefficients, self.reciprocal, dtype=dtype)
+
+    def dequantize(self, coefficients, dtype=None):
+        """Dequantize coefficients by multiplying the table.
+
+        Arguments:
+            coefficients {np.ndarray} -- The quantized coefficients of a block
+                or a stack of blocks.
+
+        Keyword Arguments:
+            dtype {np.dtype} -- The dtype of the results. See `quantize`.
+                (default: {None})
+
+        Returns:
+            np.ndarray -- The dequantized coefficients.
+        """
+
+        return np.multiply(coefficients, self.table, dtype=dtype)
+
+    def derive(self, func):
+        """Return the cached table derived from the table, e.g. the table
+        with the scale of a transform folded in.
+
+        Arguments:
+            func {callable} -- A function mapping the table to a new table.
+
+        Returns:
+            np.ndarray -- The read-only result of `func(self.table)`.
+        """
+
+        if func not in self._derived:
+            self._derived[func] = _read_only(func(self.table))
+        return self._derived[func]
+
+
+def get_quantizer(block_type, quality=50, table=None):
+    """Return the cached quantizer of a component.
+
+    At most `QUANTIZER_CACHE_SIZE` quantizers are cached, least recently used
+    first out. The cache is inspected and cleared by `cache_info` and
+    `cache_clear` as those of `functools.lru_cache`.
+
+    Arguments:
+        block_type {Y, CB or CR} -- Specify the layer type of blocks. Cb and
+            Cr share the same quantizer.
+
+    Keyword Arguments:
+        quality {int} -- The quality factor. (default: {50})
+        table {array-like} -- The 8 * 8 base quantization table scaled by the
+            quality factor instead of the baseline JPEG table of the
+            component. (default: {None})
+
+    Raises:
+        ValueError -- When the custom table is not an 8 * 8 table of positive
+            values.
+
+    Returns:
+        Quantizer -- The quantizer.
+    """
+
+    if table is not None:
+        table = normalize_table(table)
+    return _cached_quantizer(block_type == Y, quality, table)
+
+
+def normalize_table(table):
+    """Validate a custom base quantization table and convert it into nested
+    tuples, which is hashable and could be stored in the header.
+
+    Arguments:
+        table {array-like} -- The 8 * 8 base quantization table.
+
+    Raises:
+        ValueError -- When the table is not an 8 * 8 table of positive
+            values.
+
+    Returns:
+        tuple -- The table as 8 tuples of 8 values.
+    """
+
+    table = np.asarray(table)
+    if table.shape != (8, 8) or np.any(table <= 0):
+        raise ValueError('Quantization table should be an 8 * 8 table of '
+                         'positive values.')
+    return tuple(map(tuple, table.tolist()))
+
+
+@functools.lru_cache(maxsize=QUANTIZER_CACHE_SIZE)
+def _cached_quantizer(luminance, quality, table):
+    return Quantizer(quantization_table(
+        Y if luminance else CB, quality,
+        table=None if table is None else np.array(table)
+    ))
+
+
+get_quantizer.cache_info = _cached_quantizer.cache_info
+get_quantizer.cache_clear = _cached_quantizer.cache_clear
+
+
+def _read_only(arr):
+    arr.flags.writeable = False
+    return arr
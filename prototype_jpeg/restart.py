@@ -0,0 +1,132 @@
+import itertools
+import os
+
+from bitarray import bitarray
+import numpy as np
+
+from .codec import DC, AC
+
+
+def encode_segments(encoder_class, data, layer_type, restart_interval,
+                    **options):
+    """Encode blocks in restart segments of `restart_interval` blocks.
+
+    Every segment is encoded by its own encoder, so the DC prediction restarts
+    at the beginning of every segment. The DC and AC bits of every segment are
+    padded with 0s to whole bytes, so the segments could be decoded
+    independently.
+
+    Arguments:
+        encoder_class {type} -- The entropy encoder class, e.g.
+            `codec.Encoder`.
+        data {np.ndarray} -- The quantized blocks in the shape of (n, 8, 8).
+        layer_type {LUMINANCE or CHROMINANCE} -- Specify the layer type of
+            data.
+        restart_interval {int} -- The number of blocks in a segment.
+
+    Keyword Arguments:
+        **options -- The keyword arguments of `encoder_class`.
+
+    Returns:
+        tuple -- `(bits, offsets)` where `bits` is `{DC: bitarray, AC:
+            bitarray}` and `offsets` is `{DC: tuple, AC: tuple}` containing
+            the `(start, stop)` bit offsets of segments in `bits`.
+    """
+
+    bits = {DC: bitarray(), AC: bitarray()}
+    offsets = {DC: [], AC: []}
+    for start in range(0, len(data), restart_interval):
+        encoded = encoder_class(data[start:start + restart_interval],
+                                layer_type, **options).encode_bits()
+        for dc_ac in (DC, AC):
+            offsets[dc_ac].append((len(bits[dc_ac]),
+                                   len(bits[dc_ac]) + len(encoded[dc_ac])))
+            bits[dc_ac] += encoded[dc_ac]
+            bits[dc_ac].fill()
+    return bits, {dc_ac: tuple(offsets[dc_ac]) for dc_ac in (DC, AC)}
+
+
+def decode_segments(decoder_class, data, offsets, layer_type, executor=None,  # pylint: disable=too-many-arguments
+                    **options):
+    """Decode blocks encoded by `encode_segments`.
+
+    Arguments:
+        decoder_class {type} -- The entropy decoder class, e.g.
+            `codec.Decoder`.
+        data {dict} -- A dictionary containing DC and AC bits in the format of
+            `{DC: bitarray, AC: bitarray}`.
+        offsets {dict} -- The `(start, stop)` bit offsets of segments in the
+            format of `{DC: tuple, AC: tuple}`.
+        layer_type {LUMINANCE or CHROMINANCE} -- Specify the layer type of
+            data.
+
+    Keyword Arguments:
+        executor {concurrent.futures.Executor} -- The executor decoding
+            segments concurrently. Decode serially if not given.
+            (default: {None})
+        **options -- The keyword arguments of `decoder_class`.
+
+    Raises:
+        ValueError -- When the numbers of DC and AC segments differ.
+
+    Returns:
+        np.ndarray -- The quantized blocks in the shape of (n, 8, 8).
+    """
+
+    if len(offsets[DC]) != len(offsets[AC]):
+        raise ValueError(f'The number of DC segments {len(offsets[DC])} is '
+                         f'not equal to that of AC segments '
+                         f'{len(offsets[AC])}.')
+    segments = [
+        {DC: data[DC][dc_start:dc_stop], AC: data[AC][ac_start:ac_stop]}
+        for (dc_start, dc_stop), (ac_start, ac_stop)
+        in zip(offsets[DC], offsets[AC])
+    ]
+    args = (itertools.repeat(decoder_class), segments,
+            itertools.repeat(layer_type), itertools.repeat(options))
+    if executor is None:
+        decoded = map(_decode_segment, *args)
+    else:
+        # Send a few segments per task to reduce the overhead of processes.
+        decoded = executor.map(
+            _decode_segment, *args,
+            chunksize=max(1, len(segments) // (4 * (os.cpu_count() or 1)))
+        )
+    return np.concatenate(tuple(decoded))
+
+
+def iter_segments(decoder_class, data, offsets, layer_type, first=0,  # pylint: disable=too-many-arguments
+                  **options):
+    """Decode the segments encoded by `encode_segments` lazily in order.
+
+    Arguments:
+        decoder_class {type} -- The entropy decoder class, e.g.
+            `codec.Decoder`.
+        data {dict} -- A dictionary containing DC and AC bits in the format of
+            `{DC: bitarray, AC: bitarray}`.
+        offsets {dict} -- The `(start, stop)` bit offsets of segments in the
+            format of `{DC: tuple, AC: tuple}`.
+        layer_type {LUMINANCE or CHROMINANCE} -- Specify the layer type of
+            data.
+
+    Keyword Arguments:
+        first {int} -- The index of the first segment to decode.
+            (default: {0})
+        **options -- The keyword arguments of `decoder_class`.
+
+    Yields:
+        np.ndarray -- The quantized blocks of a segment in the shape of
+            (n, 8, 8).
+    """
+
+    for (dc_start, dc_stop), (ac_start, ac_stop) in itertools.islice(
+            zip(offsets[DC], offsets[AC]), first, None):
+        yield _decode_segment(
+            decoder_class,
+            {DC: data[DC][dc_start:dc_stop], AC: data[AC][ac_start:ac_stop]},
+            layer_type, options
+        )
+
+
+def _decode_segment(decoder_class, data, layer_type, options):
+    return decoder_class(data, layer_type, **options).decode_blocks()
@@ -0,0 +1,114 @@
+import numpy as np
+
+from .zigzag import zig_zag_indices
+
+
+EOB = (0, 0)
+ZRL = (15, 0)
+
+
+def encode_run_length_blocks(seqs):
+    """Vectorized `codec.encode_run_length` for the sequences of multiple
+    blocks.
+
+    Arguments:
+        seqs {2D np.ndarray} -- The AC sequences (in zig-zag order) of blocks
+            in the shape of (n, 63).
+
+    Returns:
+        tuple -- `(blocks, runs, values)` parallel arrays of run-length-encoded
+            AC pairs, including ZRL and EOB, where `blocks` is the index of
+            the block containing each pair.
+    """
+
+    nblocks, _ = seqs.shape
+    blocks, positions = np.nonzero(seqs)
+    # The position of previous nonzero in the same block, or -1 for the first
+    # nonzero of a block.
+    previous = np.roll(positions, 1)
+    previous[np.diff(blocks, prepend=-1) != 0] = -1
+    runs = positions - previous - 1
+    # The runs of 16 or more 0s are split by ZRLs.
+    zrls = runs // 16
+
+    # Every nonzero takes its ZRLs and itself. Every block ends with an EOB.
+    counts = np.bincount(blocks, minlength=nblocks) + np.bincount(
+        blocks, weights=zrls, minlength=nblocks
+    ).astype(int) + 1
+    eobs = np.cumsum(counts) - 1
+    # Index of each nonzero in the returned pairs, where the pairs of previous
+    # blocks include their EOBs.
+    index = np.cumsum(zrls + 1) - 1 + blocks
+
+    ret_runs = np.full(eobs[-1] + 1 if nblocks else 0, ZRL[0])
+    ret_values = np.zeros(ret_runs.shape, dtype=seqs.dtype)
+    ret_runs[index] = runs % 16
+    ret_values[index] = seqs[blocks, positions]
+    ret_runs[eobs] = EOB[0]
+    ret_values[eobs] = EOB[1]
+    return np.repeat(np.arange(nblocks), counts), ret_runs, ret_values
+
+
+def decode_run_length_blocks(runs, values):
+    """Vectorized `codec.decode_run_length` for the pairs of multiple blocks.
+
+    Arguments:
+        runs {np.ndarray} -- The runs of run-length-encoded AC pairs,
+            including ZRL and EOB.
+        values {np.ndarray} -- The values of run-length-encoded AC pairs.
+
+    Raises:
+        ValueError -- When the pairs of a block exceed 63 AC coefficients.
+
+    Returns:
+        tuple -- `(blocks, positions, values, nblocks)` where the first three
+            are parallel arrays of the nonzero AC coefficients, `positions` is
+            the index in the AC sequence (in zig-zag order) of each block and
+            `nblocks` is the number of blocks terminated by EOB. The pairs
+            after the last EOB are ignored.
+    """
+
+    eobs = (runs == EOB[0]) & (values == EOB[1])
+    blocks = np.cumsum(eobs) - eobs
+    nblocks = int(np.count_nonzero(eobs))
+
+    # Every pair moves forward `run + 1` positions except EOB.
+    ends = np.cumsum(np.where(eobs, 0, runs + 1))
+    starts = np.concatenate(([0], ends[eobs]))[blocks]
+    positions = ends - starts - 1
+
+    nonzero = (values != 0) & (blocks < nblocks)
+    if np.any(positions[nonzero] >= 63):
+        raise ValueError('The run-length-encoded AC pairs of a block exceed '
+                         '63 coefficients.')
+    return blocks[nonzero], positions[nonzero], values[nonzero], nblocks
+
+
+def run_length_blocks(dc, runs, values):  # pylint: disable=invalid-name
+    """Build the blocks of DCs and their run-length-encoded AC pairs.
+
+    Arguments:
+        dc {array-like} -- The DCs of blocks.
+        runs {np.ndarray} -- The runs of run-length-encoded AC pairs,
+            including ZRL and EOB.
+        values {np.ndarray} -- The values of run-length-encoded AC pairs.
+
+    Raises:
+        ValueError -- When the numbers of DC and AC blocks differ.
+
+    Returns:
+        np.ndarray -- The quantized blocks (int16, which holds all the
+            categories of baseline JPEG) in the shape of (n, 8, 8).
+    """
+
+    blocks, positions, values, nblocks = decode_run_length_blocks(runs,
+                                                                  values)
+    if len(dc) != nblocks:
+        raise ValueError(f'DC size {len(dc)} is not equal to AC size '
+                         f'{nblocks}.')
+
+    # Scatter the coefficients into blocks in one step.
+    ret = np.zeros((nblocks, 64), dtype=np.int16)
+    ret[:, 0] = dc
+    ret[blocks, zig_zag_indices(8)[positions + 1]] = values
+    return ret.reshape((nblocks, 8, 8))
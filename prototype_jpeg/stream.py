@@ -0,0 +1,640 @@
+import itertools
+import logging
+import math
+import tempfile
+import time
+
+from bitarray import bitarray
+import numpy as np
+
+from .codec import (Encoder, Decoder, huffman_codeword_lut,
+                    huffman_decode_tree, DC, AC, LUMINANCE, CHROMINANCE)
+from .color import (forward_color, inverse_color, layer_shapes,
+                    subsampling_factors)
+from .common import (check_options, check_precision, check_color_conversion,
+                     decode_layers, decoder_options, component_offsets,
+                     slice_components, segment_offsets, layer_table)
+from .huffman import encode_dc, encode_ac
+from .restart import iter_segments
+from .runlength import EOB, run_length_blocks
+from .transform import forward_transform, inverse_transform, PRECISIONS
+from .utils import Y, CB, CR
+
+
+# The number of bytes copied at once from a spool.
+COPY_CHUNK_SIZE = 1 << 16
+# The number of Huffman symbols decoded at once by the lazy decoders.
+SYMBOL_CHUNK_SIZE = 1 << 12
+# The layers of the luminance and chrominance components. Cr follows Cb in the
+# chrominance component.
+_COMPONENT_KEYS = ((Y, ), (CB, CR))
+
+
+class BitWriter:
+    def __init__(self, file_object):
+        """Write bits into a binary file in whole bytes, keeping at most 7
+        pending bits in memory.
+
+        Arguments:
+            file_object {file} -- The binary file written into.
+        """
+
+        self.file_object = file_object
+        # The number of bits written (including the pending ones).
+        self.length = 0
+        self._pending = bitarray()
+
+    def write(self, bits):
+        """Append bits.
+
+        Arguments:
+            bits {bitarray} -- The bits.
+        """
+
+        self._pending += bits
+        self.length += len(bits)
+        nbits = len(self._pending) // 8 * 8
+        if nbits:
+            self.file_object.write(self._pending[:nbits].tobytes())
+            del self._pending[:nbits]
+
+    def flush(self):
+        """Write the pending bits filled with 0s to a whole byte.
+
+        Returns:
+            int -- The number of filled bits.
+        """
+
+        filled = self._pending.fill()
+        self.file_object.write(self._pending.tobytes())
+        self._pending = bitarray()
+        return filled
+
+
+class BitSpool(BitWriter):
+    def __init__(self):
+        """Spool bits in a temporary file to be copied out in order, e.g. a
+        bit sequence of the compressed data whose preceding sequences are not
+        finished yet.
+        """
+
+        super().__init__(tempfile.TemporaryFile())
+
+    def copy_to(self, writer):
+        """Append all the spooled bits to a writer (in chunks) and close the
+        spool.
+
+        Arguments:
+            writer {BitWriter} -- The writer.
+        """
+
+        pending = self._pending
+        self.file_object.seek(0)
+        for chunk in iter(lambda: self.file_object.read(COPY_CHUNK_SIZE), b''):
+            bits = bitarray()
+            bits.frombytes(chunk)
+            writer.write(bits)
+        writer.write(pending)
+        self.file_object.close()
+
+
+class BlockReader:  # pylint: disable=too-few-public-methods
+    def __init__(self, chunks):
+        """Read blocks in order from chunks of blocks, e.g. the lazily decoded
+        restart segments, which are consumed only when needed.
+
+        Arguments:
+            chunks {iterable} -- The arrays of blocks in the shape of
+                (n, 8, 8).
+        """
+
+        self._chunks = iter(chunks)
+        self._pending = np.empty((0, 8, 8), dtype=np.int16)
+
+    def read(self, count):
+        """Read the next blocks.
+
+        Arguments:
+            count {int} -- The number of blocks.
+
+        Raises:
+            ValueError -- When the chunks end before `count` blocks.
+
+        Returns:
+            np.ndarray -- The blocks in the shape of (count, 8, 8).
+        """
+
+        pending = [self._pending]
+        available = len(self._pending)
+        while available < count:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                raise ValueError(f'Only {available} of {count} blocks are '
+                                 'left.')
+            pending.append(chunk)
+            available += len(chunk)
+        blocks = pending[0] if len(pending) == 1 else np.concatenate(pending)
+        self._pending = blocks[count:]
+        return blocks[:count]
+
+
+class FileBits:  # pylint: disable=too-few-public-methods
+    def __init__(self, file_object, offset=0):
+        """Bits of a binary file read only when sliced, e.g. the restart
+        segments of a compressed file.
+
+        Arguments:
+            file_object {file} -- The seekable binary file.
+
+        Keyword Arguments:
+            offset {int} -- The bit offset of the first bit in the file.
+                (default: {0})
+        """
+
+        self.file_object = file_object
+        self.offset = offset
+
+    def __getitem__(self, key):
+        """Read the bits of a slice.
+
+        Arguments:
+            key {slice} -- The slice with nonnegative `start` and `stop` (and
+                no step).
+
+        Returns:
+            bitarray -- The bits, which are fewer than the slice when the
+                file ends.
+        """
+
+        start = self.offset + (key.start or 0)
+        stop = self.offset + key.stop
+        self.file_object.seek(start // 8)
+        ret = bitarray()
+        ret.frombytes(self.file_object.read(-(-stop // 8) - start // 8))
+        return ret[start % 8:start % 8 + stop - start]
+
+
+def iter_huffman_blocks(data, layer_type, nblocks, chunk_size,  # pylint: disable=too-many-arguments
+                        huffman_table=None, predictor=0):
+    """Decode Huffman coded blocks lazily in chunks, holding only the
+    blocks of a chunk and a bounded number of decoded symbols at once.
+
+    Arguments:
+        data {dict} -- A dictionary containing DC and AC bits in the format of
+            `{DC: bitarray, AC: bitarray}`, which may continue after the
+            blocks.
+        layer_type {LUMINANCE or CHROMINANCE} -- Specify the layer type of
+            data.
+        nblocks {int} -- The number of blocks.
+        chunk_size {int} -- The number of blocks of a chunk. The last chunk
+            may be smaller.
+
+    Keyword Arguments:
+        huffman_table {dict} -- See `codec.Decoder`. (default: {None})
+        predictor {int} -- The DC preceding the first block, e.g. the last DC
+            of Cb for Cr. (default: {0})
+
+    Raises:
+        ValueError -- When the bits end before `nblocks` blocks.
+
+    Yields:
+        np.ndarray -- The quantized blocks of a chunk in the shape of
+            (n, 8, 8).
+    """
+
+    symbols = {
+        dc_ac: data[dc_ac].iterdecode(
+            huffman_decode_tree(dc_ac, layer_type, huffman_table)
+        )
+        for dc_ac in (DC, AC)
+    }
+    pending = np.empty((0, 2), dtype=np.int32)
+    for start in range(0, nblocks, chunk_size):
+        count = min(chunk_size, nblocks - start)
+        diffs = list(itertools.islice(symbols[DC], count))
+        if len(diffs) != count:
+            raise ValueError(f'The DC bits end after {start + len(diffs)} of '
+                             f'{nblocks} blocks.')
+        dc = predictor + np.cumsum(diffs)  # pylint: disable=invalid-name
+        predictor = int(dc[-1])
+        pairs, pending = _take_pairs(symbols[AC], pending, count)
+        yield run_length_blocks(dc, pairs[:, 0], pairs[:, 1])
+
+
+def skip_huffman_blocks(data, layer_type, nblocks,  # pylint: disable=too-many-locals
+                        huffman_table=None):
+    """Skip Huffman coded blocks without holding them, e.g. to find the
+    bits of Cr following those of Cb in the chrominance component.
+
+    The decoded symbols are encoded again in chunks to count their bits.
+
+    Arguments:
+        data {dict} -- A dictionary containing DC and AC bits in the format of
+            `{DC: bitarray, AC: bitarray}`.
+        layer_type {LUMINANCE or CHROMINANCE} -- Specify the layer type of
+            data.
+        nblocks {int} -- The number of blocks.
+
+    Keyword Arguments:
+        huffman_table {dict} -- See `codec.Decoder`. (default: {None})
+
+    Raises:
+        ValueError -- When the bits end before `nblocks` blocks.
+
+    Returns:
+        tuple -- `(data, predictor)` where `data` is the DC and AC bits after
+            the blocks in the same format and `predictor` is the DC of the
+            last block.
+    """
+
+    symbols = data[DC].iterdecode(huffman_decode_tree(DC, layer_type,
+                                                      huffman_table))
+    dc_length = predictor = 0
+    for start in range(0, nblocks, SYMBOL_CHUNK_SIZE):
+        count = min(SYMBOL_CHUNK_SIZE, nblocks - start)
+        diffs = np.array(list(itertools.islice(symbols, count)),
+                         dtype=np.int64)
+        if len(diffs) != count:
+            raise ValueError(f'The DC bits end after {start + len(diffs)} of '
+                             f'{nblocks} blocks.')
+        _, lengths = encode_dc(diffs, huffman_codeword_lut(DC, layer_type,
+                                                           huffman_table))
+        dc_length += int(lengths.sum())
+        predictor += int(diffs.sum())
+
+    symbols = data[AC].iterdecode(huffman_decode_tree(AC, layer_type,
+                                                      huffman_table))
+    ac_length = 0
+    remaining = nblocks
+    while remaining:
+        pairs = np.array(
+            list(itertools.islice(symbols, SYMBOL_CHUNK_SIZE)), dtype=np.int64
+        ).reshape(-1, 2)
+        if pairs.size == 0:
+            raise ValueError(f'The AC bits end after {nblocks - remaining} '
+                             f'of {nblocks} blocks.')
+        ends = _eob_ends(pairs)
+        if len(ends) >= remaining:
+            pairs = pairs[:ends[remaining - 1]]
+        remaining -= min(len(ends), remaining)
+        _, lengths = encode_ac(pairs[:, 0], pairs[:, 1], huffman_codeword_lut(
+            AC, layer_type, huffman_table
+        ))
+        ac_length += int(lengths.sum())
+
+    return {DC: data[DC][dc_length:], AC: data[AC][ac_length:]}, predictor
+
+
+def read_bands(file_object, size, grey_level=False, rows_per_band=8):
+    """Read the raw image in horizontal bands of rows.
+
+    Arguments:
+        file_object {file} -- The raw image file.
+        size {tuple} -- The size of image in the format of `(nrows, ncols)`.
+
+    Keyword Arguments:
+        grey_level {bool} -- Whether the image is grey level.
+            (default: {False})
+        rows_per_band {int} -- The number of rows of a band. The last band
+            may be shorter. (default: {8})
+
+    Raises:
+        ValueError -- When the file ends before the image.
+
+    Yields:
+        np.ndarray -- The uint8 pixels of a band in the shape of
+            `(nrows, ncols)` (grey level) or `(nrows, ncols, 3)` (RGB).
+    """
+
+    nrows, ncols = size
+    row_shape = (ncols, ) if grey_level else (ncols, 3)
+    row_bytes = int(np.prod(row_shape))
+    for start in range(0, nrows, rows_per_band):
+        band_rows = min(rows_per_band, nrows - start)
+        buffer = file_object.read(band_rows * row_bytes)
+        if len(buffer) != band_rows * row_bytes:
+            raise ValueError(f'The raw image file ends before row '
+                             f'{start + band_rows}.')
+        yield np.frombuffer(buffer, dtype=np.uint8).reshape(band_rows,
+                                                            *row_shape)
+
+
+def compress_stream(file_object, output_file, size, quality=50,  # pylint: disable=too-many-arguments, too-many-locals
+                    grey_level=False, subsampling_mode=1, transform='float',
+                    quantization_tables=None, precision='float64',
+                    color_conversion='float', rows_per_band=None):
+    """Compress a raw image in horizontal bands without loading it.
+
+    The raw image is read in bands of rows, and every band goes through the
+    color space conversion, subsampling, DCT, quantization and Huffman coding
+    on its own, with the DC prediction carried over from the previous band.
+    The DC and AC bits of every component are spooled into temporary files in
+    whole bytes, and concatenated into `output_file` at the end, since the
+    compressed data place all DC bits of a component before its AC bits. The
+    peak memory is therefore proportional to the width of the image, not its
+    area. The data are the same as those of `compress` with baseline Huffman
+    coding.
+
+    Arguments:
+        file_object {file} -- The raw image file, read sequentially.
+        output_file {file} -- The binary file which the compressed data are
+            written into, the same bytes as `compress(...)['data'].tofile`.
+        size {tuple} -- The size of image in the format of `(nrows, ncols)`.
+
+    Keyword Arguments:
+        quality {int} -- The quality factor. (default: {50})
+        grey_level {bool} -- Whether the image is grey level.
+            (default: {False})
+        subsampling_mode {1 or 2 or 4} -- Subsampling ratio (4:mode).
+            (default: {1})
+        transform {str} -- See `compress`. (default: {'float'})
+        quantization_tables {tuple} -- See `compress`. (default: {None})
+        precision {str} -- See `compress`. (default: {'float64'})
+        color_conversion {str} -- See `compress`. (default: {'float'})
+        rows_per_band {int} -- The number of pixel rows of a band, rounded up
+            to whole rows of blocks of all layers, i.e. 8 (16 with vertical
+            chroma subsampling). Use the minimum if not given.
+            (default: {None})
+
+    Raises:
+        ValueError -- When the quality factor or the options are invalid, or
+            the raw image file is too short.
+
+    Returns:
+        dict -- The header as returned by `compress`.
+    """
+
+    start_time = time.perf_counter()
+    if quality <= 0 or quality > 95:
+        raise ValueError('Quality should within (0, 95].')
+
+    quantization_tables = check_options(
+        grey_level, 'vectorized', False, 'huffman', None, transform,
+        quantization_tables, precision, color_conversion
+    )
+    float_dtype, _ = PRECISIONS[precision]
+
+    # Bands cover whole rows of blocks of all layers.
+    mcu_rows = 8 * (1 if grey_level
+                    else subsampling_factors(subsampling_mode)[0])
+    rows_per_band = -(-(rows_per_band or mcu_rows) // mcu_rows) * mcu_rows
+
+    keys = (Y, ) if grey_level else (Y, CB, CR)
+    spools = {key: {DC: BitSpool(), AC: BitSpool()} for key in keys}
+    # The last DC of every layer, and the first DC of Cr whose prediction is
+    # the last DC of Cb in the chrominance component.
+    last_dc = dict.fromkeys(keys, 0)
+    first_cr_dc = None
+    layers = None
+    for band in read_bands(file_object, size, grey_level, rows_per_band):
+        # Reuse the layer buffers of full bands.
+        layers = forward_color(
+            band, subsampling_mode, dtype=float_dtype,
+            out=layers if len(band) == rows_per_band else None,
+            conversion=color_conversion
+        )
+        for key, layer in layers.items():
+            blocks = forward_transform(
+                layer, key, quality=quality, backend=transform,
+                table=layer_table(quantization_tables, key),
+                precision=precision
+            )
+            encoder = Encoder(blocks, LUMINANCE if key == Y else CHROMINANCE)
+            dc = blocks[:, 0, 0].astype(int)  # pylint: disable=invalid-name
+            diffs = np.diff(dc, prepend=last_dc[key])
+            if key == CR and first_cr_dc is None:
+                # Deferred until the last DC of Cb is known.
+                first_cr_dc = dc[0]
+                diffs = diffs[1:]
+            encoder.diff_dc = tuple(diffs)
+            last_dc[key] = dc[-1]
+            for dc_ac, bits in encoder.encode_bits().items():
+                spools[key][dc_ac].write(bits)
+
+    # Combine data as binary in the order:
+    #   LUMINANCE.DC, LUMINANCE.AC[, CHROMINANCE.DC, CHROMINANCE.AC]
+    # where the chrominance is Cb followed by Cr.
+    parts = ((spools[Y][DC], ), (spools[Y][AC], ))
+    if not grey_level:
+        first = Encoder(np.zeros((1, 8, 8), dtype=int), CHROMINANCE)
+        first.diff_dc = (first_cr_dc - last_dc[CB], )
+        first_spool = BitSpool()
+        first_spool.write(first.encode_bits()[DC])
+        parts += ((spools[CB][DC], first_spool, spools[CR][DC]),
+                  (spools[CB][AC], spools[CR][AC]))
+    writer = BitWriter(output_file)
+    data_slice_lengths = []
+    for part in parts:
+        start = writer.length
+        for spool in part:
+            spool.copy_to(writer)
+        data_slice_lengths.append(writer.length - start)
+    remaining_bits_length = writer.flush()
+
+    header = {
+        'size': size,
+        'grey_level': grey_level,
+        'quality': quality,
+        'subsampling_mode': subsampling_mode,
+        'remaining_bits_length': remaining_bits_length,
+        'data_slice_lengths': tuple(data_slice_lengths),
+        'entropy': 'huffman',
+        'transform': transform
+    }
+    if quantization_tables is not None:
+        header['quantization_tables'] = quantization_tables
+
+    logging.getLogger(__name__).info(
+        'Time elapsed: %.4f seconds', (time.perf_counter() - start_time)
+    )
+    return header
+
+
+def iter_extract(file_object, header, rows_per_band=None,  # pylint: disable=too-many-locals
+                 precision='float64', color_conversion='float'):
+    """Extract a compressed file progressively in horizontal bands.
+
+    The quantized blocks are entropy decoded lazily in the order of block
+    rows, and every band goes through the inverse transform, upsampling and
+    color space conversion on its own. Bands cover whole rows of blocks of
+    all layers, so the chrominance of a band never depends on the
+    neighbouring bands.
+
+    The restart segments of files compressed with `restart_interval` are
+    read from `file_object` (which should be seekable) only when the bands
+    need them, so only the intermediates of a band and a segment are held.
+    Otherwise the compressed data stay in memory, and Huffman coded blocks
+    are decoded a block row at a time, with a pass over the bits of Cb to
+    find those of Cr. The blocks of arithmetic coded files without restart
+    intervals are decoded at first.
+
+    Arguments:
+        file_object {file} -- The compressed file.
+        header {dict} -- The header of the compressed file.
+
+    Keyword Arguments:
+        rows_per_band {int} -- The number of pixel rows of a band, rounded up
+            to whole rows of blocks of all layers, i.e. 8 (16 with vertical
+            chroma subsampling). Use the minimum if not given.
+            (default: {None})
+        precision {str} -- See `extract`. (default: {'float64'})
+        color_conversion {str} -- See `extract`. (default: {'float'})
+
+    Raises:
+        ValueError -- When the options are invalid.
+
+    Yields:
+        np.ndarray -- The uint8 pixels of a band in the shape of
+            `(nrows, ncols)` (grey level) or `(nrows, ncols, 3)` (RGB). The
+            bands concatenated are those returned by `extract`.
+    """
+
+    check_precision(precision)
+    check_color_conversion(color_conversion)
+
+    size = tuple(header['size'])
+    grey_level = header['grey_level']
+    subsampling_mode = header['subsampling_mode']
+    shapes = layer_shapes(size, grey_level, subsampling_mode)
+    factors = {key: 1 if key == Y else subsampling_factors(subsampling_mode)[0]
+               for key in shapes}
+    mcu_rows = 8 * max(factors.values())
+    rows_per_band = -(-(rows_per_band or mcu_rows) // mcu_rows) * mcu_rows
+
+    readers = _block_readers(file_object, header)
+    for start in range(0, size[0], rows_per_band):
+        band = {}
+        for key, (nrows, ncols) in shapes.items():
+            # The rows of the layer in the band.
+            band_shape = (min(nrows, (start + rows_per_band) // factors[key])
+                          - start // factors[key], ncols)
+            # Inverse Quantization, 2D IDCT, Block Combination, Inverse Level
+            # Offset (Luminance) and Clipping Padded Image.
+            band[key] = inverse_transform(
+                readers[key].read(
+                    math.prod(-(-s // 8) for s in band_shape)
+                ),
+                key, band_shape, quality=header['quality'],
+                level_offset=128 if key == Y else 0,
+                backend=header.get('transform', 'float'),
+                table=layer_table(header.get('quantization_tables'), key),
+                precision=precision
+            )
+        # Upsampling (Chrominance), Color Space Conversion, Rounding and
+        # Clipping into the interleaved pixels.
+        yield inverse_color(band, subsampling_mode,
+                            conversion=color_conversion)
+
+
+def extract_stream(file_object, header, output_file, **options):
+    """Extract a compressed file band by band into a raw image file.
+
+    Arguments:
+        file_object {file} -- The compressed file.
+        header {dict} -- The header of the compressed file.
+        output_file {file} -- The binary file which the raw pixels are
+            written into, the same bytes as `extract(...).tofile`.
+
+    Keyword Arguments:
+        **options -- The keyword arguments of `iter_extract`.
+
+    Returns:
+        int -- The number of bytes written.
+    """
+
+    start_time = time.perf_counter()
+    ret = 0
+    for band in iter_extract(file_object, header, **options):
+        output_file.write(band.tobytes())
+        ret += band.nbytes
+    logging.getLogger(__name__).info(
+        'Time elapsed: %.4f seconds', (time.perf_counter() - start_time)
+    )
+    return ret
+
+
+def _block_readers(file_object, header):
+    # Readers of the quantized blocks of layers for `iter_extract`, which
+    # decode the blocks lazily as they are read.
+    shapes = layer_shapes(header['size'], header['grey_level'],
+                          header['subsampling_mode'])
+    nblocks = {key: math.prod(-(-s // 8) for s in shape)
+               for key, shape in shapes.items()}
+    decoder_class, huffman_tables = decoder_options(header)
+
+    if 'segment_offsets' in header:
+        return _segment_readers(file_object, header, nblocks)
+
+    readers = {}
+    bits = bitarray()
+    bits.fromfile(file_object)
+    if decoder_class is not Decoder:
+        # The adaptive entropy decoders decode the components at once.
+        return {key: BlockReader((blocks, ))
+                for key, blocks in decode_layers(bits, header, None).items()}
+
+    # Huffman coded components are decoded a block row at a time.
+    _, components, _ = slice_components(bits, header)
+    for idx, (data, layer_type) in enumerate(components):
+        predictor = 0
+        for key in _COMPONENT_KEYS[idx]:
+            readers[key] = BlockReader(iter_huffman_blocks(
+                data, layer_type, nblocks[key], -(-shapes[key][1] // 8),
+                predictor=predictor, **huffman_tables[idx]
+            ))
+            if key == CB:
+                data, predictor = skip_huffman_blocks(
+                    data, layer_type, nblocks[key], **huffman_tables[idx]
+                )
+    return readers
+
+
+def _segment_readers(file_object, header, nblocks):
+    # Readers of the quantized blocks of layers of files compressed with
+    # `restart_interval`, which read restart segments from the file and
+    # decode them when needed.
+    decoder_class, huffman_tables = decoder_options(header)
+    restart_interval = header['restart_interval']
+    origin = file_object.tell() * 8
+    readers = {}
+    for idx, (offsets, layer_type) in enumerate(zip(
+            component_offsets(header), (LUMINANCE, CHROMINANCE))):
+        data = {dc_ac: FileBits(file_object, origin + offsets[dc_ac])
+                for dc_ac in (DC, AC)}
+        start = 0
+        for key in _COMPONENT_KEYS[idx]:
+            first = start // restart_interval
+            readers[key] = BlockReader(iter_segments(
+                decoder_class, data, segment_offsets(header, idx),
+                layer_type, first=first, **huffman_tables[idx]
+            ))
+            # Skip the blocks of Cb in the first segment of Cr.
+            readers[key].read(start - first * restart_interval)
+            start += nblocks[key]
+    return readers
+
+
+def _take_pairs(symbols, pending, nblocks):
+    # Return the run-length-encoded AC pairs of the next `nblocks` blocks,
+    # which are the pending pairs followed by the decoded symbols, and the
+    # pairs left pending.
+    chunks = [pending]
+    count = len(_eob_ends(pending))
+    while count < nblocks:
+        chunk = np.array(
+            list(itertools.islice(symbols, SYMBOL_CHUNK_SIZE)), dtype=np.int32
+        ).reshape(-1, 2)
+        if chunk.size == 0:
+            raise ValueError(f'The AC bits end after {count} of {nblocks} '
+                             'blocks.')
+        chunks.append(chunk)
+        count += len(_eob_ends(chunk))
+    pairs = np.concatenate(chunks)
+    stop = _eob_ends(pairs)[nblocks - 1] if nblocks else 0
+    return pairs[:stop], pairs[stop:]
+
+
+def _eob_ends(pairs):
+    # The indices after the EOBs of run-length-encoded AC pairs.
+    return np.flatnonzero((pairs[:, 0] == EOB[0])
+                          & (pairs[:, 1] == EOB[1])) + 1
@@ -0,0 +1,378 @@
+import math
+
+import numpy as np
+
+from . import aan
+from .blocks import BLOCK_SIZE, block_view, pad_layer, padded_shape
+from .quantizer import get_quantizer
+from .utils import dct2d, idct2d
+
+
+def forward_transform(layer, block_type, quality=50, level_offset=0,  # pylint: disable=too-many-arguments, too-many-locals
+                      chunk_size=None, backend='float', table=None,
+                      precision='float64', out=None):
+    """Transform a layer into quantized DCT blocks.
+
+    The layer is level offset, padded to whole blocks by replicating the
+    edges, transformed by 2D DCT, quantized and rounded. Every step works on
+    the whole stack of blocks (or a chunk of block rows) at once. A
+    block-aligned layer without level offset is read through a block view
+    (`blocks.block_view`) without copying.
+
+    Arguments:
+        layer {np.ndarray} -- The 2D layer.
+        block_type {Y, CB or CR} -- Specify the layer type of blocks.
+
+    Keyword Arguments:
+        quality {int} -- The quality factor. (default: {50})
+        level_offset {int} -- The value subtracted from the layer before
+            padding. (default: {0})
+        chunk_size {int} -- The maximum number of blocks transformed at once
+            to bound the memory of temporaries. It is rounded down to whole
+            block rows (at least one). Transform the whole layer at once if
+            not given. (default: {None})
+        backend {str} -- The name of transform backend in `TRANSFORMS`.
+            (default: {'float'})
+        table {array-like} -- The custom 8 * 8 base quantization table. See
+            `quantizer.get_quantizer`. (default: {None})
+        precision {str} -- The name of precision in `PRECISIONS`.
+            (default: {'float64'})
+        out {np.ndarray} -- The array in the shape of (n, 8, 8) which the
+            blocks are written into, e.g. a reused buffer. Allocate a new one
+            if not given. (default: {None})
+
+    Returns:
+        np.ndarray -- The quantized blocks in the shape of (n, 8, 8) in the
+            same order as `utils.block_slice`.
+    """
+
+    quantizer = get_quantizer(block_type, quality, table=table)
+    dct, quantize, _ = TRANSFORMS[backend]
+    float_dtype, coefficient_dtype = PRECISIONS[precision]
+    ret = out
+    if ret is None:
+        nblocks = math.prod(-(-s // BLOCK_SIZE) for s in layer.shape)
+        ret = np.empty((nblocks, BLOCK_SIZE, BLOCK_SIZE),
+                       dtype=coefficient_dtype)
+    for start, stop, blocks in _block_chunks(layer, level_offset,
+                                             chunk_size, float_dtype):
+        ret[start:stop] = quantize(dct(blocks), quantizer).reshape(
+            (-1, BLOCK_SIZE, BLOCK_SIZE)
+        )
+    return ret
+
+
+def dct_transform(layer, level_offset=0, chunk_size=None, backend='float',
+                  precision='float64'):
+    """Transform a layer into (unquantized) DCT blocks, which could be
+    quantized with different quality factors by `quantize_transform`.
+
+    Arguments:
+        layer {np.ndarray} -- The 2D layer.
+
+    Keyword Arguments:
+        level_offset {int} -- The value subtracted from the layer before
+            padding. (default: {0})
+        chunk_size {int} -- The maximum number of blocks transformed at once.
+            See `forward_transform`. (default: {None})
+        backend {str} -- The name of transform backend in `TRANSFORMS`.
+            (default: {'float'})
+        precision {str} -- The name of precision in `PRECISIONS`.
+            (default: {'float64'})
+
+    Returns:
+        np.ndarray -- The DCT coefficients in the shape of (n, 8, 8), scaled
+            as the transform backend does.
+    """
+
+    dct, _, _ = TRANSFORMS[backend]
+    float_dtype, _ = PRECISIONS[precision]
+    return np.concatenate(tuple(
+        dct(blocks).reshape(-1, BLOCK_SIZE, BLOCK_SIZE)
+        for _, _, blocks in _block_chunks(layer, level_offset, chunk_size,
+                                          float_dtype)
+    ))
+
+
+def quantize_transform(coefficients, block_type, quality=50, backend='float',  # pylint: disable=too-many-arguments
+                       table=None, precision='float64'):
+    """Quantize and round the DCT blocks returned by `dct_transform`.
+
+    `quantize_transform(dct_transform(layer, ...), ...)` is the same as
+    `forward_transform(layer, ...)`.
+
+    Arguments:
+        coefficients {np.ndarray} -- The DCT coefficients in the shape of
+            (n, 8, 8).
+        block_type {Y, CB or CR} -- Specify the layer type of blocks.
+
+    Keyword Arguments:
+        quality {int} -- The quality factor. (default: {50})
+        backend {str} -- The name of transform backend in `TRANSFORMS`.
+            (default: {'float'})
+        table {array-like} -- The custom 8 * 8 base quantization table. See
+            `quantizer.get_quantizer`. (default: {None})
+        precision {str} -- The name of precision in `PRECISIONS`.
+            (default: {'float64'})
+
+    Returns:
+        np.ndarray -- The quantized blocks in the shape of (n, 8, 8).
+    """
+
+    _, quantize, _ = TRANSFORMS[backend]
+    _, coefficient_dtype = PRECISIONS[precision]
+    return quantize(
+        coefficients, get_quantizer(block_type, quality, table=table)
+    ).astype(coefficient_dtype)
+
+
+def requantize_transform(blocks, block_type, quality, new_quality,  # pylint: disable=too-many-arguments
+                         table=None, new_table=None):
+    """Requantize quantized blocks with another quality factor in the DCT
+    domain, i.e. dequantize with the old table and quantize with the new one.
+
+    The quantized coefficients of all transform backends are in the scale of
+    the orthonormal DCT, so the blocks of any backend could be requantized.
+
+    Arguments:
+        blocks {np.ndarray} -- The quantized blocks in the shape of (n, 8, 8).
+        block_type {Y, CB or CR} -- Specify the layer type of blocks.
+        quality {int} -- The quality factor of blocks.
+        new_quality {int} -- The quality factor of the returned blocks.
+
+    Keyword Arguments:
+        table {array-like} -- The custom 8 * 8 base quantization table of
+            blocks. (default: {None})
+        new_table {array-like} -- The custom 8 * 8 base quantization table of
+            the returned blocks. (default: {None})
+
+    Returns:
+        np.ndarray -- The requantized blocks in the shape of (n, 8, 8) and
+            the dtype of `blocks`.
+    """
+
+    quantizer = get_quantizer(block_type, quality, table=table)
+    new_quantizer = get_quantizer(block_type, new_quality, table=new_table)
+    return np.rint(
+        new_quantizer.quantize(quantizer.dequantize(blocks))
+    ).astype(blocks.dtype)
+
+
+def inverse_transform(blocks, block_type, shape, quality=50, level_offset=0,  # pylint: disable=too-many-arguments, too-many-locals
+                      chunk_size=None, backend='float', table=None,
+                      precision='float64', out=None):
+    """Transform quantized DCT blocks back into a layer.
+
+    The blocks are dequantized and transformed by 2D IDCT in batches, and
+    written directly into the padded layer buffer. The level offset is then
+    added back and the padding is clipped. The inverse of
+    `forward_transform`.
+
+
+    Arguments:
+        blocks {np.ndarray} -- The quantized blocks in the shape of
+            (n, 8, 8) in the same order as `utils.block_slice`.
+        block_type {Y, CB or CR} -- Specify the layer type of blocks.
+        shape {tuple} -- The shape of the layer before padding.
+
+    Keyword Arguments:
+        quality {int} -- The quality factor. (default: {50})
+        level_offset {int} -- The value added to the layer after the
+            transform. (default: {0})
+        chunk_size {int} -- The maximum number of blocks transformed at once
+            to bound the memory of temporaries. It is rounded down to whole
+            block rows (at least one). Transform all blocks at once if not
+            given. (default: {None})
+        backend {str} -- The name of transform backend in `TRANSFORMS`.
+            (default: {'float'})
+        table {array-like} -- The custom 8 * 8 base quantization table. See
+            `quantizer.get_quantizer`. (default: {None})
+        precision {str} -- The name of precision in `PRECISIONS`.
+            (default: {'float64'})
+        out {np.ndarray} -- The padded layer buffer in the shape of `shape`
+            rounded up to whole blocks, e.g. a reused buffer. Allocate a new
+            one if not given. (default: {None})
+
+    Raises:
+        ValueError -- When the number of blocks does not fit the shape.
+
+    Returns:
+        np.ndarray -- The float layer in `shape` (a view of `out` if given).
+    """
+
+    nrows, ncols = shape
+    padded_nrows, padded_ncols = padded_shape(shape)
+    blocks_per_row = padded_ncols // BLOCK_SIZE
+    blocks_per_col = padded_nrows // BLOCK_SIZE
+    if len(blocks) != blocks_per_row * blocks_per_col:
+        raise ValueError(f'The number of blocks ({len(blocks)}) should be '
+                         f'{blocks_per_row * blocks_per_col} for a layer of '
+                         f'shape {tuple(shape)}.')
+    quantizer = get_quantizer(block_type, quality, table=table)
+    _, _, inverse = TRANSFORMS[backend]
+    float_dtype, _ = PRECISIONS[precision]
+
+    rows_per_chunk = blocks_per_col
+    if chunk_size is not None:
+        rows_per_chunk = max(1, chunk_size // blocks_per_row)
+
+    ret = out
+    if ret is None:
+        ret = np.empty((padded_nrows, padded_ncols), dtype=float_dtype)
+    # A view of the layer buffer as block rows of blocks.
+    view = block_view(ret)
+    for start in range(0, blocks_per_col, rows_per_chunk):
+        stop = min(start + rows_per_chunk, blocks_per_col)
+        view[start:stop] = inverse(
+            blocks[start * blocks_per_row:stop * blocks_per_row], quantizer,
+            float_dtype
+        ).reshape((stop - start, blocks_per_row, BLOCK_SIZE, BLOCK_SIZE))
+    ret = ret[:nrows, :ncols]
+    ret += level_offset
+    return ret
+
+
+def float_dct(blocks):
+    """DCT blocks with `scipy.fftpack` in the precision of the blocks.
+
+    Arguments:
+        blocks {np.ndarray} -- The level offset samples in the shape of
+            (..., 8, 8).
+
+    Returns:
+        np.ndarray -- The DCT coefficients.
+    """
+
+    return dct2d(blocks)
+
+
+def float_quantize(coefficients, quantizer):
+    """Quantize and round the coefficients of `float_dct`.
+
+    Arguments:
+        coefficients {np.ndarray} -- The DCT coefficients in the shape of
+            (..., 8, 8).
+        quantizer {Quantizer} -- The quantizer of blocks.
+
+    Returns:
+        np.ndarray -- The rounded quantized coefficients.
+    """
+
+    return np.rint(quantizer.quantize(coefficients, dtype=coefficients.dtype))
+
+
+def float_inverse(blocks, quantizer, dtype=np.float64):
+    """Dequantize and IDCT blocks with `scipy.fftpack`.
+
+    Both the dequantized coefficients and the IDCT outputs are truncated
+    toward zero, which is the integer arithmetic of the decoded blocks.
+
+    Arguments:
+        blocks {np.ndarray} -- The quantized coefficients in the shape of
+            (n, 8, 8).
+        quantizer {Quantizer} -- The quantizer of blocks.
+
+    Keyword Arguments:
+        dtype {np.dtype} -- The float dtype of the computation.
+            (default: {np.float64})
+
+    Returns:
+        np.ndarray -- The level offset samples.
+    """
+
+    return np.trunc(idct2d(np.trunc(quantizer.dequantize(blocks,
+                                                         dtype=dtype))))
+
+
+def aan_dct(blocks):
+    """DCT blocks with the fixed-point AAN transform (`aan.fdct`). The
+    samples are rounded to integers at first.
+
+    Arguments:
+        blocks {np.ndarray} -- The level offset samples in the shape of
+            (..., 8, 8).
+
+    Returns:
+        np.ndarray -- The scaled DCT coefficients (int32).
+    """
+
+    return aan.fdct(np.rint(blocks).astype(np.int16))
+
+
+def aan_quantize(coefficients, quantizer):
+    """Quantize and round the coefficients of `aan_dct`. The scale of the
+    coefficients is folded into the quantization table.
+
+    Arguments:
+        coefficients {np.ndarray} -- The scaled DCT coefficients in the shape
+            of (..., 8, 8).
+        quantizer {Quantizer} -- The quantizer of blocks.
+
+    Returns:
+        np.ndarray -- The rounded quantized coefficients.
+    """
+
+    return np.rint(coefficients * quantizer.derive(_aan_forward_reciprocal))
+
+
+def aan_inverse(blocks, quantizer, dtype=np.float64):  # pylint: disable=unused-argument
+    """Dequantize and IDCT blocks with the fixed-point AAN transform
+    (`aan.idct`), which is bit-reproducible.
+
+    Arguments:
+        blocks {np.ndarray} -- The quantized coefficients in the shape of
+            (n, 8, 8).
+        quantizer {Quantizer} -- The quantizer of blocks.
+
+    Keyword Arguments:
+        dtype {np.dtype} -- Unused, as the computation is in integers.
+            (default: {np.float64})
+
+    Returns:
+        np.ndarray -- The rounded level offset samples (int16).
+    """
+
+    return aan.idct(blocks, quantizer.derive(aan.inverse_multipliers))
+
+
+def _aan_forward_reciprocal(table):
+    return 1 / aan.forward_divisors(table)
+
+
+def _block_chunks(layer, level_offset, chunk_size, dtype):
+    """Yield `(start, stop, blocks)` of the padded and level offset layer in
+    chunks of block rows, where `start` and `stop` are the block indices and
+    `blocks` (in `dtype`) is in the shape of `(block rows, blocks per row, 8,
+    8)`.
+    """
+
+    if level_offset or layer.shape != padded_shape(layer.shape):
+        layer = pad_layer(layer, level_offset, dtype)
+    view = block_view(layer)
+    block_rows, blocks_per_row = view.shape[:2]
+
+    rows_per_chunk = block_rows
+    if chunk_size is not None:
+        rows_per_chunk = max(1, chunk_size // blocks_per_row)
+
+    for start in range(0, block_rows, rows_per_chunk):
+        blocks = view[start:start + rows_per_chunk]
+        if blocks.dtype != dtype:
+            blocks = blocks.astype(dtype)
+        yield (start * blocks_per_row,
+               (start + len(blocks)) * blocks_per_row, blocks)
+
+
+# Precisions in the format of `{name: (float dtype, quantized coefficient
+# dtype)}`. Quantized coefficients of baseline JPEG are within 12 bits.
+PRECISIONS = {
+    'float64': (np.float64, int),
+    'float32': (np.float32, np.int16),
+}
+
+# Transform backends in the format of `{name: (dct, quantize, inverse)}`. See
+# `float_dct`, `float_quantize` and `float_inverse` for the signatures.
+TRANSFORMS = {
+    'float': (float_dct, float_quantize, float_inverse),
+    'aan': (aan_dct, aan_quantize, aan_inverse),
+}
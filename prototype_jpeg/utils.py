@@ -162,22 +162,40 @@ def block_combine(arr, nrows, ncols):
 
 
 def dct2d(arr):
-    return dct(dct(arr, norm='ortho', axis=0), norm='ortho', axis=1)
+    # Transform the last two axes, so a stack of blocks is transformed at once.
+    return dct(dct(arr, norm='ortho', axis=-2), norm='ortho', axis=-1)
 
 
 def idct2d(arr):
-    return idct(idct(arr, norm='ortho', axis=0), norm='ortho', axis=1)
+    return idct(idct(arr, norm='ortho', axis=-2), norm='ortho', axis=-1)
 
 
-def quantize(block, block_type, quality=50, inverse=False):
-    if block_type == Y:
-        quantization_table = LUMINANCE_QUANTIZATION_TABLE
-    else:  # Cb or Cr (LUMINANCE)
-        quantization_table = CHROMINANCE_QUANTIZATION_TABLE
+def quantization_table(block_type, quality=50, table=None):
+    """Return the quantization table scaled by the quality factor.
+
+    Arguments:
+        block_type {Y, CB or CR} -- Specify the layer type of blocks.
+
+    Keyword Arguments:
+        quality {int} -- The quality factor. (default: {50})
+        table {np.ndarray} -- The 8 * 8 base table used instead of the
+            baseline JPEG table of `block_type`. (default: {None})
+
+    Returns:
+        np.ndarray -- The scaled 8 * 8 quantization table.
+    """
+
+    if table is None:
+        table = (LUMINANCE_QUANTIZATION_TABLE if block_type == Y
+                 else CHROMINANCE_QUANTIZATION_TABLE)  # Cb or Cr
     factor = 5000 / quality if quality < 50 else 200 - 2 * quality
+    return table * factor / 100
+
+
+def quantize(block, block_type, quality=50, inverse=False):
     if inverse:
-        return block * (quantization_table * factor / 100)
-    return block / (quantization_table * factor / 100)
+        return block * quantization_table(block_type, quality)
+    return block / quantization_table(block_type, quality)
 
 
 LUMINANCE_QUANTIZATION_TABLE = np.array((
@@ -0,0 +1,71 @@
+import functools
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=None)
+def zig_zag_indices(size):
+    """Return the flat indices of a square block in zig-zag order.
+
+    The scan walks the anti-diagonals from the top-left corner. Odd
+    anti-diagonals are walked downward and even ones upward, which is the same
+    order as `codec.iter_zig_zag`.
+
+    Arguments:
+        size {int} -- The row (column) size of the square block.
+
+    Returns:
+        np.ndarray -- A read-only permutation of `range(size ** 2)`.
+    """
+
+    rows, cols = np.indices((size, size)).reshape(2, -1)
+    diagonals = rows + cols
+    # Sort by anti-diagonal, then by row with the direction of the diagonal.
+    ret = np.lexsort((np.where(diagonals % 2, rows, -rows), diagonals))
+    ret.flags.writeable = False
+    return ret
+
+
+def zig_zag(blocks):
+    """Scan a stack of square blocks in zig-zag order.
+
+    Arguments:
+        blocks {np.ndarray} -- Blocks in the shape of (n, size, size).
+
+    Raises:
+        ValueError -- When the blocks are not square.
+
+    Returns:
+        np.ndarray -- Sequences in the shape of (n, size * size).
+    """
+
+    nblocks, nrows, ncols = np.shape(blocks)
+    if nrows != ncols:
+        raise ValueError('The shape of input blocks should be square.')
+    return np.reshape(blocks, (nblocks, -1))[:, zig_zag_indices(nrows)]
+
+
+def inverse_zig_zag(seqs, size):
+    """Fill a stack of square blocks with sequences in zig-zag order.
+
+    Arguments:
+        seqs {np.ndarray} -- Sequences in the shape of (n, length), where
+            `length <= size ** 2`. The rest elements of blocks are filled with
+            0s.
+        size {int} -- The row (column) size of the square blocks.
+
+    Raises:
+        ValueError -- When the sequences are too long to fill the blocks.
+
+    Returns:
+        np.ndarray -- Blocks in the shape of (n, size, size).
+    """
+
+    seqs = np.asarray(seqs)
+    nblocks, length = seqs.shape
+    if length > size ** 2:
+        raise ValueError(f'The length of sequences ({length}) should not be '
+                         f'larger than {size ** 2}.')
+    ret = np.zeros((nblocks, size ** 2), dtype=seqs.dtype)
+    ret[:, zig_zag_indices(size)[:length]] = seqs
+    return ret.reshape((nblocks, size, size))
@@ -1,7 +1,16 @@
+import concurrent.futures
 import tempfile
 import unittest
+from unittest import mock
 
-from prototype_jpeg import __version__, compress, extract
+import numpy as np
+
+from prototype_jpeg import (__version__, compress, compress_to_size,
+                            compress_multi, compress_stream, transcode,
+                            extract, iter_extract, extract_stream,
+                            executor_context, Codec)
+from prototype_jpeg.stream import BlockReader
+from prototype_jpeg.utils import psnr
 
 
 def test_version():
@@ -169,6 +178,592 @@ class TestCompressAndExtract(unittest.TestCase):
             'subsampling_mode': 4
         })
 
+    def test_huffman_backends_identical(self):
+        for fn, grey_level in (('tests/images/rgb/Lena.raw', False),
+                               ('tests/images/grey_level/Lena.raw', True)):
+            compressed = []
+            for backend in ('string', 'vectorized'):
+                with open(fn, 'rb') as raw_file:
+                    compressed.append(compress(
+                        raw_file,
+                        size=(512, 512),
+                        grey_level=grey_level,
+                        huffman_backend=backend
+                    ))
+            self.assertEqual(compressed[0]['data'], compressed[1]['data'])
+            self.assertDictEqual(compressed[0]['header'],
+                                 compressed[1]['header'])
+
+    def test_optimize_huffman(self):
+        for fn, grey_level in (('tests/images/rgb/Baboon.raw', False),
+                               ('tests/images/grey_level/Baboon.raw', True)):
+            spec = {
+                'fn': fn,
+                'size': (512, 512),
+                'grey_level': grey_level,
+                'quality': 50,
+                'subsampling_mode': 1
+            }
+            with open(fn, 'rb') as raw_file:
+                baseline = compress(raw_file, size=(512, 512),
+                                    grey_level=grey_level)
+                raw_file.seek(0)
+                optimized = compress(raw_file, size=(512, 512),
+                                     grey_level=grey_level,
+                                     optimize_huffman=True)
+            self.assertEqual(len(optimized['header']['huffman_tables']),
+                             1 if grey_level else 2)
+            self.assertLess(len(optimized['data']), len(baseline['data']))
+            with tempfile.TemporaryFile() as compressed_file:
+                optimized['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                extracted = extract(compressed_file,
+                                    header=optimized['header'])
+            np.testing.assert_array_equal(extracted,
+                                          compress_and_extract(spec))
+
+    def test_arithmetic_entropy(self):
+        for fn, grey_level in (('tests/images/rgb/Baboon.raw', False),
+                               ('tests/images/grey_level/Baboon.raw', True)):
+            spec = {
+                'fn': fn,
+                'size': (512, 512),
+                'grey_level': grey_level,
+                'quality': 50,
+                'subsampling_mode': 1
+            }
+            with open(fn, 'rb') as raw_file:
+                baseline = compress(raw_file, size=(512, 512),
+                                    grey_level=grey_level)
+                raw_file.seek(0)
+                arithmetic = compress(raw_file, size=(512, 512),
+                                      grey_level=grey_level,
+                                      entropy='arithmetic')
+            self.assertEqual(arithmetic['header']['entropy'], 'arithmetic')
+            self.assertLess(len(arithmetic['data']), len(baseline['data']))
+            with tempfile.TemporaryFile() as compressed_file:
+                arithmetic['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                extracted = extract(compressed_file,
+                                    header=arithmetic['header'])
+            np.testing.assert_array_equal(extracted,
+                                          compress_and_extract(spec))
+
+    def test_arithmetic_entropy_huffman_options(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         entropy='arithmetic', optimize_huffman=True)
+
+    def test_unknown_entropy(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         entropy='unknown')
+
+    def test_restart_interval(self):
+        for fn, grey_level in (('tests/images/rgb/Baboon.raw', False),
+                               ('tests/images/grey_level/Baboon.raw', True)):
+            spec = {
+                'fn': fn,
+                'size': (512, 512),
+                'grey_level': grey_level,
+                'quality': 50,
+                'subsampling_mode': 1
+            }
+            with open(fn, 'rb') as raw_file:
+                compressed = compress(raw_file, size=(512, 512),
+                                      grey_level=grey_level,
+                                      restart_interval=100)
+            header = compressed['header']
+            self.assertEqual(header['restart_interval'], 100)
+            self.assertEqual(len(header['segment_offsets']),
+                             len(header['data_slice_lengths']))
+            for max_workers in (None, 2):
+                with tempfile.TemporaryFile() as compressed_file:
+                    compressed['data'].tofile(compressed_file)
+                    compressed_file.seek(0)
+                    extracted = extract(compressed_file, header=header,
+                                        max_workers=max_workers)
+                np.testing.assert_array_equal(extracted,
+                                              compress_and_extract(spec))
+
+    def test_invalid_restart_interval(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         restart_interval=0)
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         restart_interval=8, huffman_backend='string')
+
+    def test_concurrent_entropy_coding(self):
+        fn = 'tests/images/rgb/Lena.raw'
+        with open(fn, 'rb') as raw_file:
+            expect = compress(raw_file, size=(512, 512))
+        with concurrent.futures.ThreadPoolExecutor(2) as pool:
+            for executor in ('thread', 'process', pool):
+                with open(fn, 'rb') as raw_file:
+                    compressed = compress(raw_file, size=(512, 512),
+                                          executor=executor, max_workers=2)
+                self.assertEqual(compressed['data'], expect['data'])
+                self.assertDictEqual(compressed['header'], expect['header'])
+                with tempfile.TemporaryFile() as compressed_file:
+                    compressed['data'].tofile(compressed_file)
+                    compressed_file.seek(0)
+                    extracted = extract(compressed_file,
+                                        header=compressed['header'],
+                                        executor=executor)
+                np.testing.assert_array_equal(extracted, compress_and_extract({
+                    'fn': fn,
+                    'size': (512, 512),
+                    'grey_level': False,
+                    'quality': 50,
+                    'subsampling_mode': 1
+                }))
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            with executor_context('unknown'):
+                pass
+
+    def test_aan_transform(self):
+        fn = 'tests/images/rgb/Lena.raw'
+        with open(fn, 'rb') as raw_file:
+            original = np.fromfile(raw_file, dtype=np.uint8)
+            raw_file.seek(0)
+            compressed = compress(raw_file, size=(512, 512), transform='aan')
+        self.assertEqual(compressed['header']['transform'], 'aan')
+        with tempfile.TemporaryFile() as compressed_file:
+            compressed['data'].tofile(compressed_file)
+            compressed_file.seek(0)
+            extracted = extract(compressed_file, header=compressed['header'])
+        expect = compress_and_extract({
+            'fn': fn,
+            'size': (512, 512),
+            'grey_level': False,
+            'quality': 50,
+            'subsampling_mode': 1
+        })
+        self.assertAlmostEqual(psnr(extracted * 1., original * 1.),
+                               psnr(expect * 1., original * 1.), delta=0.1)
+
+    def test_unknown_transform(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         transform='unknown')
+
+    def test_quantization_tables(self):
+        fn = 'tests/images/rgb/Lena.raw'
+        with open(fn, 'rb') as raw_file:
+            original = np.fromfile(raw_file, dtype=np.uint8)
+            raw_file.seek(0)
+            baseline = compress(raw_file, size=(512, 512))
+            raw_file.seek(0)
+            compressed = compress(raw_file, size=(512, 512),
+                                  quantization_tables=(np.full((8, 8), 4),
+                                                       np.full((8, 8), 8)))
+        self.assertEqual(compressed['header']['quantization_tables'],
+                         (((4, ) * 8, ) * 8, ((8, ) * 8, ) * 8))
+        self.assertGreater(len(compressed['data']), len(baseline['data']))
+        with tempfile.TemporaryFile() as compressed_file:
+            compressed['data'].tofile(compressed_file)
+            compressed_file.seek(0)
+            extracted = extract(compressed_file, header=compressed['header'])
+        expect = compress_and_extract({
+            'fn': fn,
+            'size': (512, 512),
+            'grey_level': False,
+            'quality': 50,
+            'subsampling_mode': 1
+        })
+        self.assertGreater(psnr(extracted * 1., original * 1.),
+                           psnr(expect * 1., original * 1.))
+
+    def test_invalid_quantization_tables(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         quantization_tables=(np.ones((8, 8)), ) * 2)
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         quantization_tables=(np.zeros((8, 8)), ))
+
+    def test_compress_to_size(self):
+        for fn, grey_level, max_bytes in (
+                ('tests/images/rgb/Lena.raw', False, 20000),
+                ('tests/images/grey_level/Baboon.raw', True, 30000)):
+            with open(fn, 'rb') as raw_file:
+                compressed = compress_to_size(raw_file, size=(512, 512),
+                                              max_bytes=max_bytes,
+                                              grey_level=grey_level)
+            quality = compressed['header']['quality']
+            self.assertLessEqual(len(compressed['data'].tobytes()), max_bytes)
+            with open(fn, 'rb') as raw_file:
+                expect = compress(raw_file, size=(512, 512), quality=quality,
+                                  grey_level=grey_level)
+                raw_file.seek(0)
+                higher = compress(raw_file, size=(512, 512),
+                                  quality=quality + 1, grey_level=grey_level)
+            self.assertEqual(compressed['data'], expect['data'])
+            self.assertDictEqual(compressed['header'], expect['header'])
+            self.assertGreater(len(higher['data'].tobytes()), max_bytes)
+
+    def test_compress_to_size_too_small(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress_to_size(raw_file, size=(512, 512), max_bytes=100,
+                                 grey_level=True)
+
+    def test_compress_multi(self):
+        qualities = (90, 50, 5)
+        for fn, grey_level in (('tests/images/rgb/Baboon.raw', False),
+                               ('tests/images/grey_level/Lena.raw', True)):
+            with open(fn, 'rb') as raw_file:
+                results = compress_multi(raw_file, size=(512, 512),
+                                         qualities=qualities,
+                                         grey_level=grey_level,
+                                         entropy='arithmetic')
+            self.assertEqual(len(results), len(qualities))
+            for quality, compressed in zip(qualities, results):
+                with open(fn, 'rb') as raw_file:
+                    expect = compress(raw_file, size=(512, 512),
+                                      quality=quality, grey_level=grey_level,
+                                      entropy='arithmetic')
+                self.assertEqual(compressed['data'], expect['data'])
+                self.assertDictEqual(compressed['header'], expect['header'])
+
+    def test_compress_multi_invalid_quality(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress_multi(raw_file, size=(512, 512), qualities=(50, 0),
+                               grey_level=True)
+
+    def test_transcode(self):
+        for fn, grey_level in (('tests/images/rgb/Lena.raw', False),
+                               ('tests/images/grey_level/Baboon.raw', True)):
+            with open(fn, 'rb') as raw_file:
+                original = np.fromfile(raw_file, dtype=np.uint8)
+                raw_file.seek(0)
+                compressed = compress(raw_file, size=(512, 512), quality=90,
+                                      grey_level=grey_level)
+            with tempfile.TemporaryFile() as compressed_file:
+                compressed['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                same = transcode(compressed_file, compressed['header'],
+                                 quality=90)
+                compressed_file.seek(0)
+                transcoded = transcode(compressed_file, compressed['header'],
+                                       quality=30)
+            self.assertEqual(same['data'], compressed['data'])
+            self.assertDictEqual(same['header'], compressed['header'])
+            self.assertEqual(transcoded['header']['quality'], 30)
+            self.assertLess(len(transcoded['data']), len(compressed['data']))
+            with tempfile.TemporaryFile() as compressed_file:
+                transcoded['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                extracted = extract(compressed_file,
+                                    header=transcoded['header'])
+            expect = compress_and_extract({
+                'fn': fn,
+                'size': (512, 512),
+                'grey_level': grey_level,
+                'quality': 30,
+                'subsampling_mode': 1
+            })
+            self.assertAlmostEqual(psnr(extracted * 1., original * 1.),
+                                   psnr(expect * 1., original * 1.),
+                                   delta=0.5)
+
+    def test_transcode_invalid_quality(self):
+        with tempfile.TemporaryFile() as compressed_file:
+            with self.assertRaises(ValueError):
+                transcode(compressed_file, {'grey_level': True}, quality=0)
+
+    def test_float32_precision(self):
+        for fn, grey_level in (('tests/images/rgb/Lena.raw', False),
+                               ('tests/images/grey_level/Baboon.raw', True)):
+            with open(fn, 'rb') as raw_file:
+                original = np.fromfile(raw_file, dtype=np.uint8)
+                raw_file.seek(0)
+                compressed = compress(raw_file, size=(512, 512),
+                                      grey_level=grey_level,
+                                      precision='float32')
+            with tempfile.TemporaryFile() as compressed_file:
+                compressed['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                extracted = extract(compressed_file,
+                                    header=compressed['header'],
+                                    precision='float32')
+            expect = compress_and_extract({
+                'fn': fn,
+                'size': (512, 512),
+                'grey_level': grey_level,
+                'quality': 50,
+                'subsampling_mode': 1
+            })
+            self.assertEqual(extracted.shape, expect.shape)
+            self.assertAlmostEqual(psnr(extracted * 1., original * 1.),
+                                   psnr(expect * 1., original * 1.),
+                                   delta=0.01)
+
+    def test_unknown_precision(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         precision='float16')
+            with self.assertRaises(ValueError):
+                extract(raw_file, header={}, precision='float16')
+
+    def test_integer_color_conversion(self):
+        for fn, grey_level in (('tests/images/rgb/Lena.raw', False),
+                               ('tests/images/grey_level/Baboon.raw', True)):
+            with open(fn, 'rb') as raw_file:
+                original = np.fromfile(raw_file, dtype=np.uint8)
+                raw_file.seek(0)
+                compressed = compress(raw_file, size=(512, 512),
+                                      grey_level=grey_level,
+                                      subsampling_mode=2, transform='aan',
+                                      color_conversion='integer')
+            with tempfile.TemporaryFile() as compressed_file:
+                compressed['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                extracted = extract(compressed_file,
+                                    header=compressed['header'],
+                                    color_conversion='integer')
+            with open(fn, 'rb') as raw_file:
+                expect = compress(raw_file, size=(512, 512),
+                                  grey_level=grey_level, subsampling_mode=2,
+                                  transform='aan')
+            with tempfile.TemporaryFile() as compressed_file:
+                expect['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                expect = extract(compressed_file, header=expect['header'])
+            self.assertEqual(extracted.shape, expect.shape)
+            self.assertAlmostEqual(psnr(extracted * 1., original * 1.),
+                                   psnr(expect * 1., original * 1.),
+                                   delta=0.05)
+
+    def test_unknown_color_conversion(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         color_conversion='fixed')
+            with self.assertRaises(ValueError):
+                extract(raw_file, header={}, color_conversion='fixed')
+
+    def test_compress_stream(self):
+        for fn, grey_level, options in (
+                ('tests/images/rgb/Lena.raw', False, {}),
+                ('tests/images/rgb/Baboon.raw', False,
+                 {'subsampling_mode': 2, 'transform': 'aan',
+                  'rows_per_band': 20}),
+                ('tests/images/grey_level/Baboon.raw', True,
+                 {'quality': 80, 'precision': 'float32'})):
+            band_options = dict(options)
+            options.pop('rows_per_band', None)
+            with open(fn, 'rb') as raw_file:
+                expect = compress(raw_file, size=(512, 512),
+                                  grey_level=grey_level, **options)
+                raw_file.seek(0)
+                with tempfile.TemporaryFile() as output_file:
+                    header = compress_stream(raw_file, output_file,
+                                             size=(512, 512),
+                                             grey_level=grey_level,
+                                             **band_options)
+                    output_file.seek(0)
+                    data = output_file.read()
+            self.assertDictEqual(header, expect['header'])
+            self.assertEqual(data, expect['data'].tobytes())
+
+    def test_compress_stream_odd_size(self):
+        image = np.random.RandomState(0).randint(
+            0, 256, (37, 53, 3)
+        ).astype(np.uint8)
+        with tempfile.TemporaryFile() as raw_file:
+            image.tofile(raw_file)
+            raw_file.seek(0)
+            expect = compress(raw_file, size=(37, 53))
+            raw_file.seek(0)
+            with tempfile.TemporaryFile() as output_file:
+                header = compress_stream(raw_file, output_file, size=(37, 53))
+                output_file.seek(0)
+                data = output_file.read()
+        self.assertDictEqual(header, expect['header'])
+        self.assertEqual(data, expect['data'].tobytes())
+
+    def test_compress_stream_too_short(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with tempfile.TemporaryFile() as output_file:
+                with self.assertRaises(ValueError):
+                    compress_stream(raw_file, output_file, size=(1024, 512),
+                                    grey_level=True)
+
+    def test_iter_extract(self):
+        for fn, grey_level, options, band_options in (
+                ('tests/images/rgb/Lena.raw', False, {}, {}),
+                ('tests/images/rgb/Baboon.raw', False,
+                 {'subsampling_mode': 2, 'restart_interval': 7},
+                 {'rows_per_band': 20}),
+                ('tests/images/grey_level/Baboon.raw', True,
+                 {'entropy': 'arithmetic', 'restart_interval': 100},
+                 {'color_conversion': 'integer'})):
+            with open(fn, 'rb') as raw_file:
+                compressed = compress(raw_file, size=(512, 512),
+                                      grey_level=grey_level, **options)
+            with tempfile.TemporaryFile() as compressed_file:
+                compressed['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                expect = extract(compressed_file, compressed['header'],
+                                 color_conversion=band_options.get(
+                                     'color_conversion', 'float'
+                                 ))
+                compressed_file.seek(0)
+                bands = tuple(iter_extract(compressed_file,
+                                           compressed['header'],
+                                           **band_options))
+                compressed_file.seek(0)
+                with tempfile.TemporaryFile() as output_file:
+                    self.assertEqual(
+                        extract_stream(compressed_file, compressed['header'],
+                                       output_file, **band_options),
+                        expect.size
+                    )
+                    output_file.seek(0)
+                    data = output_file.read()
+            # Whole block rows of all layers.
+            mcu_rows = (16 if options.get('subsampling_mode', 1) == 1
+                        and not grey_level else 8)
+            rows = -(-band_options.get('rows_per_band', 1)
+                     // mcu_rows) * mcu_rows
+            self.assertTrue(all(len(band) == rows for band in bands[:-1]))
+            self.assertLessEqual(len(bands[-1]), rows)
+            np.testing.assert_array_equal(np.concatenate(bands).reshape(-1),
+                                          expect)
+            self.assertEqual(data, expect.tobytes())
+
+    def test_iter_extract_lazy_decode(self):
+        readers = []
+
+        class RecordingBlockReader(BlockReader):
+            def __init__(self, chunks):
+                super().__init__(chunks)
+                self.reads = []
+                readers.append(self)
+
+            def read(self, count):
+                blocks = super().read(count)
+                # The blocks read and the decoded blocks left pending.
+                self.reads.append((count, count + len(self._pending)))
+                return blocks
+
+        for options in ({}, {'subsampling_mode': 2, 'optimize_huffman': True}):
+            with open('tests/images/rgb/Lena.raw', 'rb') as raw_file:
+                compressed = compress(raw_file, size=(512, 512), **options)
+            self.assertNotIn('restart_interval', compressed['header'])
+            with tempfile.TemporaryFile() as compressed_file:
+                compressed['data'].tofile(compressed_file)
+                compressed_file.seek(0)
+                expect = extract(compressed_file, compressed['header'])
+                compressed_file.seek(0)
+                readers.clear()
+                with mock.patch('prototype_jpeg.stream.BlockReader',
+                                RecordingBlockReader):
+                    bands = tuple(iter_extract(compressed_file,
+                                               compressed['header']))
+            np.testing.assert_array_equal(np.concatenate(bands).reshape(-1),
+                                          expect)
+            self.assertEqual(len(readers), 3)
+            for reader in readers:
+                counts, held = zip(*reader.reads)
+                # No more than the blocks of a band are decoded at once.
+                self.assertLessEqual(max(held), max(counts))
+                self.assertLess(max(held), sum(counts))
+
+    def test_iter_extract_odd_size(self):
+        image = np.random.RandomState(0).randint(
+            0, 256, (37, 53, 3)
+        ).astype(np.uint8)
+        with tempfile.TemporaryFile() as raw_file:
+            image.tofile(raw_file)
+            raw_file.seek(0)
+            compressed = compress(raw_file, size=(37, 53),
+                                  restart_interval=3)
+        with tempfile.TemporaryFile() as compressed_file:
+            compressed['data'].tofile(compressed_file)
+            compressed_file.seek(0)
+            expect = extract(compressed_file, compressed['header'])
+            compressed_file.seek(0)
+            bands = tuple(iter_extract(compressed_file, compressed['header']))
+        self.assertListEqual([band.shape for band in bands],
+                             [(16, 53, 3), (16, 53, 3), (5, 53, 3)])
+        np.testing.assert_array_equal(np.concatenate(bands).reshape(-1),
+                                      expect)
+
+    def test_restart_interval_optimize_huffman(self):
+        fn = 'tests/images/rgb/Baboon.raw'
+        with open(fn, 'rb') as raw_file:
+            compressed = compress(raw_file, size=(512, 512),
+                                  restart_interval=7, optimize_huffman=True)
+        with tempfile.TemporaryFile() as compressed_file:
+            compressed['data'].tofile(compressed_file)
+            compressed_file.seek(0)
+            extracted = extract(compressed_file, header=compressed['header'])
+        np.testing.assert_array_equal(extracted, compress_and_extract({
+            'fn': fn,
+            'size': (512, 512),
+            'grey_level': False,
+            'quality': 50,
+            'subsampling_mode': 1
+        }))
+
+    def test_codec(self):
+        for fns, grey_level, options in (
+                (('tests/images/rgb/Lena.raw', 'tests/images/rgb/Baboon.raw'),
+                 False, {'subsampling_mode': 2, 'precision': 'float32'}),
+                (('tests/images/grey_level/Lena.raw',
+                  'tests/images/grey_level/Baboon.raw'),
+                 True, {'quality': 80, 'entropy': 'arithmetic'}),
+                (('tests/images/rgb/Lena.raw',),
+                 False, {'color_conversion': 'integer'})):
+            codec = Codec((512, 512), grey_level=grey_level, **options)
+            # Run twice to make sure the reused buffers are not stale.
+            for fn in fns + fns:
+                with open(fn, 'rb') as raw_file:
+                    frame = np.fromfile(raw_file, dtype=np.uint8)
+                    raw_file.seek(0)
+                    expect = compress(raw_file, size=(512, 512),
+                                      grey_level=grey_level, **options)
+                compressed = codec.encode(frame)
+                self.assertEqual(compressed['data'], expect['data'])
+                self.assertDictEqual(compressed['header'], expect['header'])
+                with tempfile.TemporaryFile() as compressed_file:
+                    expect['data'].tofile(compressed_file)
+                    compressed_file.seek(0)
+                    extracted = extract(
+                        compressed_file, header=expect['header'],
+                        precision=options.get('precision', 'float64'),
+                        color_conversion=options.get('color_conversion',
+                                                     'float')
+                    )
+                np.testing.assert_array_equal(codec.decode(compressed),
+                                              extracted)
+
+    def test_codec_header_not_match(self):
+        codec = Codec((512, 512), grey_level=True)
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            compressed = compress(raw_file, size=(512, 512), grey_level=True,
+                                  quality=80)
+        with self.assertRaises(ValueError):
+            codec.decode(compressed)
+
+    def test_unknown_huffman_backend(self):
+        with open('tests/images/grey_level/Lena.raw', 'rb') as raw_file:
+            with self.assertRaises(ValueError):
+                compress(raw_file, size=(512, 512), grey_level=True,
+                         huffman_backend='unknown')
+
 
 def compress_and_extract(spec):
     with open(spec['fn'], 'rb') as raw_file:
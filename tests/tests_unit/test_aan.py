@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.aan import (fdct, idct, forward_divisors,
+                                inverse_multipliers)
+from prototype_jpeg.utils import dct2d, idct2d
+
+
+class TestForwardDCT(unittest.TestCase):
+    def test_accuracy(self):
+        samples = np.random.RandomState(0).randint(-256, 256, (10000, 8, 8))
+        coefficients = (fdct(samples.astype(np.int16))
+                        / forward_divisors(np.ones((8, 8))))
+        self.assertLess(np.abs(coefficients - dct2d(samples * 1.)).max(),
+                        0.5)
+
+    def test_constant(self):
+        samples = np.full((1, 8, 8), -100, dtype=np.int16)
+        coefficients = (fdct(samples) / forward_divisors(np.ones((8, 8))))
+        self.assertAlmostEqual(coefficients[0, 0, 0], -800)
+        np.testing.assert_array_equal(coefficients.ravel()[1:], 0)
+
+
+class TestInverseDCT(unittest.TestCase):
+    def test_ieee_1180(self):
+        """The accuracy requirements of IEEE 1180-1990 on random inputs."""
+
+        rng = np.random.RandomState(0)
+        multipliers = inverse_multipliers(np.ones((8, 8)))
+        for low, high in ((-256, 255), (-5, 5), (-300, 300)):
+            for sign in (1, -1):
+                samples = rng.randint(low, high + 1, (10000, 8, 8)) * sign
+                coefficients = np.clip(np.rint(dct2d(samples * 1.)),
+                                       -2048, 2047)
+                expect = np.clip(np.rint(idct2d(coefficients)), -256, 255)
+                error = (np.clip(idct(coefficients.astype(np.int16),
+                                      multipliers), -256, 255) - expect)
+                self.assertLessEqual(np.abs(error).max(), 1)
+                self.assertLessEqual((error ** 2).mean(axis=0).max(), 0.06)
+                self.assertLessEqual((error ** 2).mean(), 0.02)
+                self.assertLessEqual(np.abs(error.mean(axis=0)).max(), 0.015)
+                self.assertLessEqual(abs(error.mean()), 0.0015)
+
+    def test_zero(self):
+        np.testing.assert_array_equal(
+            idct(np.zeros((1, 8, 8), dtype=np.int16),
+                 inverse_multipliers(np.ones((8, 8)))),
+            0
+        )
+
+    def test_dequantization(self):
+        table = np.random.RandomState(0).rand(8, 8) * 50 + 1
+        coefficients = np.random.RandomState(1).randint(-20, 20, (100, 8, 8))
+        np.testing.assert_allclose(
+            idct(coefficients, inverse_multipliers(table)),
+            idct2d(coefficients * table), atol=1
+        )
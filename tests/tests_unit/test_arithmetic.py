@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.arithmetic import (RangeEncoder, RangeDecoder,
+                                       ArithmeticEncoder, ArithmeticDecoder)
+from prototype_jpeg.codec import Encoder, DC, AC, EOB, ZRL, LUMINANCE
+
+
+class TestRangeCoder(unittest.TestCase):
+    def test_bits(self):
+        rng = np.random.RandomState(0)
+        contexts = rng.randint(0, 4, 10000).tolist()
+        # Skewed bits in each context.
+        bits = (rng.rand(10000) < np.take([.05, .5, .9, .99], contexts))
+        encoder = RangeEncoder(4)
+        for context, bit in zip(contexts, bits.tolist()):
+            encoder.encode(context, bit)
+        data = encoder.finish()
+        self.assertLess(len(data), 10000 // 8)
+        decoder = RangeDecoder(data, 4)
+        self.assertListEqual([decoder.decode(c) for c in contexts],
+                             bits.astype(int).tolist())
+
+    def test_magnitude(self):
+        test_input = [1, -1, 2, 3, -4, 17, 1023, -2047, 32767]
+        encoder = RangeEncoder(40)
+        for value in test_input:
+            encoder.encode_magnitude(0, 1, 20, value)
+        decoder = RangeDecoder(encoder.finish(), 40)
+        self.assertListEqual(
+            [decoder.decode_magnitude(0, 1, 20) for _ in test_input],
+            [abs(v) for v in test_input]
+        )
+
+    def test_empty(self):
+        decoder = RangeDecoder(RangeEncoder(1).finish(), 1)
+        self.assertEqual(decoder.decode(0), 0)
+
+
+class TestArithmeticCoding(unittest.TestCase):
+    def test_encode_decode(self):
+        rng = np.random.RandomState(0)
+        blocks = (rng.laplace(scale=3, size=(50, 8, 8))
+                  * (rng.rand(50, 8, 8) < .3)).astype(int)
+        blocks[0] = 0
+        blocks[1, 7, 7] = 5
+        blocks[2, 0, 0] = -1000
+        encoded = ArithmeticEncoder(blocks, LUMINANCE).encode_bits()
+        self.assertEqual(len(encoded[DC]) % 8, 0)
+        self.assertEqual(len(encoded[AC]) % 8, 0)
+        decoder = ArithmeticDecoder(encoded, LUMINANCE)
+        np.testing.assert_array_equal(decoder.decode(), blocks)
+        self.assertListEqual(decoder.run_length_ac,
+                             Encoder(blocks, LUMINANCE).run_length_ac)
+
+    def test_long_zero_runs(self):
+        blocks = np.zeros((2, 8, 8), dtype=int)
+        blocks[0, 7, 6] = 1
+        blocks[1, 0, 1] = -2
+        decoder = ArithmeticDecoder(
+            ArithmeticEncoder(blocks, LUMINANCE).encode_bits(), LUMINANCE
+        )
+        self.assertListEqual(decoder.run_length_ac,
+                             [ZRL, ZRL, ZRL, (13, 1), EOB, (0, -2), EOB])
+        np.testing.assert_array_equal(decoder.decode(), blocks)
+
+    def test_bit_string(self):
+        blocks = np.arange(128).reshape(2, 8, 8) % 5 - 2
+        encoded = ArithmeticEncoder(blocks, LUMINANCE).encode_bits()
+        decoder = ArithmeticDecoder(
+            {dc_ac: encoded[dc_ac].to01() for dc_ac in (DC, AC)}, LUMINANCE
+        )
+        np.testing.assert_array_equal(decoder.decode(), blocks)
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.blocks import (block_view, pad_edges, pad_layer,
+                                   padded_shape)
+from prototype_jpeg.utils import block_slice
+
+
+class TestPadding(unittest.TestCase):
+    def setUp(self):
+        self.layer = np.random.RandomState(0).randint(0, 256, (37, 53)) * 1.
+
+    def test_padded_shape(self):
+        self.assertTupleEqual(padded_shape((37, 56)), (40, 56))
+
+    def test_pad_edges(self):
+        padded = np.full((40, 56), np.nan)
+        padded[:37, :53] = self.layer
+        self.assertIs(pad_edges(padded, (37, 53)), padded)
+        np.testing.assert_array_equal(
+            padded, np.pad(self.layer, ((0, 3), (0, 3)), mode='edge')
+        )
+
+    def test_pad_edges_aligned(self):
+        padded = self.layer[:32, :48].copy()
+        pad_edges(padded, (32, 48))
+        np.testing.assert_array_equal(padded, self.layer[:32, :48])
+
+    def test_pad_layer(self):
+        padded = pad_layer(self.layer, level_offset=128, dtype=np.float32)
+        self.assertEqual(padded.dtype, np.float32)
+        np.testing.assert_array_equal(
+            padded, np.pad(self.layer - 128, ((0, 3), (0, 3)), mode='edge')
+        )
+
+
+class TestBlockView(unittest.TestCase):
+    def test_block_view(self):
+        padded = np.arange(40 * 56.).reshape(40, 56)
+        view = block_view(padded)
+        self.assertTupleEqual(view.shape, (5, 7, 8, 8))
+        self.assertTrue(np.shares_memory(view, padded))
+        np.testing.assert_array_equal(view.reshape(-1, 8, 8),
+                                      block_slice(padded, 8, 8))
+        view[1, 2] = -1
+        self.assertTrue(np.all(padded[8:16, 16:24] == -1))
+
+    def test_not_aligned(self):
+        with self.assertRaises(ValueError):
+            block_view(np.empty((37, 56)))
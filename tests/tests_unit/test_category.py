@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.category import (category, fixed_code_index,
+                                     inverse_fixed_code_index)
+from prototype_jpeg.codec import HUFFMAN_CATEGORIES
+
+
+class TestCategory(unittest.TestCase):
+    def test_category(self):
+        for size, row in enumerate(HUFFMAN_CATEGORIES):
+            np.testing.assert_array_equal(category(row), size)
+
+    def test_fixed_code_index(self):
+        for row in HUFFMAN_CATEGORIES:
+            np.testing.assert_array_equal(fixed_code_index(row),
+                                          np.arange(len(row)))
+
+    def test_inverse_fixed_code_index(self):
+        for size, row in enumerate(HUFFMAN_CATEGORIES):
+            np.testing.assert_array_equal(
+                inverse_fixed_code_index(np.arange(len(row)), size),
+                row
+            )
+
+    def test_invertible(self):
+        test_input = np.arange(-32767, 32768).reshape(-1, 5)
+        np.testing.assert_array_equal(
+            inverse_fixed_code_index(fixed_code_index(test_input),
+                                     category(test_input)),
+            test_input
+        )
+
+    def test_out_of_range(self):
+        for val in (-32768, 32768):
+            with self.assertRaises(ValueError):
+                category(val)
+            with self.assertRaises(ValueError):
+                fixed_code_index([0, val])
@@ -1,14 +1,17 @@
 import itertools
 import unittest
 
+from bitarray import bitarray
 import numpy as np
 
 from prototype_jpeg.codec import (
     Encoder, Decoder, decode_huffman, encode_huffman, encode_differential,
     decode_differential, iter_zig_zag, inverse_iter_zig_zag, encode_run_length,
-    decode_run_length, EOB, ZRL, DC, AC, LUMINANCE, CHROMINANCE,
-    HUFFMAN_CATEGORY_CODEWORD
+    encode_run_length_blocks, decode_run_length, EOB, ZRL, DC, AC, LUMINANCE,
+    CHROMINANCE, HUFFMAN_CATEGORY_CODEWORD, build_huffman_table,
+    default_decode_tree, warm_default_decode_trees
 )
+from prototype_jpeg.runlength import decode_run_length_blocks
 from prototype_jpeg.utils import Y, CB, CR
 
 
@@ -197,6 +200,48 @@ class TestEncoder(unittest.TestCase):
         encoder.run_length_ac = test_run_length_ac
         self.assertDictEqual(encoder.encode(), expect)
 
+    def test_encode_codewords(self):
+        test_diff_dc = (63, 2, -7, 3)
+        test_run_length_ac = [
+            (0, -1), (2, -1), (0, 2), EOB,
+            (1, -2), ZRL, (1, -1), EOB,
+            (2, -1), ZRL, (0, -1), EOB,
+            ZRL, ZRL, (1, 1), EOB
+        ]
+        for layer_type in (LUMINANCE, CHROMINANCE):
+            encoder = Encoder(None, layer_type)
+            encoder.diff_dc = test_diff_dc
+            encoder.run_length_ac = test_run_length_ac
+            expect = encoder.encode()
+            for dc_ac, (codes, lengths) in encoder.encode_codewords().items():
+                self.assertEqual(
+                    ''.join('{:0{padding}b}'.format(int(c), padding=int(l))
+                            for c, l in zip(codes, lengths)),
+                    expect[dc_ac]
+                )
+
+    def test_optimize_huffman_table(self):
+        test_input = np.random.RandomState(0).randint(
+            -3, 4, (20, 8, 8)
+        ) * (np.arange(64).reshape(8, 8) < 20)
+        for layer_type in (LUMINANCE, CHROMINANCE):
+            baseline = Encoder(test_input, layer_type).encode()
+            encoder = Encoder(test_input, layer_type)
+            spec = encoder.optimize_huffman_table()
+            for dc_ac in (DC, AC):
+                self.assertDictEqual(
+                    dict(encoder.huffman_table[dc_ac]),
+                    dict(build_huffman_table(spec[dc_ac], dc_ac))
+                )
+            encoded = encoder.encode()
+            self.assertLessEqual(len(encoded[DC]) + len(encoded[AC]),
+                                 len(baseline[DC]) + len(baseline[AC]))
+            np.testing.assert_array_equal(
+                Decoder(encoded, layer_type,
+                        huffman_table=encoder.huffman_table).decode(),
+                test_input
+            )
+
 
 class TestDecoder(unittest.TestCase):
     def test_dc(self):
@@ -333,6 +378,20 @@ class TestDecoder(unittest.TestCase):
         ])
         np.testing.assert_array_equal(test_instance.decode(), expect)
 
+    def test_decode_bitarray(self):
+        test_input = {
+            DC: '11101111 110111'.replace(' ', ''),
+            AC: ''.join((
+                '011', '1111111010', '1111111010', '110100', '00',
+                '00'
+            ))
+        }
+        np.testing.assert_array_equal(
+            Decoder({k: bitarray(v) for k, v in test_input.items()},
+                    CHROMINANCE).decode(),
+            Decoder(test_input, CHROMINANCE).decode()
+        )
+
     def test_decode_chrominance_cannot_divided_evenly_by_2(self):
         test_input_dc = {
             DC: '11101111 110111 11101111'.replace(' ', ''),
@@ -366,6 +425,23 @@ class TestDecoder(unittest.TestCase):
             Decoder(test_input, CHROMINANCE).decode()
 
 
+class TestHuffmanTable(unittest.TestCase):
+    def test_build_huffman_table(self):
+        spec = ((1, 1, 1, 2) + (0, ) * 12, (1, 0, 0xF0, 0x12, 0x3A))
+        self.assertDictEqual(dict(build_huffman_table(spec, DC)), {
+            1: '0', 0: '10', 0xF0: '110', 0x12: '1110', 0x3A: '1111'
+        })
+        self.assertDictEqual(dict(build_huffman_table(spec, AC)), {
+            (0, 1): '0', EOB: '10', ZRL: '110', (1, 2): '1110',
+            (3, 10): '1111'
+        })
+
+    def test_warm_default_decode_trees(self):
+        default_decode_tree.cache_clear()
+        warm_default_decode_trees()
+        self.assertEqual(default_decode_tree.cache_info().currsize, 4)
+
+
 class TestHuffmanCoding(unittest.TestCase):
     def test_encode_diff_dc_luminance_codeword(self):
         test_categories = (
@@ -651,6 +727,27 @@ class TestRunLengthCoding(unittest.TestCase):
         expect_2 = [(0, 1), ZRL, (0, 99), EOB]
         self.assertSequenceEqual(encode_run_length(test_input_2), expect_2)
 
+    def test_run_length_encode_blocks(self):
+        rng = np.random.RandomState(0)
+        test_input = rng.randint(-3, 4, (50, 63)) * (rng.rand(50, 63) < 0.1)
+        test_input[0] = 0
+        test_input[1, 62] = 5
+        test_input[2] = 0
+        test_input[2, 40] = -1
+        blocks, runs, values = encode_run_length_blocks(test_input)
+        expect = [(idx, pair) for idx, seq in enumerate(test_input)
+                  for pair in encode_run_length(tuple(seq))]
+        self.assertSequenceEqual(
+            list(zip(blocks.tolist(), zip(runs.tolist(), values.tolist()))),
+            expect
+        )
+
+    def test_run_length_encode_blocks_empty(self):
+        blocks, runs, values = encode_run_length_blocks(
+            np.zeros((0, 63), dtype=int)
+        )
+        self.assertEqual((blocks.size, runs.size, values.size), (0, 0, 0))
+
     def test_run_length_decode(self):
         test_input = [(1, -2), ZRL, (0, -1), ZRL, (2, -1), (0, -1), EOB]
         expect = (0, -2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
@@ -664,6 +761,28 @@ class TestRunLengthCoding(unittest.TestCase):
         result_EOB = decode_run_length(test_EOB)
         self.assertSequenceEqual(result_EOB, expect_EOB)
 
+    def test_run_length_decode_blocks(self):
+        test_input = [(1, -2), ZRL, (0, -1), ZRL, (2, -1), (0, -1), EOB, EOB,
+                      (0, 3), ZRL, ZRL, ZRL, (13, 1), EOB, (0, 7)]
+        runs, values = np.array(test_input).T
+        blocks, positions, values, nblocks = decode_run_length_blocks(
+            runs, values
+        )
+        self.assertEqual(nblocks, 3)
+        result = np.zeros((nblocks, 63), dtype=int)
+        result[blocks, positions] = values
+        expect = np.zeros((nblocks, 63), dtype=int)
+        for idx, pairs in enumerate((test_input[:7], test_input[7:8],
+                                     test_input[8:14])):
+            seq = decode_run_length(pairs)
+            expect[idx, :len(seq)] = seq
+        np.testing.assert_array_equal(result, expect)
+
+    def test_run_length_decode_blocks_exceed(self):
+        test_input = [ZRL, ZRL, ZRL, (15, 1), EOB]
+        with self.assertRaises(ValueError):
+            decode_run_length_blocks(*np.array(test_input).T)
+
     def test_invertible(self):
         """Run length codec is invertible iff there is no trailing zero when
         encode.
@@ -0,0 +1,150 @@
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.blocks import padded_shape
+from prototype_jpeg.color import (forward_color, inverse_color, layer_shapes,
+                                  subsampling_factors)
+from prototype_jpeg.utils import (rgb2ycbcr, ycbcr2rgb, downsample, upsample,
+                                  Y, CB, CR)
+
+
+class TestLayerShapes(unittest.TestCase):
+    def test_layer_shapes(self):
+        for size in ((512, 512), (37, 53)):
+            arr = np.empty(size)
+            self.assertDictEqual(layer_shapes(size, grey_level=True),
+                                 {Y: size})
+            for mode in (1, 2, 4):
+                self.assertDictEqual(
+                    layer_shapes(size, subsampling_mode=mode),
+                    {Y: size, CB: downsample(arr, mode).shape,
+                     CR: downsample(arr, mode).shape}
+                )
+
+    def test_unknown_subsampling_mode(self):
+        with self.assertRaises(ValueError):
+            subsampling_factors(3)
+
+
+class TestForwardColor(unittest.TestCase):
+    def setUp(self):
+        self.pixels = np.random.RandomState(0).randint(
+            0, 256, (37, 53, 3)
+        ).astype(np.uint8)
+
+    def test_rgb(self):
+        for mode in (1, 2, 4):
+            for dtype in (np.float64, np.float32):
+                expect = rgb2ycbcr(*(self.pixels[:, :, idx].astype(dtype)
+                                     for idx in range(3)))
+                expect[Y] = expect[Y] - 128
+                expect[CB] = downsample(expect[CB], mode)
+                expect[CR] = downsample(expect[CR], mode)
+                layers = forward_color(self.pixels, mode, dtype=dtype)
+                for key, layer in layers.items():
+                    nrows, ncols = expect[key].shape
+                    self.assertEqual(layer.dtype, dtype)
+                    self.assertTupleEqual(layer.shape,
+                                          padded_shape(expect[key].shape))
+                    np.testing.assert_allclose(layer[:nrows, :ncols],
+                                               expect[key], atol=1e-4)
+                    np.testing.assert_array_equal(
+                        layer, np.pad(layer[:nrows, :ncols],
+                                      ((0, -nrows % 8), (0, -ncols % 8)),
+                                      mode='edge')
+                    )
+
+    def test_grey_level(self):
+        layers = forward_color(self.pixels[:, :, 0])
+        self.assertListEqual(list(layers), [Y])
+        np.testing.assert_array_equal(layers[Y][:37, :53],
+                                      self.pixels[:, :, 0] - 128.)
+        np.testing.assert_array_equal(
+            layers[Y], np.pad(layers[Y][:37, :53], ((0, 3), (0, 3)),
+                              mode='edge')
+        )
+
+    def test_out(self):
+        out = {key: np.full(padded_shape(shape), np.nan)
+               for key, shape in layer_shapes((37, 53)).items()}
+        layers = forward_color(self.pixels, out=out)
+        for key, layer in forward_color(self.pixels).items():
+            self.assertIs(layers[key], out[key])
+            np.testing.assert_array_equal(out[key], layer)
+
+    def test_integer(self):
+        # A grid of the RGB colors including the extremes.
+        pixels = np.mgrid[0:256:5, 0:256:5, 0:256:5].reshape(3, 52, -1)
+        pixels = pixels.transpose(1, 2, 0).astype(np.uint8)
+        expect = forward_color(pixels, 4)
+        layers = forward_color(pixels, 4, conversion='integer')
+        for key, layer in layers.items():
+            self.assertEqual(layer.dtype, np.int16)
+            self.assertLessEqual(np.abs(layer - np.rint(expect[key])).max(),
+                                 1)
+        for mode in (1, 2):
+            layers = forward_color(self.pixels, mode, conversion='integer')
+            for key, layer in forward_color(self.pixels, mode).items():
+                self.assertLessEqual(
+                    np.abs(layers[key] - np.rint(layer)).max(), 1
+                )
+
+
+class TestInverseColor(unittest.TestCase):
+    def setUp(self):
+        # Including the overshoots of the inverse transform.
+        random = np.random.RandomState(0)
+        self.layers = {
+            Y: random.randint(-20, 276, (37, 53)).astype(float),
+            CB: random.randint(-150, 150, (37, 53)).astype(float),
+            CR: random.randint(-150, 150, (37, 53)).astype(float)
+        }
+
+    def test_rgb(self):
+        for mode in (1, 2, 4):
+            layers = {Y: self.layers[Y],
+                      CB: downsample(self.layers[CB], mode),
+                      CR: downsample(self.layers[CR], mode)}
+            expect = ycbcr2rgb(
+                layers[Y],
+                upsample(layers[CB], mode)[:37, :53],
+                upsample(layers[CR], mode)[:37, :53]
+            )
+            pixels = inverse_color(layers, mode)
+            self.assertEqual(pixels.dtype, np.uint8)
+            self.assertTupleEqual(pixels.shape, (37, 53, 3))
+            for idx, layer in enumerate(expect.values()):
+                np.testing.assert_array_equal(pixels[:, :, idx],
+                                              np.rint(np.clip(layer, 0, 255)))
+
+    def test_grey_level(self):
+        layer = self.layers[Y] + 0.4
+        pixels = inverse_color({Y: layer})
+        np.testing.assert_array_equal(pixels, np.rint(np.clip(layer, 0, 255)))
+        # The layer is not modified.
+        np.testing.assert_array_equal(layer, self.layers[Y] + 0.4)
+
+    def test_integer(self):
+        for mode in (1, 2, 4):
+            layers = {Y: self.layers[Y],
+                      CB: downsample(self.layers[CB], mode),
+                      CR: downsample(self.layers[CR], mode)}
+            pixels = inverse_color(layers, mode, conversion='integer')
+            self.assertEqual(pixels.dtype, np.uint8)
+            self.assertLessEqual(
+                np.abs(pixels - inverse_color(layers, mode).astype(int)).max(),
+                1
+            )
+        # A grid of the samples within range.
+        samples = np.mgrid[0:256:5, -128:128:3, -128:128:3].reshape(3, 52, -1)
+        layers = dict(zip((Y, CB, CR), samples.astype(float)))
+        self.assertLessEqual(
+            np.abs(inverse_color(layers, 4, conversion='integer')
+                   - inverse_color(layers, 4).astype(int)).max(), 1
+        )
+
+    def test_out(self):
+        out = np.empty((37, 53, 3), dtype=np.uint8)
+        self.assertIs(inverse_color(self.layers, 4, out=out), out)
+        np.testing.assert_array_equal(out, inverse_color(self.layers, 4))
@@ -0,0 +1,175 @@
+import unittest
+
+from bitarray import bitarray
+import numpy as np
+
+from prototype_jpeg.codec import (encode_huffman, decode_huffman, EOB, ZRL, DC,
+                                  AC, LUMINANCE, CHROMINANCE,
+                                  HUFFMAN_CATEGORY_CODEWORD)
+from prototype_jpeg.huffman import (codeword_lut, encode_dc, encode_ac,
+                                    pack_bits, decode_tree, decode_values,
+                                    optimal_code_spec, canonical_codewords)
+
+
+class TestCodewordLookupTable(unittest.TestCase):
+    def test_dc(self):
+        table = HUFFMAN_CATEGORY_CODEWORD[DC][LUMINANCE]
+        codes, lengths = codeword_lut(table)
+        for size, codeword in table.items():
+            self.assertEqual(codes[size], int(codeword, 2))
+            self.assertEqual(lengths[size], len(codeword))
+        self.assertEqual(lengths[12], 0)
+
+    def test_ac(self):
+        table = HUFFMAN_CATEGORY_CODEWORD[AC][CHROMINANCE]
+        codes, lengths = codeword_lut(table)
+        self.assertEqual(codes[0x00], int(table[EOB], 2))
+        self.assertEqual(codes[0xF0], int(table[ZRL], 2))
+        self.assertEqual(codes[0x3A], int(table[(3, 10)], 2))
+        self.assertEqual(lengths[0x3A], len(table[(3, 10)]))
+        self.assertEqual(lengths[0x1B], 0)
+
+
+class TestEncodeCodewords(unittest.TestCase):
+    def test_encode_dc(self):
+        test_input = np.arange(-2047, 2048)
+        for layer_type in (LUMINANCE, CHROMINANCE):
+            codes, lengths = encode_dc(test_input, codeword_lut(
+                HUFFMAN_CATEGORY_CODEWORD[DC][layer_type]
+            ))
+            for value, code, length in zip(test_input, codes, lengths):
+                self.assertEqual(
+                    '{:0{padding}b}'.format(int(code), padding=int(length)),
+                    encode_huffman(int(value), layer_type)
+                )
+
+    def test_encode_dc_out_of_range(self):
+        lut = codeword_lut(HUFFMAN_CATEGORY_CODEWORD[DC][LUMINANCE])
+        for val in (-2048, 2048):
+            with self.assertRaises(ValueError):
+                encode_dc([0, val], lut)
+
+    def test_encode_ac(self):
+        test_input = [EOB, ZRL, (0, 1), (1, -2), (15, -1023), (10, 1023),
+                      (3, 17), (7, -500)]
+        runs, values = np.array(test_input).T
+        for layer_type in (LUMINANCE, CHROMINANCE):
+            codes, lengths = encode_ac(runs, values, codeword_lut(
+                HUFFMAN_CATEGORY_CODEWORD[AC][layer_type]
+            ))
+            for value, code, length in zip(test_input, codes, lengths):
+                self.assertEqual(
+                    '{:0{padding}b}'.format(int(code), padding=int(length)),
+                    encode_huffman(value, layer_type)
+                )
+
+    def test_encode_ac_out_of_range(self):
+        lut = codeword_lut(HUFFMAN_CATEGORY_CODEWORD[AC][LUMINANCE])
+        for run, value in ((1, 0), (0, -1024), (0, 1024)):
+            with self.assertRaises(ValueError):
+                encode_ac([run], [value], lut)
+        for run, value in ((16, 1), (-1, 1)):
+            with self.assertRaises(KeyError):
+                encode_ac([run], [value], lut)
+
+
+class TestPackBits(unittest.TestCase):
+    def test_pack_bits(self):
+        rng = np.random.RandomState(0)
+        lengths = rng.randint(1, 33, size=1000)
+        codes = np.array([rng.randint(0, 2 ** int(l)) for l in lengths],
+                         dtype=np.uint64)
+        expect = bitarray(''.join(
+            '{:0{padding}b}'.format(int(c), padding=int(l))
+            for c, l in zip(codes, lengths)
+        ))
+        buffer, nbits = pack_bits(codes, lengths)
+        self.assertEqual(nbits, len(expect))
+        self.assertEqual(buffer.tobytes(), expect.tobytes())
+
+    def test_pack_bits_word_boundary(self):
+        buffer, nbits = pack_bits([0, 0b101, 0xFFFFFFFF], [62, 3, 32])
+        self.assertEqual(nbits, 97)
+        self.assertEqual(
+            buffer.tobytes(),
+            bitarray('0' * 62 + '101' + '1' * 32).tobytes()
+        )
+
+    def test_pack_bits_empty(self):
+        buffer, nbits = pack_bits([], [])
+        self.assertEqual(nbits, 0)
+        self.assertEqual(buffer.size, 0)
+
+
+class TestDecodeValues(unittest.TestCase):
+    def test_decode_dc(self):
+        test_input = list(range(-2047, 2048, 7))
+        for layer_type in (LUMINANCE, CHROMINANCE):
+            bits = ''.join(encode_huffman(v, layer_type) for v in test_input)
+            tree = decode_tree(HUFFMAN_CATEGORY_CODEWORD[DC][layer_type])
+            self.assertSequenceEqual(decode_values(bits, tree), test_input)
+            self.assertSequenceEqual(
+                decode_values(bitarray(bits), tree),
+                list(decode_huffman(bits, DC, layer_type))
+            )
+
+    def test_decode_ac(self):
+        test_input = [(0, 1), (1, -2), ZRL, (15, -1023), (10, 1023), (3, 17),
+                      (7, -500), EOB]
+        for layer_type in (LUMINANCE, CHROMINANCE):
+            bits = ''.join(encode_huffman(v, layer_type) for v in test_input)
+            tree = decode_tree(HUFFMAN_CATEGORY_CODEWORD[AC][layer_type])
+            self.assertSequenceEqual(decode_values(bits, tree), test_input)
+            self.assertSequenceEqual(
+                decode_values(bitarray(bits), tree),
+                list(decode_huffman(bits, AC, layer_type))
+            )
+
+    def test_decode_cannot_find_in_table(self):
+        tree = decode_tree(HUFFMAN_CATEGORY_CODEWORD[DC][LUMINANCE])
+        with self.assertRaises(ValueError):
+            decode_values('1111111111', tree)
+
+    def test_decode_incomplete(self):
+        tree = decode_tree(HUFFMAN_CATEGORY_CODEWORD[AC][LUMINANCE])
+        with self.assertRaises(ValueError):
+            decode_values('11010', tree)
+
+
+class TestOptimalCode(unittest.TestCase):
+    def test_optimal_code_spec(self):
+        bits, huffval = optimal_code_spec([0, 8, 0, 4, 2, 1, 1])
+        self.assertSequenceEqual(bits, (1, 1, 1, 1, 1) + (0, ) * 11)
+        self.assertSequenceEqual(huffval, (1, 3, 4, 5, 6))
+
+    def test_single_symbol(self):
+        bits, huffval = optimal_code_spec([0, 0, 100])
+        self.assertSequenceEqual(bits, (1, ) + (0, ) * 15)
+        self.assertSequenceEqual(huffval, (2, ))
+
+    def test_length_limited(self):
+        test_input = [2 ** i for i in range(40)]
+        bits, huffval = optimal_code_spec(test_input)
+        self.assertEqual(len(bits), 16)
+        self.assertEqual(sum(bits), len(test_input))
+        self.assertSetEqual(set(huffval), set(range(len(test_input))))
+        codewords = canonical_codewords(bits, huffval)
+        self.assertLessEqual(max(map(len, codewords.values())), 16)
+        self.assertLess(sum(2 ** -len(c) for c in codewords.values()), 1)
+
+    def test_canonical_codewords(self):
+        self.assertDictEqual(
+            canonical_codewords((1, 1, 1, 2) + (0, ) * 12, (1, 3, 4, 5, 6)),
+            {1: '0', 3: '10', 4: '110', 5: '1110', 6: '1111'}
+        )
+        with self.assertRaises(ValueError):
+            canonical_codewords((1, 1), (1, ))
+
+    def test_no_all_ones_codeword(self):
+        rng = np.random.RandomState(0)
+        for _ in range(10):
+            codewords = canonical_codewords(
+                *optimal_code_spec(rng.randint(0, 1000, 256))
+            )
+            for codeword in codewords.values():
+                self.assertNotEqual(codeword, '1' * len(codeword))
@@ -0,0 +1,90 @@
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.quantizer import (Quantizer, get_quantizer,
+                                      normalize_table, QUANTIZER_CACHE_SIZE)
+from prototype_jpeg.utils import quantize, Y, CB, CR
+
+
+class TestQuantizer(unittest.TestCase):
+    def test_quantize(self):
+        blocks = np.random.RandomState(0).rand(10, 8, 8) * 2048 - 1024
+        for block_type in (Y, CB):
+            for quality in (1, 50, 95):
+                quantizer = get_quantizer(block_type, quality)
+                np.testing.assert_allclose(
+                    quantizer.quantize(blocks),
+                    quantize(blocks, block_type, quality=quality)
+                )
+                np.testing.assert_allclose(
+                    quantizer.dequantize(blocks),
+                    quantize(blocks, block_type, quality=quality,
+                             inverse=True)
+                )
+
+    def test_dtype(self):
+        quantizer = get_quantizer(Y, 50)
+        blocks = np.ones((2, 8, 8), dtype=np.float32)
+        self.assertEqual(quantizer.quantize(blocks).dtype, np.float64)
+        self.assertEqual(quantizer.quantize(blocks, dtype=np.float32).dtype,
+                         np.float32)
+        self.assertEqual(
+            quantizer.dequantize(blocks.astype(np.int16),
+                                 dtype=np.float32).dtype,
+            np.float32
+        )
+
+    def test_read_only(self):
+        quantizer = get_quantizer(Y, 50)
+        with self.assertRaises(ValueError):
+            quantizer.table[0, 0] = 1
+        with self.assertRaises(ValueError):
+            quantizer.reciprocal[0, 0] = 1
+
+    def test_derive(self):
+        quantizer = Quantizer(np.full((8, 8), 2.))
+        derived = quantizer.derive(np.sqrt)
+        self.assertIs(quantizer.derive(np.sqrt), derived)
+        np.testing.assert_allclose(derived, np.sqrt(2))
+        self.assertFalse(derived.flags.writeable)
+
+
+class TestGetQuantizer(unittest.TestCase):
+    def test_cache(self):
+        self.assertIs(get_quantizer(Y, 50), get_quantizer(Y, 50))
+        self.assertIs(get_quantizer(CB, 50), get_quantizer(CR, 50))
+        self.assertIsNot(get_quantizer(Y, 50), get_quantizer(CB, 50))
+        self.assertIsNot(get_quantizer(Y, 50), get_quantizer(Y, 51))
+
+    def test_cache_bound(self):
+        get_quantizer.cache_clear()
+        self.assertEqual(get_quantizer.cache_info().maxsize,
+                         QUANTIZER_CACHE_SIZE)
+        first = get_quantizer(Y, 1)
+        self.assertIs(get_quantizer(Y, 1), first)
+        self.assertEqual(get_quantizer.cache_info().hits, 1)
+        for quality in range(2, QUANTIZER_CACHE_SIZE + 10):
+            get_quantizer(Y, quality)
+        self.assertEqual(get_quantizer.cache_info().currsize,
+                         QUANTIZER_CACHE_SIZE)
+        # The least recently used quantizer is evicted.
+        self.assertIsNot(get_quantizer(Y, 1), first)
+
+    def test_custom_table(self):
+        table = np.arange(1, 65).reshape(8, 8)
+        quantizer = get_quantizer(Y, 50, table=table)
+        self.assertIs(get_quantizer(Y, 50, table=table.tolist()), quantizer)
+        np.testing.assert_array_equal(quantizer.table, table)
+        np.testing.assert_array_equal(get_quantizer(Y, 75, table=table).table,
+                                      table / 2)
+
+    def test_invalid_table(self):
+        for table in (np.ones((4, 4)), np.zeros((8, 8))):
+            with self.assertRaises(ValueError):
+                get_quantizer(Y, 50, table=table)
+
+    def test_normalize_table(self):
+        table = normalize_table(np.ones((8, 8), dtype=int))
+        self.assertEqual(table, ((1, ) * 8, ) * 8)
+        self.assertEqual(hash(table), hash(((1, ) * 8, ) * 8))
@@ -0,0 +1,68 @@
+import concurrent.futures
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.arithmetic import ArithmeticEncoder, ArithmeticDecoder
+from prototype_jpeg.codec import Encoder, Decoder, DC, AC, LUMINANCE
+from prototype_jpeg.restart import (encode_segments, decode_segments,
+                                    iter_segments)
+
+
+class TestRestartSegments(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.blocks = (rng.laplace(scale=3, size=(50, 8, 8))
+                       * (rng.rand(50, 8, 8) < .3)).astype(int)
+        self.blocks[:, 0, 0] = rng.randint(-500, 500, 50)
+
+    def test_offsets(self):
+        bits, offsets = encode_segments(Encoder, self.blocks, LUMINANCE, 8)
+        for dc_ac in (DC, AC):
+            self.assertEqual(len(offsets[dc_ac]), 7)
+            self.assertEqual(len(bits[dc_ac]) % 8, 0)
+            for idx, (start, stop) in enumerate(offsets[dc_ac]):
+                self.assertEqual(start % 8, 0)
+                self.assertLessEqual(stop, len(bits[dc_ac]))
+                # Every segment is encoded as a standalone image.
+                segment = self.blocks[idx * 8:(idx + 1) * 8]
+                self.assertEqual(
+                    bits[dc_ac][start:stop],
+                    Encoder(segment, LUMINANCE).encode_bits()[dc_ac]
+                )
+
+    def test_iter_segments(self):
+        bits, offsets = encode_segments(Encoder, self.blocks, LUMINANCE, 8)
+        segments = iter_segments(Decoder, bits, offsets, LUMINANCE, first=2)
+        np.testing.assert_array_equal(next(segments), self.blocks[16:24])
+        np.testing.assert_array_equal(np.concatenate(tuple(segments)),
+                                      self.blocks[24:])
+
+    def test_encode_decode(self):
+        for encoder_class, decoder_class in ((Encoder, Decoder),
+                                             (ArithmeticEncoder,
+                                              ArithmeticDecoder)):
+            for restart_interval in (1, 7, 50, 100):
+                bits, offsets = encode_segments(
+                    encoder_class, self.blocks, LUMINANCE, restart_interval
+                )
+                np.testing.assert_array_equal(
+                    decode_segments(decoder_class, bits, offsets, LUMINANCE),
+                    self.blocks
+                )
+
+    def test_decode_with_executor(self):
+        bits, offsets = encode_segments(Encoder, self.blocks, LUMINANCE, 4)
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            np.testing.assert_array_equal(
+                decode_segments(Decoder, bits, offsets, LUMINANCE,
+                                executor=executor),
+                self.blocks
+            )
+
+    def test_numbers_of_segments_not_equal(self):
+        bits, offsets = encode_segments(Encoder, self.blocks, LUMINANCE, 4)
+        with self.assertRaises(ValueError):
+            decode_segments(Decoder, bits,
+                            {DC: offsets[DC], AC: offsets[AC][:-1]},
+                            LUMINANCE)
@@ -0,0 +1,139 @@
+import io
+import unittest
+
+from bitarray import bitarray
+import numpy as np
+
+from prototype_jpeg.codec import Encoder, DC, AC, CHROMINANCE
+from prototype_jpeg.stream import (BitWriter, BitSpool, BlockReader, FileBits,
+                                   iter_huffman_blocks, skip_huffman_blocks,
+                                   read_bands)
+
+
+class TestBitWriter(unittest.TestCase):
+    def test_write(self):
+        parts = (bitarray('101'), bitarray('1111000011'), bitarray(),
+                 bitarray('0' * 21))
+        expect = bitarray()
+        for part in parts:
+            expect += part
+        output = io.BytesIO()
+        writer = BitWriter(output)
+        for part in parts:
+            writer.write(part)
+            # Only whole bytes are written.
+            self.assertEqual(len(output.getvalue()), writer.length // 8)
+        self.assertEqual(writer.length, len(expect))
+        self.assertEqual(writer.flush(), expect.fill())
+        self.assertEqual(output.getvalue(), expect.tobytes())
+
+
+class TestBitSpool(unittest.TestCase):
+    def test_copy_to(self):
+        output = io.BytesIO()
+        writer = BitWriter(output)
+        writer.write(bitarray('11'))
+        expect = bitarray('11')
+        for bits in ('10110', '0' * 77, '1'):
+            spool = BitSpool()
+            spool.write(bitarray(bits))
+            spool.copy_to(writer)
+            expect += bitarray(bits)
+        writer.flush()
+        expect.fill()
+        self.assertEqual(output.getvalue(), expect.tobytes())
+
+
+class TestBlockReader(unittest.TestCase):
+    def test_read(self):
+        blocks = np.arange(20 * 64).reshape(20, 8, 8)
+        consumed = []
+
+        def chunks():
+            for start in range(0, 20, 6):
+                consumed.append(start)
+                yield blocks[start:start + 6]
+
+        reader = BlockReader(chunks())
+        np.testing.assert_array_equal(reader.read(4), blocks[:4])
+        # The chunks are consumed only when needed.
+        self.assertListEqual(consumed, [0])
+        np.testing.assert_array_equal(reader.read(0), blocks[4:4])
+        np.testing.assert_array_equal(reader.read(9), blocks[4:13])
+        self.assertListEqual(consumed, [0, 6, 12])
+        np.testing.assert_array_equal(reader.read(7), blocks[13:])
+        with self.assertRaises(ValueError):
+            reader.read(1)
+
+
+class TestFileBits(unittest.TestCase):
+    def test_slice(self):
+        bits = bitarray()
+        bits.frombytes(bytes(range(7, 70, 3)))
+        file_object = io.BytesIO(b'header' + bits.tobytes())
+        file_bits = FileBits(file_object, offset=6 * 8 + 5)
+        for start, stop in ((0, 0), (0, 3), (2, 17), (11, 64), (30, 163)):
+            self.assertEqual(file_bits[start:stop], bits[start + 5:stop + 5])
+
+
+class TestHuffmanBlocks(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        # The blocks of Cb followed by those of Cr.
+        self.blocks = (rng.laplace(scale=3, size=(50, 8, 8))
+                       * (rng.rand(50, 8, 8) < .3)).astype(np.int16)
+        self.blocks[:, 0, 0] = rng.randint(-500, 500, 50)
+
+    def test_iter_huffman_blocks(self):
+        optimized = Encoder(self.blocks, CHROMINANCE)
+        optimized.optimize_huffman_table()
+        for huffman_table in (None, optimized.huffman_table):
+            bits = Encoder(self.blocks, CHROMINANCE,
+                           huffman_table=huffman_table).encode_bits()
+            chunks = tuple(iter_huffman_blocks(bits, CHROMINANCE, 30, 7,
+                                               huffman_table=huffman_table))
+            self.assertListEqual([len(chunk) for chunk in chunks],
+                                 [7, 7, 7, 7, 2])
+            np.testing.assert_array_equal(np.concatenate(chunks),
+                                          self.blocks[:30])
+
+            # Cr continues after the bits and the DC of Cb.
+            rest, predictor = skip_huffman_blocks(
+                bits, CHROMINANCE, 30, huffman_table=huffman_table
+            )
+            self.assertEqual(predictor, self.blocks[29, 0, 0])
+            chunks = iter_huffman_blocks(rest, CHROMINANCE, 20, 8,
+                                         huffman_table=huffman_table,
+                                         predictor=predictor)
+            np.testing.assert_array_equal(np.concatenate(tuple(chunks)),
+                                          self.blocks[30:])
+
+    def test_too_short(self):
+        bits = Encoder(self.blocks, CHROMINANCE).encode_bits()
+        with self.assertRaises(ValueError):
+            tuple(iter_huffman_blocks(bits, CHROMINANCE, 51, 8))
+        with self.assertRaises(ValueError):
+            skip_huffman_blocks(bits, CHROMINANCE, 51)
+        # The DC bits of 50 blocks with the AC bits of fewer blocks.
+        short = {DC: bits[DC], AC: bits[AC][:len(bits[AC]) // 2]}
+        with self.assertRaises(ValueError):
+            tuple(iter_huffman_blocks(short, CHROMINANCE, 50, 8))
+        with self.assertRaises(ValueError):
+            skip_huffman_blocks(short, CHROMINANCE, 50)
+
+
+class TestReadBands(unittest.TestCase):
+    def test_read_bands(self):
+        for grey_level in (True, False):
+            shape = (21, 5) if grey_level else (21, 5, 3)
+            image = np.random.RandomState(0).randint(
+                0, 256, shape
+            ).astype(np.uint8)
+            bands = tuple(read_bands(io.BytesIO(image.tobytes()), (21, 5),
+                                     grey_level, rows_per_band=8))
+            self.assertListEqual([len(band) for band in bands], [8, 8, 5])
+            np.testing.assert_array_equal(np.concatenate(bands), image)
+
+    def test_too_short(self):
+        with self.assertRaises(ValueError):
+            tuple(read_bands(io.BytesIO(bytes(100)), (8, 5)))
@@ -0,0 +1,219 @@
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.transform import (forward_transform, dct_transform,
+                                      quantize_transform,
+                                      requantize_transform, inverse_transform,
+                                      TRANSFORMS, PRECISIONS)
+from prototype_jpeg.utils import (block_slice, block_combine, dct2d, idct2d,
+                                  quantize, Y, CB)
+
+
+def reference_forward_transform(layer, block_type, quality, level_offset):
+    nrows, ncols = layer.shape
+    padded = np.pad(layer - level_offset,
+                    ((0, -nrows % 8), (0, -ncols % 8)), mode='edge')
+    return np.array([
+        np.rint(quantize(dct2d(block), block_type, quality=quality))
+        for block in block_slice(padded, 8, 8)
+    ]).astype(int)
+
+
+def reference_inverse_transform(blocks, block_type, shape, quality,
+                                level_offset):
+    layer = np.array(blocks, dtype=np.int32)
+    for idx, block in enumerate(layer):
+        layer[idx] = quantize(block, block_type, quality=quality,
+                              inverse=True)
+        layer[idx] = idct2d(layer[idx])
+    padded_shape = (-(-s // 8) * 8 for s in shape)
+    return (block_combine(layer, *padded_shape)
+            + level_offset)[:shape[0], :shape[1]]
+
+
+class TestForwardTransform(unittest.TestCase):
+    def setUp(self):
+        self.layer = np.random.RandomState(0).randint(0, 256, (37, 53)) * 1.
+
+    def test_forward_transform(self):
+        for block_type, level_offset in ((Y, 128), (CB, 0)):
+            for quality in (1, 50, 95):
+                np.testing.assert_array_equal(
+                    forward_transform(self.layer, block_type, quality=quality,
+                                      level_offset=level_offset),
+                    reference_forward_transform(self.layer, block_type,
+                                                quality, level_offset)
+                )
+
+    def test_chunks(self):
+        expect = forward_transform(self.layer, Y, level_offset=128)
+        self.assertEqual(expect.shape, (5 * 7, 8, 8))
+        for chunk_size in (1, 7, 8, 20, 1000):
+            np.testing.assert_array_equal(
+                forward_transform(self.layer, Y, level_offset=128,
+                                  chunk_size=chunk_size),
+                expect
+            )
+
+    def test_does_not_modify_layer(self):
+        layer = self.layer.copy()
+        forward_transform(layer, Y, level_offset=128)
+        np.testing.assert_array_equal(layer, self.layer)
+
+
+class TestDctAndQuantizeTransform(unittest.TestCase):
+    def setUp(self):
+        self.layer = np.random.RandomState(0).randint(0, 256, (37, 53)) * 1.
+
+    def test_same_as_forward_transform(self):
+        for backend in TRANSFORMS:
+            coefficients = dct_transform(self.layer, level_offset=128,
+                                         chunk_size=7, backend=backend)
+            self.assertEqual(coefficients.shape, (5 * 7, 8, 8))
+            for quality in (1, 50, 95):
+                np.testing.assert_array_equal(
+                    quantize_transform(coefficients, Y, quality=quality,
+                                       backend=backend),
+                    forward_transform(self.layer, Y, quality=quality,
+                                      level_offset=128, backend=backend)
+                )
+
+
+class TestRequantizeTransform(unittest.TestCase):
+    def setUp(self):
+        self.layer = np.random.RandomState(0).randint(0, 256, (37, 53)) * 1.
+
+    def test_requantize_transform(self):
+        blocks = forward_transform(self.layer, Y, quality=90,
+                                   level_offset=128)
+        np.testing.assert_array_equal(
+            requantize_transform(blocks, Y, 90, 90), blocks
+        )
+        requantized = requantize_transform(blocks, Y, 90, 30)
+        expect = forward_transform(self.layer, Y, quality=30,
+                                   level_offset=128)
+        self.assertEqual(requantized.shape, expect.shape)
+        # Only the coefficients near the rounding boundaries may differ.
+        self.assertLessEqual(np.abs(requantized - expect).max(), 1)
+
+    def test_custom_tables(self):
+        blocks = np.random.RandomState(0).randint(-50, 50, (4, 8, 8))
+        np.testing.assert_array_equal(
+            requantize_transform(blocks, CB, 50, 50, table=np.full((8, 8), 2),
+                                 new_table=np.full((8, 8), 4)),
+            np.rint(blocks / 2).astype(int)
+        )
+
+
+class TestInverseTransform(unittest.TestCase):
+    def setUp(self):
+        self.layer = np.random.RandomState(0).randint(0, 256, (37, 53)) * 1.
+        self.blocks = forward_transform(self.layer, Y, level_offset=128)
+
+    def test_inverse_transform(self):
+        for block_type, level_offset in ((Y, 128), (CB, 0)):
+            for quality in (1, 50, 95):
+                np.testing.assert_array_equal(
+                    inverse_transform(self.blocks, block_type,
+                                      self.layer.shape, quality=quality,
+                                      level_offset=level_offset),
+                    reference_inverse_transform(self.blocks, block_type,
+                                                self.layer.shape, quality,
+                                                level_offset)
+                )
+
+    def test_chunks(self):
+        expect = inverse_transform(self.blocks, Y, self.layer.shape,
+                                   level_offset=128)
+        self.assertEqual(expect.shape, self.layer.shape)
+        for chunk_size in (1, 7, 8, 20, 1000):
+            np.testing.assert_array_equal(
+                inverse_transform(self.blocks, Y, self.layer.shape,
+                                  level_offset=128, chunk_size=chunk_size),
+                expect
+            )
+
+    def test_quality_95_round_trip(self):
+        layer = inverse_transform(
+            forward_transform(self.layer, Y, quality=95, level_offset=128),
+            Y, self.layer.shape, quality=95, level_offset=128
+        )
+        self.assertLess(np.abs(layer - self.layer).mean(), 5)
+
+    def test_number_of_blocks_not_fit(self):
+        with self.assertRaises(ValueError):
+            inverse_transform(self.blocks[:-1], Y, self.layer.shape)
+
+
+class TestTransformBackends(unittest.TestCase):
+    def setUp(self):
+        self.layer = np.random.RandomState(0).randint(0, 256, (37, 53)) * 1.
+
+    def test_backends(self):
+        self.assertSetEqual(set(TRANSFORMS), {'float', 'aan'})
+        for quality in (10, 50, 95):
+            expect = forward_transform(self.layer, Y, quality=quality,
+                                       level_offset=128)
+            blocks = forward_transform(self.layer, Y, quality=quality,
+                                       level_offset=128, backend='aan')
+            # Differences only happen around the rounding boundaries.
+            self.assertLessEqual(np.abs(blocks - expect).max(), 1)
+            self.assertLess(np.mean(blocks != expect), 0.05)
+            np.testing.assert_allclose(
+                inverse_transform(blocks, Y, self.layer.shape,
+                                  quality=quality, level_offset=128,
+                                  backend='aan'),
+                inverse_transform(blocks, Y, self.layer.shape,
+                                  quality=quality, level_offset=128),
+                atol=2
+            )
+
+    def test_aan_chunks(self):
+        blocks = forward_transform(self.layer, CB, backend='aan')
+        for chunk_size in (1, 20):
+            np.testing.assert_array_equal(
+                forward_transform(self.layer, CB, backend='aan',
+                                  chunk_size=chunk_size),
+                blocks
+            )
+            np.testing.assert_array_equal(
+                inverse_transform(blocks, CB, self.layer.shape,
+                                  backend='aan', chunk_size=chunk_size),
+                inverse_transform(blocks, CB, self.layer.shape,
+                                  backend='aan')
+            )
+
+
+class TestPrecisions(unittest.TestCase):
+    def setUp(self):
+        self.layer = np.random.RandomState(0).randint(0, 256, (37, 53)) * 1.
+
+    def test_float32(self):
+        self.assertSetEqual(set(PRECISIONS), {'float64', 'float32'})
+        for backend in TRANSFORMS:
+            expect = forward_transform(self.layer, Y, level_offset=128,
+                                       backend=backend)
+            blocks = forward_transform(self.layer.astype(np.float32), Y,
+                                       level_offset=128, backend=backend,
+                                       precision='float32')
+            self.assertEqual(blocks.dtype, np.int16)
+            # Differences only happen around the rounding boundaries.
+            self.assertLessEqual(np.abs(blocks - expect).max(), 1)
+            self.assertLess(np.mean(blocks != expect), 0.01)
+            self.assertEqual(
+                dct_transform(self.layer, backend=backend,
+                              precision='float32').dtype,
+                np.float32 if backend == 'float' else np.int32
+            )
+
+            layer = inverse_transform(blocks, Y, self.layer.shape,
+                                      level_offset=128, backend=backend,
+                                      precision='float32')
+            self.assertEqual(layer.dtype, np.float32)
+            np.testing.assert_allclose(
+                layer,
+                inverse_transform(blocks, Y, self.layer.shape,
+                                  level_offset=128, backend=backend),
+                atol=1
+            )
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from prototype_jpeg.codec import iter_zig_zag, inverse_iter_zig_zag
+from prototype_jpeg.zigzag import zig_zag_indices, zig_zag, inverse_zig_zag
+
+
+class TestZigZagIndices(unittest.TestCase):
+    def test_zig_zag_indices_4x4(self):
+        expect = [0, 1, 4, 8, 5, 2, 3, 6, 9, 12, 13, 10, 7, 11, 14, 15]
+        self.assertSequenceEqual(zig_zag_indices(4).tolist(), expect)
+
+    def test_same_as_iter_zig_zag(self):
+        for size in (1, 2, 3, 5, 8, 16):
+            test_input = np.arange(size ** 2).reshape(size, size)
+            self.assertSequenceEqual(zig_zag_indices(size).tolist(),
+                                     list(iter_zig_zag(test_input)))
+
+    def test_read_only(self):
+        with self.assertRaises(ValueError):
+            zig_zag_indices(8)[0] = 1
+
+
+class TestZigZag(unittest.TestCase):
+    def test_zig_zag(self):
+        test_input = np.random.RandomState(0).randint(-99, 99, (10, 8, 8))
+        expect = [list(iter_zig_zag(block)) for block in test_input]
+        np.testing.assert_array_equal(zig_zag(test_input), expect)
+
+    def test_zig_zag_not_square(self):
+        with self.assertRaises(ValueError):
+            zig_zag(np.zeros((2, 4, 8)))
+
+    def test_inverse_zig_zag(self):
+        test_input = np.random.RandomState(0).randint(-99, 99, (10, 30))
+        expect = [inverse_iter_zig_zag(seq, size=8) for seq in test_input]
+        np.testing.assert_array_equal(inverse_zig_zag(test_input, 8), expect)
+
+    def test_inverse_zig_zag_too_long(self):
+        with self.assertRaises(ValueError):
+            inverse_zig_zag(np.zeros((2, 17)), 4)
+
+    def test_invertible(self):
+        test_input = np.arange(3 * 64).reshape(3, 8, 8)
+        np.testing.assert_array_equal(
+            inverse_zig_zag(zig_zag(test_input), 8),
+            test_input
+        )